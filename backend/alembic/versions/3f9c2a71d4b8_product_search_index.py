@@ -0,0 +1,32 @@
+"""Full-text product search index
+
+Revision ID: 3f9c2a71d4b8
+Revises: e02228e726be
+Create Date: 2026-10-18 09:12:40.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a71d4b8'
+down_revision = 'e02228e726be'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The index is dialect specific (tsvector + pg_trgm on PostgreSQL, FTS5 on
+    # SQLite), so the DDL lives next to the code that queries it.
+    from app.search import create_search_index, rebuild_search_index  # type: ignore
+
+    bind = op.get_bind()
+    create_search_index(bind)
+    rebuild_search_index(bind)
+
+
+def downgrade() -> None:
+    from app.search import drop_search_index  # type: ignore
+
+    drop_search_index(op.get_bind())
@@ -0,0 +1,33 @@
+"""Persisted product term bags for content similarity
+
+Revision ID: 5b1e7c3d9f20
+Revises: 9d2f6b8e1a47
+Create Date: 2026-10-18 21:12:08.540193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7c3d9f20'
+down_revision = '9d2f6b8e1a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "product_terms",
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("terms", sa.JSON(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("product_id"),
+        if_not_exists=True,
+    )
+    # Incremental runs need every product's bag: start over with a full run
+    op.execute("UPDATE job_checkpoints SET covered_until = NULL WHERE name = 'content-similarity'")
+
+
+def downgrade() -> None:
+    op.drop_table("product_terms")
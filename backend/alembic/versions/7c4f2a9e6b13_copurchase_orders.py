@@ -0,0 +1,33 @@
+"""Orders counted by the co-purchase job above its checkpoint
+
+Revision ID: 7c4f2a9e6b13
+Revises: 5b1e7c3d9f20
+Create Date: 2026-10-18 22:04:51.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4f2a9e6b13'
+down_revision = '5b1e7c3d9f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "copurchase_orders",
+        sa.Column("order_id", sa.Integer(), nullable=False),
+        sa.Column("run", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("order_id"),
+        if_not_exists=True,
+    )
+    op.create_index("ix_copurchase_orders_run", "copurchase_orders", ["run"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_copurchase_orders_run", table_name="copurchase_orders", if_exists=True)
+    op.drop_table("copurchase_orders")
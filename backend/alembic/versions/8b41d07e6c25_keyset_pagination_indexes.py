@@ -0,0 +1,38 @@
+"""Composite indexes for keyset pagination
+
+Revision ID: 8b41d07e6c25
+Revises: 3f9c2a71d4b8
+Create Date: 2026-10-18 10:03:27.904116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b41d07e6c25'
+down_revision = '3f9c2a71d4b8'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_products_created_at_id", "products", ["created_at", "id"]),
+    ("ix_products_precio_id", "products", ["precio", "id"]),
+    ("ix_products_vendidos_id", "products", ["vendidos", "id"]),
+    ("ix_products_categoria_id_id", "products", ["categoria_id", "id"]),
+    ("ix_reviews_product_id_created_at_id", "reviews", ["product_id", "created_at", "id"]),
+    ("ix_orders_user_id_created_at_id", "orders", ["user_id", "created_at", "id"]),
+]
+
+
+def upgrade() -> None:
+    # if_not_exists: fresh databases already get these from the initial
+    # create_all migration, which builds the current models
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
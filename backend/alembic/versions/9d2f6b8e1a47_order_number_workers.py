@@ -0,0 +1,31 @@
+"""Order number worker id leases
+
+Revision ID: 9d2f6b8e1a47
+Revises: c8e4a2f9d615
+Create Date: 2026-10-18 19:05:42.118304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2f6b8e1a47'
+down_revision = 'c8e4a2f9d615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "order_number_workers",
+        sa.Column("worker_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("owner", sa.String(length=100), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("worker_id"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("order_number_workers")
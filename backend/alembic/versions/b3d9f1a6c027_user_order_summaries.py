@@ -0,0 +1,40 @@
+"""Per-user order summaries
+
+Revision ID: b3d9f1a6c027
+Revises: a7c2e5d81f34
+Create Date: 2026-10-18 16:58:03.771920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d9f1a6c027'
+down_revision = 'a7c2e5d81f34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_order_summaries",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("order_count", sa.Integer(), nullable=False),
+        sa.Column("total_spent", sa.Float(), nullable=False),
+        sa.Column("last_order_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+        if_not_exists=True,
+    )
+    # Backfill from existing orders
+    op.execute(
+        "INSERT INTO user_order_summaries (user_id, order_count, total_spent, last_order_at) "
+        "SELECT user_id, COUNT(id), SUM(total), MAX(created_at) FROM orders "
+        "WHERE user_id NOT IN (SELECT user_id FROM user_order_summaries) "
+        "GROUP BY user_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_order_summaries")
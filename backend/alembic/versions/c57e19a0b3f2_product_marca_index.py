@@ -0,0 +1,24 @@
+"""Index on products.marca for brand filters
+
+Revision ID: c57e19a0b3f2
+Revises: 8b41d07e6c25
+Create Date: 2026-10-18 11:26:51.220394
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c57e19a0b3f2'
+down_revision = '8b41d07e6c25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_products_marca", "products", ["marca"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_marca", table_name="products", if_exists=True)
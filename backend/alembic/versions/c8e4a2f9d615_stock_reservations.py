@@ -0,0 +1,53 @@
+"""Stock reservations for carts
+
+Revision ID: c8e4a2f9d615
+Revises: b3d9f1a6c027
+Create Date: 2026-10-18 17:41:26.309514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e4a2f9d615'
+down_revision = 'b3d9f1a6c027'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The initial migration creates tables from the current models, so the
+    # column may already be there
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("products")}
+    if "reservado" not in columns:
+        op.add_column("products", sa.Column("reservado", sa.Integer(), server_default="0", nullable=False))
+
+    op.create_table(
+        "stock_reservations",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_stock_reservations_user_id_product_id", "stock_reservations", ["user_id", "product_id"],
+        unique=True, if_not_exists=True
+    )
+    op.create_index(
+        "ix_stock_reservations_expires_at", "stock_reservations", ["expires_at"], if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stock_reservations_expires_at", table_name="stock_reservations", if_exists=True)
+    op.drop_index("ix_stock_reservations_user_id_product_id", table_name="stock_reservations", if_exists=True)
+    op.drop_table("stock_reservations")
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_column("reservado")
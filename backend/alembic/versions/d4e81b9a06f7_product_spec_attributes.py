@@ -0,0 +1,46 @@
+"""Spec attribute side table for filtering on product specs
+
+Revision ID: d4e81b9a06f7
+Revises: c57e19a0b3f2
+Create Date: 2026-10-18 12:04:17.836512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e81b9a06f7'
+down_revision = 'c57e19a0b3f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "product_specs",
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("key", sa.String(length=100), nullable=False),
+        sa.Column("value", sa.String(length=255), nullable=False),
+        sa.Column("value_num", sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("product_id", "key"),
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_product_specs_key_value", "product_specs", ["key", "value", "product_id"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_product_specs_key_value_num", "product_specs", ["key", "value_num", "product_id"], if_not_exists=True
+    )
+
+    # Backfill from the existing products
+    from app.specs import rebuild_product_specs  # type: ignore
+
+    rebuild_product_specs(op.get_bind())
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_specs_key_value_num", table_name="product_specs", if_exists=True)
+    op.drop_index("ix_product_specs_key_value", table_name="product_specs", if_exists=True)
+    op.drop_table("product_specs")
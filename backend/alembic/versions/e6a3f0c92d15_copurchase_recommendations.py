@@ -0,0 +1,59 @@
+"""Co-purchase counts and precomputed related products
+
+Revision ID: e6a3f0c92d15
+Revises: d4e81b9a06f7
+Create Date: 2026-10-18 13:37:02.194615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a3f0c92d15'
+down_revision = 'd4e81b9a06f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_order_items_order_id_product_id", "order_items", ["order_id", "product_id"], if_not_exists=True
+    )
+    op.create_table(
+        "product_copurchases",
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("other_id", sa.Integer(), nullable=False),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["other_id"], ["products.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("product_id", "other_id"),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "related_products",
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=20), nullable=False),
+        sa.Column("rank", sa.Integer(), nullable=False),
+        sa.Column("related_id", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["related_id"], ["products.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("product_id", "kind", "rank"),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "job_checkpoints",
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("last_id", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("name"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("job_checkpoints")
+    op.drop_table("related_products")
+    op.drop_table("product_copurchases")
+    op.drop_index("ix_order_items_order_id_product_id", table_name="order_items", if_exists=True)
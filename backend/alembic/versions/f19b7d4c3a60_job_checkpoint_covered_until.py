@@ -0,0 +1,28 @@
+"""Modification-time watermark on job checkpoints (content similarity)
+
+Revision ID: f19b7d4c3a60
+Revises: e6a3f0c92d15
+Create Date: 2026-10-18 14:21:45.602817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f19b7d4c3a60'
+down_revision = 'e6a3f0c92d15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The initial migration creates tables from the current models, so the
+    # column may already be there
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("job_checkpoints")}
+    if "covered_until" not in columns:
+        op.add_column("job_checkpoints", sa.Column("covered_until", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("job_checkpoints", "covered_until")
@@ -0,0 +1,21 @@
+"""
+Periodic background jobs started from the application lifespan
+"""
+import asyncio
+from typing import Callable
+
+from fastapi.concurrency import run_in_threadpool
+
+
+async def run_periodically(seconds: float, job: Callable[[], None]) -> None:
+    """
+    Run a blocking `job` every `seconds` in the thread pool, forever
+
+    Errors are reported and the loop keeps going; cancel the task to stop it.
+    """
+    while True:
+        await asyncio.sleep(seconds)
+        try:
+            await run_in_threadpool(job)
+        except Exception as e:
+            print(f"WARNING: Background job {job.__name__} failed: {e}")
@@ -0,0 +1,398 @@
+"""
+Bulk product writes: import (NDJSON / CSV upsert) and price / stock updates
+
+The request body is spooled to a temporary file as it arrives (memory is
+bounded, large feeds spill to disk) and then parsed row by row. Each row is
+validated on its own; valid rows are written in batches with one
+`INSERT ... ON CONFLICT (sku) DO UPDATE` per batch, committed batch by batch,
+so a 200k-row feed never holds one huge transaction. Rows that fail are
+reported with their line number and the import carries on.
+
+An imported row replaces the stored product: fields left out take their
+defaults, while rating, vendidos and created_at are kept.
+
+Every committed batch is reindexed for search and spec filters in the same
+transaction and invalidated in the product cache.
+
+Price / stock / featured updates (`bulk_update_products`) resolve all
+targets with one SELECT per chunk and apply the changes with one
+`UPDATE ... SET col = CASE id WHEN ... END WHERE id IN (...)` per chunk, all in
+a single transaction. Relative stock adjustments are computed in SQL so they
+compose with concurrent orders.
+
+Neither path sets stock below what carts hold (`Product.reservado`); lower
+values are raised to it.
+"""
+import codecs
+import csv
+import io
+import json
+from tempfile import SpooledTemporaryFile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+from sqlalchemy import case, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .cache import product_cache
+from .models import Category, Product
+from .schemas import (
+    ProductBulkUpdateItem, ProductBulkUpdateResult, ProductImportResult, ProductImportRow
+)
+from .search import index_products
+from .specs import sync_product_specs
+
+# Rows per INSERT ... ON CONFLICT statement (and per transaction)
+IMPORT_BATCH_SIZE = 1000
+
+# Failed rows listed in the report (the count covers all of them)
+MAX_REPORTED_ERRORS = 1000
+
+# Request bodies larger than this are spooled to disk
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+# Products per UPDATE statement in bulk updates (bound parameters stay well under driver limits)
+UPDATE_CHUNK_SIZE = 500
+
+# Columns overwritten when the SKU already exists
+UPSERT_COLUMNS = [
+    "titulo", "categoria_id", "marca", "precio", "stock",
+    "descripcion", "imagenes", "destacado", "specs",
+]
+
+RowSource = Iterator[Tuple[int, Optional[dict], Optional[str]]]
+
+
+# ==================== READING ====================
+
+async def spool_request_body(request: Request) -> SpooledTemporaryFile:
+    """Copy the streamed request body to a (rewound) temporary file"""
+    spool = SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def read_ndjson(stream) -> RowSource:
+    """Yield (line number, object, error) for each non-blank line of an NDJSON stream"""
+    decode = codecs.getreader("utf-8-sig")(stream)
+    for number, line in enumerate(decode, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(data, dict):
+            yield number, None, "Each line must be a JSON object"
+            continue
+        yield number, data, None
+
+
+def _csv_list(value: str) -> List[str]:
+    # JSON array or values separated by '|'
+    if value.lstrip().startswith("["):
+        return json.loads(value)
+    return [item.strip() for item in value.split("|") if item.strip()]
+
+
+def read_csv(stream) -> RowSource:
+    """
+    Yield (record number, object, error) for each data record of a CSV stream
+
+    The header row names the columns (same names as the NDJSON fields). Empty
+    cells are treated as missing; `imagenes` is a JSON array or '|'-separated
+    list and `specs` a JSON object.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    for number, record in enumerate(csv.DictReader(text), start=1):
+        if None in record:
+            yield number, None, "Row has more cells than the header"
+            continue
+        data = {key.strip(): value for key, value in record.items() if value not in (None, "")}
+        try:
+            if "imagenes" in data:
+                data["imagenes"] = _csv_list(data["imagenes"])
+            if "specs" in data:
+                data["specs"] = json.loads(data["specs"])
+        except ValueError as e:
+            yield number, None, f"Invalid JSON cell: {e}"
+            continue
+        yield number, data, None
+
+
+# ==================== WRITING ====================
+
+def _not_below_reserved(value):
+    """Stock expression raised to the quantity held in carts"""
+    return case((Product.reservado > value, Product.reservado), else_=value)
+
+
+def _upsert_statement(db: Session, rows: List[dict]):
+    insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+    stmt = insert(Product).values(rows)
+    updates = {column: stmt.excluded[column] for column in UPSERT_COLUMNS}
+    updates["stock"] = _not_below_reserved(stmt.excluded.stock)
+    updates["updated_at"] = func.now()  # onupdate does not fire for ON CONFLICT
+    return stmt.on_conflict_do_update(index_elements=[Product.sku], set_=updates).returning(Product.id)
+
+
+class ProductImporter:
+    """Validates rows and writes them in upsert batches; collects the report"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.categories: Dict[str, int] = dict(db.query(Category.name, Category.id).all())
+        self.category_ids = set(self.categories.values())
+        self.pending: Dict[str, Tuple[int, dict]] = {}  # sku -> (line, values)
+        self.received = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def fail(self, line: int, sku: Optional[str], error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "sku": sku, "error": error})
+
+    def add(self, line: int, data: Optional[dict], error: Optional[str] = None) -> None:
+        """Validate one parsed row and queue it for the next batch"""
+        self.received += 1
+        sku = str(data.get("sku")) if data and data.get("sku") is not None else None
+        if error:
+            self.fail(line, sku, error)
+            return
+
+        try:
+            row = ProductImportRow.model_validate(data)
+        except ValidationError as e:
+            problems = "; ".join(
+                f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()
+            )
+            self.fail(line, sku, problems)
+            return
+
+        if row.categoria is not None:
+            categoria_id = self.categories.get(row.categoria)
+            if categoria_id is None:
+                self.fail(line, row.sku, f"Unknown category '{row.categoria}'")
+                return
+        elif row.categoria_id in self.category_ids:
+            categoria_id = row.categoria_id
+        elif row.categoria_id is not None:
+            self.fail(line, row.sku, "Category not found")
+            return
+        else:
+            self.fail(line, row.sku, "categoria or categoria_id is required")
+            return
+
+        # A repeated SKU must not appear twice in one ON CONFLICT statement
+        if row.sku in self.pending:
+            self.flush()
+
+        values = row.model_dump(exclude={"categoria"})
+        values["categoria_id"] = categoria_id
+        self.pending[row.sku] = (line, values)
+        if len(self.pending) >= IMPORT_BATCH_SIZE:
+            self.flush()
+
+    def _write(self, rows: List[dict]) -> Tuple[List[int], int]:
+        """Upsert and reindex `rows`; returns (product ids, rows that already existed). Does not commit."""
+        skus = [row["sku"] for row in rows]
+        existing = set(self.db.scalars(select(Product.sku).where(Product.sku.in_(skus))))
+        ids = list(self.db.scalars(_upsert_statement(self.db, rows)))
+        index_products(self.db, ids)
+        sync_product_specs(self.db, ids)
+        return ids, len(existing)
+
+    def _commit(self, rows: List[dict]) -> None:
+        ids, updated = self._write(rows)
+        self.db.commit()
+        self.inserted += len(rows) - updated
+        self.updated += updated
+        product_cache.invalidate(ids=ids, skus=[row["sku"] for row in rows])
+
+    def flush(self) -> None:
+        """Write the pending batch; if it fails, retry row by row to report the culprits"""
+        if not self.pending:
+            return
+        batch = list(self.pending.values())
+        self.pending = {}
+
+        try:
+            self._commit([values for _, values in batch])
+            return
+        except SQLAlchemyError:
+            self.db.rollback()
+
+        for line, values in batch:
+            try:
+                self._commit([values])
+            except SQLAlchemyError as e:
+                self.db.rollback()
+                reason = str(getattr(e, "orig", None) or e.__class__.__name__).splitlines()[0]
+                self.fail(line, values["sku"], f"Database error: {reason}")
+
+    def result(self) -> ProductImportResult:
+        return ProductImportResult(
+            received=self.received,
+            inserted=self.inserted,
+            updated=self.updated,
+            failed=self.failed,
+            errors=self.errors,
+            errors_truncated=self.failed > len(self.errors),
+        )
+
+
+def import_products(db: Session, stream, fmt: str) -> ProductImportResult:
+    """Import every row of an NDJSON or CSV stream (blocking; run it in a worker thread)"""
+    importer = ProductImporter(db)
+    reader = read_csv if fmt == "csv" else read_ndjson
+    try:
+        for line, data, error in reader(stream):
+            importer.add(line, data, error)
+    except (UnicodeDecodeError, csv.Error) as e:
+        importer.fail(importer.received + 1, None, f"Unreadable input: {e}")
+    importer.flush()
+    return importer.result()
+
+
+# ==================== PRICE / STOCK UPDATES ====================
+
+def _check_items(items: List[ProductBulkUpdateItem]) -> None:
+    """
+    Raises:
+        HTTPException: If an item has no id/sku or mixes stock and stock_delta
+    """
+    for index, item in enumerate(items):
+        if (item.id is None) == (item.sku is None):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Item {index}: give exactly one of 'id' or 'sku'"
+            )
+        if item.stock is not None and item.stock_delta is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Item {index}: 'stock' and 'stock_delta' are mutually exclusive"
+            )
+
+
+def _resolve_skus(db: Session, skus: List[str]) -> Dict[str, int]:
+    """SKU -> product id for the SKUs that exist"""
+    resolved: Dict[str, int] = {}
+    for start in range(0, len(skus), UPDATE_CHUNK_SIZE):
+        chunk = skus[start:start + UPDATE_CHUNK_SIZE]
+        resolved.update(db.execute(select(Product.sku, Product.id).where(Product.sku.in_(chunk))).all())
+    return resolved
+
+
+def _merge_updates(items: List[ProductBulkUpdateItem], sku_ids: Dict[str, int]) -> Dict[int, dict]:
+    """
+    Group the changes by product id, later items overriding earlier ones
+
+    Relative stock adjustments add up; an absolute `stock` discards earlier deltas.
+    Items whose SKU does not exist are left out.
+    """
+    by_id: Dict[int, dict] = {}
+    for item in items:
+        product_id = item.id if item.id is not None else sku_ids.get(item.sku)
+        if product_id is None:
+            continue
+
+        changes = by_id.setdefault(product_id, {})
+        for field in ("precio", "destacado"):
+            value = getattr(item, field)
+            if value is not None:
+                changes[field] = value
+        if item.stock is not None:
+            changes["stock"] = item.stock
+            changes.pop("stock_delta", None)
+        elif item.stock_delta:
+            if "stock" in changes:
+                changes["stock"] = max(changes["stock"] + item.stock_delta, 0)
+            else:
+                changes["stock_delta"] = changes.get("stock_delta", 0) + item.stock_delta
+    return by_id
+
+
+def _changes_anything(current, changes: dict) -> bool:
+    if changes.get("stock_delta"):
+        return True
+    return any(getattr(current, field) != value for field, value in changes.items() if field != "stock_delta")
+
+
+def _update_statement(changes: Dict[int, dict]):
+    """One UPDATE setting each column through a CASE on the product id"""
+    values = {}
+    for field in ("precio", "destacado"):
+        mapping = {pid: c[field] for pid, c in changes.items() if field in c}
+        if mapping:
+            values[field] = case(mapping, value=Product.id, else_=getattr(Product, field))
+
+    stock_whens = []
+    for pid, c in changes.items():
+        if "stock" in c:
+            stock_whens.append((Product.id == pid, _not_below_reserved(c["stock"])))
+        elif "stock_delta" in c:
+            stock_whens.append((Product.id == pid, _not_below_reserved(Product.stock + c["stock_delta"])))
+    if stock_whens:
+        values["stock"] = case(*stock_whens, else_=Product.stock)
+
+    values["updated_at"] = func.now()  # bulk UPDATEs skip the ORM onupdate
+    return update(Product).where(Product.id.in_(list(changes))).values(values).execution_options(
+        synchronize_session=False
+    )
+
+
+def bulk_update_products(db: Session, items: List[ProductBulkUpdateItem]) -> ProductBulkUpdateResult:
+    """
+    Apply price / stock / featured changes to many products in one transaction
+
+    Only products whose values actually change are written (and invalidated).
+
+    Raises:
+        HTTPException: If an item is malformed (nothing is applied)
+    """
+    _check_items(items)
+    skus = list(dict.fromkeys(item.sku for item in items if item.sku is not None))
+    sku_ids = _resolve_skus(db, skus)
+    by_id = _merge_updates(items, sku_ids)
+
+    targets = list(by_id)
+    found = set()
+    changed_rows = []
+    for start in range(0, len(targets), UPDATE_CHUNK_SIZE):
+        chunk = targets[start:start + UPDATE_CHUNK_SIZE]
+        rows = db.execute(
+            select(Product.id, Product.sku, Product.precio, Product.stock, Product.destacado)
+            .where(Product.id.in_(chunk))
+        ).all()
+
+        changes: Dict[int, dict] = {}
+        for row in rows:
+            found.add(row.id)
+            if _changes_anything(row, by_id[row.id]):
+                changes[row.id] = by_id[row.id]
+                changed_rows.append(row)
+        if changes:
+            db.execute(_update_statement(changes))
+
+    db.commit()
+    if changed_rows:
+        product_cache.invalidate(ids=[row.id for row in changed_rows], skus=[row.sku for row in changed_rows])
+
+    requested_ids = dict.fromkeys(item.id for item in items if item.id is not None)
+    return ProductBulkUpdateResult(
+        requested=len(items),
+        matched=len(found),
+        changed=len(changed_rows),
+        not_found_ids=[pid for pid in requested_ids if pid not in found],
+        not_found_skus=[sku for sku in skus if sku not in sku_ids],
+    )
@@ -0,0 +1,321 @@
+"""
+Product read cache
+
+Read-through cache for single products (by id and by SKU), for product
+listings without a search term and for the aggregate versions behind listing
+ETags (per filter set, search included). Values are the JSON-ready dicts of
+`ProductResponse` (plus their ETag / Last-Modified), so any backend can
+store them:
+
+- `LRUCache`: in-process, bounded by entry count, entries expire after a TTL.
+- `RedisCache`: out-of-process, shared by every worker. Falls back to
+  `LocalRedisStandIn` (same client calls, kept in memory) when no REDIS_URL
+  is configured or the `redis` package is not installed.
+
+Writers invalidate after committing: `product_cache.invalidate(ids, skus)`
+drops the per-product entries and bumps the listing generation so every
+cached listing is ignored from then on. With the in-process backend and
+several workers, other workers only see the change when their entry expires,
+so keep the TTL short there.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from .config import settings
+
+
+class CacheStats:
+    """Counters used to size the cache"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+# ==================== BACKENDS ====================
+
+class LRUCache:
+    """In-process LRU cache with a size bound and per-entry TTL"""
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    self.stats.invalidations += 1
+
+    def incr(self, key: str) -> int:
+        # Counters live apart from cached entries: never evicted, never expire
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            **self.stats.as_dict(),
+        }
+
+
+class LocalRedisStandIn:
+    """
+    Minimal in-memory stand-in for the redis client calls used by RedisCache
+
+    Lets the Redis backend run in development and tests without a server.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value, expires_at = self._data.get(key, (b"0", None))
+            value = str(int(value) + 1).encode("ascii")
+            self._data[key] = (value, expires_at)
+            return int(value)
+
+    def dbsize(self) -> int:
+        return len(self._data)
+
+    def info(self, section: Optional[str] = None) -> Dict[str, Any]:
+        # Expired keys are dropped lazily and nothing is ever evicted
+        return {"evicted_keys": 0, "expired_keys": 0}
+
+
+class RedisCache:
+    """Out-of-process cache shared by all workers (values stored as JSON)"""
+
+    name = "redis"
+
+    def __init__(self, client, ttl: float = 300, prefix: str = "miniamazon:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any) -> None:
+        self.client.set(self.prefix + key, json.dumps(value, default=str), ex=int(self.ttl))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.stats.invalidations += self.client.delete(*[self.prefix + key for key in keys])
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + key))
+
+    def counter(self, key: str) -> int:
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def info(self) -> Dict[str, Any]:
+        info = {
+            "backend": self.name,
+            "client": type(self.client).__name__,
+            "size": self.client.dbsize(),
+            "ttl_seconds": self.ttl,
+            **self.stats.as_dict(),
+        }
+        # Evictions and expirations happen server side
+        server = self.client.info("stats")
+        info["evictions"] = server.get("evicted_keys", 0)
+        info["expirations"] = server.get("expired_keys", 0)
+        return info
+
+
+class NullCache:
+    """Backend used when caching is disabled"""
+
+    name = "none"
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[Any]:
+        self.stats.misses += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def delete(self, *keys: str) -> None:
+        pass
+
+    def incr(self, key: str) -> int:
+        return 0
+
+    def counter(self, key: str) -> int:
+        return 0
+
+    def info(self) -> Dict[str, Any]:
+        return {"backend": self.name, **self.stats.as_dict()}
+
+
+def create_backend(name: str):
+    """Build the cache backend selected in settings (memory, redis or none)"""
+    ttl = settings.PRODUCT_CACHE_TTL_SECONDS
+
+    if name == "none":
+        return NullCache()
+
+    if name == "redis":
+        client = None
+        if settings.REDIS_URL:
+            try:
+                import redis  # Optional dependency
+                client = redis.Redis.from_url(settings.REDIS_URL)
+            except ImportError:
+                print("WARNING: redis package not installed, using local stand-in for the product cache")
+        return RedisCache(client or LocalRedisStandIn(), ttl=ttl)
+
+    return LRUCache(maxsize=settings.PRODUCT_CACHE_MAXSIZE, ttl=ttl)
+
+
+# ==================== PRODUCT CACHE ====================
+
+class ProductCache:
+    """Product-specific keys on top of a cache backend"""
+
+    LISTING_GENERATION_KEY = "products:list-generation"
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get_by_id(self, product_id: int) -> Optional[dict]:
+        return self.backend.get(f"product:id:{product_id}")
+
+    def get_by_sku(self, sku: str) -> Optional[dict]:
+        return self.backend.get(f"product:sku:{sku}")
+
+    def put(self, product: dict, validators: Optional[Any] = None) -> dict:
+        """
+        Cache a serialized product under its id and SKU
+
+        Entries keep the product's ETag / Last-Modified next to the data so
+        conditional requests can be answered from the cache.
+        """
+        entry = {"data": product, **(validators._asdict() if validators else {})}
+        self.backend.set(f"product:id:{product['id']}", entry)
+        self.backend.set(f"product:sku:{product['sku']}", entry)
+        return entry
+
+    def _listing_key(self, params: Any, kind: str = "list") -> str:
+        generation = self.backend.counter(self.LISTING_GENERATION_KEY)
+        encoded = json.dumps(params, sort_keys=True, default=str)
+        return f"products:{kind}:{generation}:{encoded}"
+
+    def get_listing(self, params: dict) -> Optional[dict]:
+        return self.backend.get(self._listing_key(params))
+
+    def put_listing(self, params: dict, listing: dict) -> None:
+        self.backend.set(self._listing_key(params), listing)
+
+    def get_listing_version(self, filters: list) -> Optional[list]:
+        """Cached `listing_version` aggregate for a filter set (dropped on any product change)"""
+        return self.backend.get(self._listing_key(filters, "version"))
+
+    def put_listing_version(self, filters: list, version: list) -> None:
+        self.backend.set(self._listing_key(filters, "version"), version)
+
+    def invalidate(self, ids: Iterable[int] = (), skus: Iterable[str] = ()) -> None:
+        """Drop cached products and every cached listing (call after commit)"""
+        keys = [f"product:id:{pid}" for pid in ids] + [f"product:sku:{sku}" for sku in skus]
+        self.backend.delete(*keys)
+        self.backend.incr(self.LISTING_GENERATION_KEY)
+
+    def invalidate_products(self, products: Iterable[Any]) -> None:
+        """Invalidate from ORM Product rows"""
+        products = list(products)
+        self.invalidate(ids=[p.id for p in products], skus=[p.sku for p in products])
+
+    def info(self) -> Dict[str, Any]:
+        return self.backend.info()
+
+
+# Single instance shared by the routers
+product_cache = ProductCache(create_backend(settings.PRODUCT_CACHE_BACKEND))
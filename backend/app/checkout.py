@@ -0,0 +1,242 @@
+"""
+Checkout pricing: shipping rate table and order quotes
+
+`RateTable` is built in memory at startup from the `shipping_methods` and
+`localities` tables. For every active method and region it precomputes the
+shipping cost per subtotal band (ascending lower bounds, looked up with
+bisect):
+
+- below FREE_SHIPPING_MIN_SUBTOTAL: the method's cost plus the region's
+  surcharge (SHIPPING_REGION_SURCHARGES)
+- from FREE_SHIPPING_MIN_SUBTOTAL on: free
+
+Store pickup (cost 0) is free everywhere. Products have no weight, so bands
+are by subtotal only.
+
+`quote_order()` prices a cart (lines, subtotal, coupon, shipping, total)
+from product prices without touching the database; `POST /api/checkout/quote`
+and `create_order` both use it, so a quote and the order placed from it
+always agree.
+"""
+import unicodedata
+from bisect import bisect_right
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from .config import settings
+from .coupons import CouponError, coupon_table
+from .database import SessionLocal
+from .models import Locality, ShippingMethod
+from .schemas import OrderCreate
+
+
+class QuoteLine(NamedTuple):
+    product_id: int
+    quantity: int
+    price: float
+    total: float
+
+
+class Quote(NamedTuple):
+    items: List[QuoteLine]
+    subtotal: float
+    discount: float
+    coupon_code: Optional[str]
+    shipping_method: Optional[str]
+    shipping_cost: float
+    free_shipping: bool
+    total: float
+
+
+def _fold(text: Optional[str]) -> str:
+    """Lowercase without accents, for matching names typed by users ("estandar" = "Estándar")"""
+    decomposed = unicodedata.normalize("NFKD", (text or "").strip().lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _region_key(region: Optional[str]) -> str:
+    return _fold(region)
+
+
+# Values older clients send (mobile app: "domicilio" / "retiro"; envios.json ids)
+SHIPPING_METHOD_ALIASES = {
+    "domicilio": "delivery", "despacho": "delivery", "envio": "delivery", "std": "delivery",
+    "retiro": "pickup", "pickup": "pickup", "pick": "pickup",
+}
+
+
+class RateTableState(NamedTuple):
+    methods: List[dict]  # ShippingMethodResponse-ready, cheapest first
+    localities: List[dict]  # LocalityResponse-ready
+    methods_by_key: Dict[str, dict]
+    rates: Dict[Tuple[int, str], List[Tuple[float, float]]]
+
+
+class RateTable:
+    """
+    Shipping methods, localities and precomputed rates
+
+    A reload builds a new `RateTableState` and swaps it in with one assignment;
+    readers take `self._state` once, so they never see half of a reload.
+    """
+
+    def __init__(self):
+        self._state = RateTableState([], [], {}, {})
+        self.loaded = False
+
+    @property
+    def methods(self) -> List[dict]:
+        return self._state.methods
+
+    @property
+    def localities(self) -> List[dict]:
+        return self._state.localities
+
+    def load(self, db) -> None:
+        methods = [
+            {
+                "id": m.id, "name": m.name, "description": m.description, "cost": m.cost,
+                "estimated_days": m.estimated_days, "is_active": m.is_active, "created_at": m.created_at,
+            }
+            for m in db.query(ShippingMethod).filter(ShippingMethod.is_active == True)
+            .order_by(ShippingMethod.cost, ShippingMethod.id)
+        ]
+        localities = [
+            {
+                "id": l.id, "name": l.name, "region": l.region, "country": l.country, "created_at": l.created_at,
+            }
+            for l in db.query(Locality).order_by(Locality.region, Locality.name)
+        ]
+
+        surcharges = {_region_key(region): cost for region, cost in settings.SHIPPING_REGION_SURCHARGES.items()}
+        regions = {_region_key(l["region"]) for l in localities} | set(surcharges) | {""}
+        rates = {}
+        for method in methods:
+            for region in regions:
+                if method["cost"] <= 0:
+                    bands = [(0.0, 0.0)]
+                else:
+                    bands = [(0.0, method["cost"] + surcharges.get(region, 0.0))]
+                    if settings.FREE_SHIPPING_MIN_SUBTOTAL > 0:
+                        bands.append((float(settings.FREE_SHIPPING_MIN_SUBTOTAL), 0.0))
+                rates[(method["id"], region)] = bands
+
+        by_key = {}
+        for method in methods:
+            by_key[str(method["id"])] = method
+            by_key[_fold(method["name"])] = method
+
+        self._state = RateTableState(methods, localities, by_key, rates)
+        self.loaded = True
+
+    def ensure_loaded(self) -> None:
+        if not self.loaded:
+            load_rate_table()
+
+    def shipping(self, method: Optional[str], region: Optional[str], subtotal: float) -> Tuple[dict, float]:
+        """
+        Shipping method and the cost of shipping `subtotal` with it to `region`
+
+        The method is found by id, name or a word of its name (case and accent
+        insensitive, e.g. "express"); legacy values in SHIPPING_METHOD_ALIASES map
+        to the cheapest delivery or pickup method; without one, the cheapest
+        delivery method. Both come from the same reload.
+
+        Raises:
+            HTTPException: If the method is unknown, ambiguous or there are no shipping methods
+        """
+        self.ensure_loaded()
+        state = self._state
+        found = self._find_method(state, method)
+        return found, self._cost(state, found["id"], region, subtotal)
+
+    def localities_in(self, region: Optional[str] = None) -> List[dict]:
+        self.ensure_loaded()
+        localities = self._state.localities
+        if not region:
+            return localities
+        key = _region_key(region)
+        return [locality for locality in localities if _region_key(locality["region"]) == key]
+
+    @staticmethod
+    def _find_method(state: RateTableState, method: Optional[str]) -> dict:
+        key = _fold(method)
+        if not key:
+            found = next((m for m in state.methods if m["cost"] > 0), None)
+        elif key in state.methods_by_key:
+            found = state.methods_by_key[key]
+        elif key in SHIPPING_METHOD_ALIASES:
+            pickup = SHIPPING_METHOD_ALIASES[key] == "pickup"
+            found = next((m for m in state.methods if (m["cost"] <= 0) == pickup), None)
+        else:
+            partial = [m for m in state.methods if key in _fold(m["name"]).split()]
+            found = partial[0] if len(partial) == 1 else None
+        if found is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid shipping method"
+            )
+        return found
+
+    @staticmethod
+    def _cost(state: RateTableState, method_id: int, region: Optional[str], subtotal: float) -> float:
+        bands = state.rates.get((method_id, _region_key(region))) or state.rates[(method_id, "")]
+        return bands[bisect_right(bands, (subtotal, float("inf"))) - 1][1]
+
+
+# Single instance shared by the routers
+rate_table = RateTable()
+
+
+def load_rate_table() -> None:
+    """(Re)build the shipping rate table from the database"""
+    db = SessionLocal()
+    try:
+        rate_table.load(db)
+    finally:
+        db.close()
+
+
+def quote_order(order_data: OrderCreate, prices: Dict[int, float]) -> Quote:
+    """
+    Price an order from current product prices (no database access)
+
+    Raises:
+        HTTPException: Invalid coupon or shipping method
+    """
+    lines = [
+        QuoteLine(item.product_id, item.quantity, prices[item.product_id], prices[item.product_id] * item.quantity)
+        for item in order_data.items
+    ]
+    subtotal = sum(line.total for line in lines)
+
+    discount = 0.0
+    free_shipping = False
+    coupon_code = None
+    if order_data.coupon_code:
+        try:
+            applied = coupon_table.apply(order_data.coupon_code, subtotal)
+        except CouponError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        discount = applied.discount
+        free_shipping = applied.free_shipping
+        coupon_code = applied.code
+
+    method, shipping_cost = rate_table.shipping(order_data.shipping_method, order_data.shipping_region, subtotal)
+    if free_shipping:
+        shipping_cost = 0.0
+
+    return Quote(
+        items=lines,
+        subtotal=subtotal,
+        discount=discount,
+        coupon_code=coupon_code,
+        shipping_method=method["name"],
+        shipping_cost=shipping_cost,
+        free_shipping=free_shipping or shipping_cost == 0,
+        total=subtotal - discount + shipping_cost,
+    )
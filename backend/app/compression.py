@@ -0,0 +1,252 @@
+"""
+Response compression (gzip / brotli) with a cache of compressed bodies
+
+`CompressionMiddleware` negotiates the encoding from Accept-Encoding (brotli
+preferred; the `brotli` package is in requirements.txt, and without it only
+gzip is offered) and compresses
+text-like responses of at least COMPRESSION_MIN_SIZE bytes. Streaming
+responses (exports) are compressed chunk by chunk.
+
+Hot GETs (categories, featured products, first listing pages) return the
+same body thousands of times between writes. Their ETag is derived from row
+versions (see `conditional.py`), so identical ETags mean identical bodies:
+the compressed bytes are kept in a size-bounded LRU keyed by
+(ETag, encoding) and reused instead of compressing again. Compressed
+responses carry a weak ETag (W/"..."); If-None-Match already uses weak
+comparison, so revalidation keeps working. For clients that accept an
+encoding every ETag is sent weak, whether the body ended up compressed, too
+small to compress, or a 304, so a 200 and the 304 revalidating it always
+carry the same form.
+"""
+import gzip
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+
+try:
+    import brotli  # Optional dependency
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "application/javascript",
+    "application/xml", "image/svg+xml", "text/",
+)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """Encodings this server can produce, most preferred first"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported encoding for an Accept-Encoding header (None = identity)"""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if coding:
+            weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for coding in supported_encodings():
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:  # Ties keep the earlier (preferred) encoding
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    # mtime=0 keeps the output deterministic for identical bodies
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class _StreamCompressor:
+    """Incremental compressor with the same interface for both encodings"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self._compress, self._flush = self._compressor.process, self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+            self._compress, self._flush = self._compressor.compress, self._compressor.flush
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def finish(self) -> bytes:
+        return self._flush()
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (ETag, encoding), bounded by total bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[tuple, bytes]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        body = self._data.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def set(self, key: tuple, body: bytes) -> None:
+        if len(body) > self.max_bytes or key in self._data:
+            return
+        self._data[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= len(evicted)
+
+    def info(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "encodings": list(supported_encodings()),
+            "entries": len(self._data),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Single instance shared by the middleware (lives in the event loop, no locking needed)
+compressed_cache = CompressedBodyCache(settings.COMPRESSION_CACHE_MAX_BYTES)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses for clients that accept it"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, cache: Optional[CompressedBodyCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, send, encoding, cacheable=scope["method"] == "GET")
+        await self.app(scope, receive, responder)
+
+
+class _CompressionResponder:
+    """`send` wrapper: holds the response start until the first body chunk decides"""
+
+    def __init__(self, middleware: CompressionMiddleware, send: Send, encoding: str, cacheable: bool):
+        self.middleware = middleware
+        self.send = send
+        self.encoding = encoding
+        self.cacheable = cacheable
+        self.start: Optional[Message] = None
+        self.compressor: Optional[_StreamCompressor] = None
+        self.passthrough = False
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if self.start["status"] in (204, 206, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    @staticmethod
+    def _vary_on_encoding(headers: MutableHeaders) -> None:
+        if "accept-encoding" not in headers.get("vary", "").lower():
+            headers.add_vary_header("Accept-Encoding")
+
+    def _weaken_etag(self, headers: MutableHeaders) -> None:
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+            self._vary_on_encoding(headers)
+
+    def _set_encoding_headers(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+        self._vary_on_encoding(headers)
+        self._weaken_etag(headers)
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is not None:
+            # Later chunks of a streaming response
+            data = self.compressor.compress(body)
+            if not more_body:
+                data += self.compressor.finish()
+            if data or not more_body:
+                await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        headers = MutableHeaders(raw=self.start["headers"])
+        if not self._compressible(headers) or (not more_body and len(body) < self.middleware.minimum_size):
+            self.passthrough = True
+            self._weaken_etag(headers)
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        if more_body:
+            # Streaming: compress as chunks arrive, length unknown up front
+            self.compressor = _StreamCompressor(self.encoding)
+            self._set_encoding_headers(headers)
+            del headers["Content-Length"]
+            await self.send(self.start)
+            data = self.compressor.compress(body)
+            if data:
+                await self.send({"type": "http.response.body", "body": data, "more_body": True})
+            return
+
+        compressed = self._compress_whole(body, headers.get("etag"))
+        self._set_encoding_headers(headers)
+        headers["Content-Length"] = str(len(compressed))
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": compressed})
+
+    def _compress_whole(self, body: bytes, etag: Optional[str]) -> bytes:
+        cache = self.middleware.cache
+        key = None
+        if cache is not None and self.cacheable and self.start["status"] == 200 and etag and not etag.startswith("W/"):
+            # Length guards against an ETag reused for a different body
+            key = (etag, self.encoding, len(body))
+            compressed = cache.get(key)
+            if compressed is not None:
+                return compressed
+        compressed = compress(body, self.encoding)
+        if key is not None:
+            cache.set(key, compressed)
+        return compressed
@@ -0,0 +1,131 @@
+"""
+Conditional GET support (ETag / Last-Modified / 304 Not Modified)
+
+Validators are derived from row versions, never from the serialized body,
+so a request can be answered with 304 before the payload is built:
+
+- single rows: id + coalesce(updated_at, created_at)
+- listings: the request parameters plus an aggregate version of the
+  filtered rows (count, newest modification, highest id), which changes on
+  any insert, update or delete affecting the listing. Callers can cache the
+  aggregate per filter set (see `listing_version`). Listings carry no
+  Last-Modified: after a delete the newest modification can stay the same
+  or go back, so If-Modified-Since could not tell the listing changed.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, List, NamedTuple, Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy import func
+from sqlalchemy.orm import Query
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: Optional[str]  # HTTP-date
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    # SQLite returns naive timestamps (CURRENT_TIMESTAMP is UTC)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def make_validators(*parts: Any, modified: Optional[datetime] = None) -> Validators:
+    """Build a strong ETag from version parts and a Last-Modified header value"""
+    modified = _as_utc(modified)
+    digest = hashlib.sha1(repr((parts, modified)).encode("utf-8")).hexdigest()[:32]
+    last_modified = format_datetime(modified, usegmt=True) if modified else None
+    return Validators(etag=f'"{digest}"', last_modified=last_modified)
+
+
+def row_validators(kind: str, row: Any, *extra: Any) -> Validators:
+    """
+    Validators for one ORM row with id, created_at and (optionally) updated_at
+
+    `extra` are other version parts of the row, for values that change
+    without touching updated_at.
+    """
+    modified = getattr(row, "updated_at", None) or row.created_at
+    return make_validators(kind, row.id, modified, *extra, modified=modified)
+
+
+def listing_version(query: Query, model, *extra: Any) -> List[Any]:
+    """
+    Aggregate version of a filtered listing, from one query (JSON-ready, so it can be cached)
+
+    `query` is the filtered query before ordering and pagination; `extra` are
+    additional aggregate expressions (JSON-ready results) included in the version.
+    """
+    if hasattr(model, "updated_at"):
+        modified_expr = func.coalesce(model.updated_at, model.created_at)
+    else:
+        modified_expr = model.created_at
+
+    count, modified, max_id, *rest = query.order_by(None).with_entities(
+        func.count(model.id), func.max(modified_expr), func.max(model.id), *extra
+    ).one()
+    modified = _as_utc(modified)
+    return [count, max_id, modified.isoformat() if modified else None, *rest]
+
+
+def listing_validators(kind: str, version: List[Any], params: Any) -> Validators:
+    """ETag for a listing page from its `listing_version` and request parameters (no Last-Modified)"""
+    return make_validators(kind, sorted(params, key=str), *version)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison function (RFC 9110 13.1.2)
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in candidates)
+
+
+def _not_modified_since(header: str, last_modified: str) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+        modified = parsedate_to_datetime(last_modified)
+    except (TypeError, ValueError):
+        return False
+    return modified <= since
+
+
+def _headers(validators: Validators) -> dict:
+    headers = {"ETag": validators.etag, "Cache-Control": "no-cache"}
+    if validators.last_modified:
+        headers["Last-Modified"] = validators.last_modified
+    return headers
+
+
+def not_modified(request: Request, validators: Validators) -> Optional[Response]:
+    """
+    Return a 304 response if the client's copy is still current, else None
+
+    If-None-Match takes precedence; If-Modified-Since is only used when the
+    request carries no If-None-Match.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = _etag_matches(if_none_match, validators.etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        fresh = bool(
+            if_modified_since
+            and validators.last_modified
+            and _not_modified_since(if_modified_since, validators.last_modified)
+        )
+
+    if fresh:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_headers(validators))
+    return None
+
+
+def set_validators(response: Response, validators: Validators) -> None:
+    """Attach ETag / Last-Modified to a full (200) response"""
+    response.headers.update(_headers(validators))
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 
 class Settings(BaseSettings):
@@ -42,6 +42,114 @@ class Settings(BaseSettings):
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
     
+    # ==================== PRODUCT CACHE ====================
+    # Backend for the product read cache: memory (per process), redis or none
+    # Example: PRODUCT_CACHE_BACKEND=redis
+    PRODUCT_CACHE_BACKEND: str = "memory"
+    
+    # Max entries kept by the in-process cache
+    PRODUCT_CACHE_MAXSIZE: int = 10000
+    
+    # Seconds a cached product or listing stays valid
+    PRODUCT_CACHE_TTL_SECONDS: int = 60
+    
+    # Redis connection for PRODUCT_CACHE_BACKEND=redis
+    # Without it (or without the redis package) an in-process stand-in is used
+    # Example: REDIS_URL=redis://localhost:6379/0
+    REDIS_URL: Optional[str] = None
+    
+    # ==================== TYPEAHEAD SUGGESTIONS ====================
+    # Seconds between full rebuilds of the in-memory suggestion and fuzzy-search indexes
+    # (writes from other workers show up after at most this long; 0 disables)
+    SUGGEST_REFRESH_SECONDS: int = 300
+    
+    # ==================== COUPONS ====================
+    # Seconds between reloads of the in-memory coupon table (picks up changes made by
+    # other workers or directly in the database; 0 disables)
+    COUPON_REFRESH_SECONDS: int = 60
+    
+    # ==================== SHIPPING ====================
+    # Paid shipping methods are free from this order subtotal on (0 disables)
+    FREE_SHIPPING_MIN_SUBTOTAL: float = 50000
+    
+    # Extra shipping cost per region, e.g. {"Magallanes": 3000} (JSON in .env)
+    SHIPPING_REGION_SURCHARGES: Dict[str, float] = {}
+    
+    # Seconds between reloads of the in-memory shipping rate table (0 disables)
+    SHIPPING_REFRESH_SECONDS: int = 300
+    
+    # ==================== STOCK RESERVATIONS ====================
+    # Seconds a cart holds its stock after the last update of its reservations
+    RESERVATION_TTL_SECONDS: int = 15 * 60
+    
+    # Seconds between releases of expired holds (0 disables), and holds released per batch
+    RESERVATION_SWEEP_SECONDS: int = 30
+    RESERVATION_SWEEP_BATCH: int = 500
+    
+    # ==================== RECOMMENDATIONS ====================
+    # Neighbours stored per product for /api/products/{id}/related
+    RELATED_TOP_K: int = 20
+    
+    # Seconds between incremental refreshes from new orders, run by the scheduler
+    # (python -m app.jobs), not the API (0 disables; full rebuild:
+    # python -m app.recommendations)
+    RELATED_REFRESH_SECONDS: int = 3600
+    
+    # Orders placed within this many seconds are re-checked on every refresh, in
+    # case an order with a lower id commits after a higher one was counted
+    RELATED_RESCAN_SECONDS: int = 900
+    
+    # Neighbours stored per product for /api/products/{id}/similar (content based)
+    SIMILAR_TOP_K: int = 20
+    
+    # Seconds between refreshes for products changed since the last run, run by the
+    # scheduler (python -m app.jobs), not the API (0 disables; full rebuild:
+    # python -m app.similarity --full)
+    SIMILAR_REFRESH_SECONDS: int = 3600
+    
+    # ==================== PRODUCT IMAGES ====================
+    # Directory for rendered image variants (thumbnails / WebP), keyed by content hash
+    IMAGE_CACHE_DIR: str = "image_cache"
+    
+    # Threads rendering variants (requires Pillow: pip install Pillow)
+    IMAGE_WORKERS: int = 2
+    
+    # Encoder quality for WebP / JPEG variants (1-100)
+    IMAGE_QUALITY: int = 80
+    
+    # ==================== RESPONSE COMPRESSION ====================
+    # Responses smaller than this many bytes are sent uncompressed
+    COMPRESSION_MIN_SIZE: int = 1024
+    
+    # gzip level (1-9) and brotli quality (0-11; requires: pip install brotli)
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    
+    # Memory for already-compressed bodies, keyed by ETag (0 disables)
+    COMPRESSION_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    
+    # ==================== ORDER NUMBERS ====================
+    # Order number layout: snowflake (ORD- + 13 chars) or ulid (ORD- + 26 chars)
+    ORDER_NUMBER_FORMAT: str = "snowflake"
+    
+    # Fixed worker id (0-1023); it must differ per process. Unset: each process leases
+    # a free one from the database at startup (fails if all are leased)
+    ORDER_NUMBER_WORKER_ID: Optional[int] = None
+    
+    # Seconds a leased worker id is held; renewed every third of it, and freed for
+    # other processes this long after the holder stops renewing
+    ORDER_NUMBER_LEASE_SECONDS: int = 300
+    
+    # ==================== IDEMPOTENCY KEYS ====================
+    # Seconds a stored order response is replayed to retries with the same Idempotency-Key
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 24 * 60 * 60
+    
+    # Seconds a duplicate waits for the in-flight request with its key before getting 409
+    IDEMPOTENCY_WAIT_SECONDS: float = 10
+    
+    # Seconds between deletions of expired keys (0 disables)
+    IDEMPOTENCY_CLEANUP_SECONDS: int = 3600
+    
     class Config:
         """
         Pydantic configuration
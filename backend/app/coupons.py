@@ -0,0 +1,117 @@
+"""
+Coupon rules engine
+
+Active coupons are held in an in-memory table keyed by code, so validating
+a coupon (cart pages do it on every edit) never touches the database. The
+table is rebuilt from the `coupons` table at startup and every
+COUPON_REFRESH_SECONDS (picks up coupons added or changed in the database).
+Entries stop applying at their `expires_at` without waiting for a refresh.
+
+Discount types:
+- "percentage": `discount_value` percent of the subtotal (0 < value <= 100;
+  coupons outside that range are not loaded)
+- "fixed": `discount_value` off, never more than the subtotal
+- "ship": free shipping (no discount on the products)
+"""
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional
+
+from .database import SessionLocal
+from .models import Coupon
+
+DISCOUNT_TYPES = ("percentage", "fixed", "ship")
+
+
+class CouponError(ValueError):
+    """Coupon cannot be applied; the message is meant for the shopper"""
+
+
+class CouponRule(NamedTuple):
+    code: str
+    discount_type: str
+    discount_value: float
+    min_purchase: float
+    expires_at: Optional[datetime]  # UTC
+
+
+class CouponDiscount(NamedTuple):
+    code: str
+    discount_type: str
+    discount: float
+    free_shipping: bool
+
+
+def normalize_code(code: str) -> str:
+    return code.strip().upper()
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    # SQLite returns naive timestamps
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class CouponTable:
+    """Active coupons by normalized code (replaced as a whole on refresh)"""
+
+    def __init__(self):
+        self._rules: Dict[str, CouponRule] = {}
+        self.loaded = False
+
+    def load(self, db) -> None:
+        rules = {}
+        for coupon in db.query(Coupon).filter(Coupon.is_active == True):
+            if coupon.discount_type == "percentage" and not 0 < (coupon.discount_value or 0) <= 100:
+                print(f"WARNING: Skipping coupon {coupon.code}: percentage must be between 0 and 100")
+                continue
+            rules[normalize_code(coupon.code)] = CouponRule(
+                code=coupon.code,
+                discount_type=coupon.discount_type,
+                discount_value=coupon.discount_value or 0.0,
+                min_purchase=coupon.min_purchase or 0.0,
+                expires_at=_utc(coupon.expires_at),
+            )
+        self._rules = rules
+        self.loaded = True
+
+    def apply(self, code: str, subtotal: float) -> CouponDiscount:
+        """
+        Discount a coupon gives on `subtotal`
+
+        Raises:
+            CouponError: Unknown / inactive code, expired, or minimum purchase not met
+        """
+        if not self.loaded:
+            load_coupon_table()
+
+        rule = self._rules.get(normalize_code(code))
+        if rule is None or rule.discount_type not in DISCOUNT_TYPES:
+            raise CouponError("Invalid coupon code")
+        if rule.expires_at and rule.expires_at < datetime.now(timezone.utc):
+            raise CouponError("Coupon has expired")
+        if subtotal < rule.min_purchase:
+            raise CouponError(f"Minimum purchase of ${rule.min_purchase} required for this coupon")
+
+        if rule.discount_type == "percentage":
+            discount = min(subtotal * rule.discount_value / 100, subtotal)
+        elif rule.discount_type == "fixed":
+            discount = min(rule.discount_value, subtotal)
+        else:  # ship
+            discount = 0.0
+        return CouponDiscount(rule.code, rule.discount_type, discount, rule.discount_type == "ship")
+
+
+# Single instance shared by the routers
+coupon_table = CouponTable()
+
+
+def load_coupon_table() -> None:
+    """(Re)build the coupon table from the database"""
+    db = SessionLocal()
+    try:
+        coupon_table.load(db)
+    finally:
+        db.close()
@@ -0,0 +1,99 @@
+"""
+Streaming catalog export (NDJSON / CSV)
+
+The export is a generator handed to `StreamingResponse`: products are read
+in id order with `yield_per` (a server-side cursor on PostgreSQL) and written
+out in chunks, so memory stays constant whatever the catalog size.
+
+The generator opens its own session, because the request's `get_db` session
+is closed before a streaming body is sent. CSV output uses the same
+conventions as the bulk import (`imagenes` '|'-separated, `specs` as JSON),
+so an export can be fed back to `POST /api/products/import`.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .facets import apply_filters, product_filters
+from .models import Product
+from .projection import load_options, project
+from .search import apply_search
+
+# Rows fetched per round trip / written per chunk
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "|".join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _products(db: Session, fields: List[str], filters: dict, search: Optional[str]) -> Iterator[Product]:
+    query, _ = apply_search(db.query(Product), db, search)
+    query = apply_filters(query.order_by(None), product_filters(db, **filters))
+    query = query.options(load_options(fields)).order_by(Product.id)
+    return query.execution_options(stream_results=True).yield_per(EXPORT_BATCH_SIZE)
+
+
+def _ndjson_lines(products: Iterator[Product], fields: List[str]) -> Iterator[str]:
+    for product in products:
+        yield json.dumps(project(product, fields), ensure_ascii=False, default=_json_default) + "\n"
+
+
+def _csv_lines(products: Iterator[Product], fields: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for product in products:
+        data = project(product, fields)
+        writer.writerow([_csv_cell(data[name]) for name in fields])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_products(fmt: str, fields: List[str], filters: Dict, search: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Yield the encoded export in chunks of EXPORT_BATCH_SIZE rows
+
+    `filters` are keyword arguments for `facets.product_filters()`.
+    """
+    db = SessionLocal()
+    try:
+        products = _products(db, fields, filters, search)
+        lines = _csv_lines(products, fields) if fmt == "csv" else _ndjson_lines(products, fields)
+        chunk = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) >= EXPORT_BATCH_SIZE:
+                yield "".join(chunk).encode("utf-8")
+                chunk = []
+        if chunk:
+            yield "".join(chunk).encode("utf-8")
+    finally:
+        db.close()
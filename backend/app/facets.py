@@ -0,0 +1,143 @@
+"""
+Product filters and faceted navigation
+
+Filters are kept as named groups of SQL conditions so the listing can apply
+all of them, while facet counts use "disjunctive" semantics: each facet is
+counted with every filter except its own, so choosing a brand still shows
+how many products the other brands have under the remaining filters.
+
+Counts come from grouped aggregate queries over `products` (one per facet).
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Query, Session
+
+from .models import Category, Product
+from .search import apply_search
+from .specs import spec_conditions
+
+# Price band edges (CLP); the last band is open ended
+PRICE_BANDS = [0, 10000, 25000, 50000, 100000, 250000]
+
+# Rating facet thresholds ("4 stars & up", ...)
+RATING_THRESHOLDS = [4, 3, 2, 1]
+
+
+def product_filters(
+    db: Session,
+    categoria: Optional[str] = None,
+    marca: Optional[List[str]] = None,
+    precio_min: Optional[float] = None,
+    precio_max: Optional[float] = None,
+    rating_min: Optional[float] = None,
+    en_stock: Optional[bool] = None,
+    destacado: Optional[bool] = None,
+    specs: Optional[Dict[str, dict]] = None,
+) -> Dict[str, list]:
+    """
+    Build the listing filters as {facet name: [conditions]}
+
+    `specs` are spec attribute filters from `specs.parse_spec_filters()`.
+    """
+    filters: Dict[str, list] = {}
+
+    if categoria:
+        category = db.query(Category).filter(Category.name == categoria).first()
+        if category:
+            filters["categoria"] = [Product.categoria_id == category.id]
+
+    if marca:
+        filters["marca"] = [Product.marca.in_(marca)]
+
+    precio = []
+    if precio_min is not None:
+        precio.append(Product.precio >= precio_min)
+    if precio_max is not None:
+        precio.append(Product.precio <= precio_max)
+    if precio:
+        filters["precio"] = precio
+
+    if rating_min is not None:
+        filters["rating"] = [Product.rating >= rating_min]
+
+    if en_stock is not None:
+        filters["en_stock"] = [Product.disponible > 0] if en_stock else [Product.disponible <= 0]
+
+    if destacado is not None:
+        filters["destacado"] = [Product.destacado == destacado]
+
+    if specs:
+        filters.update(spec_conditions(specs))
+
+    return filters
+
+
+def apply_filters(query: Query, filters: Dict[str, list], exclude: Optional[str] = None) -> Query:
+    """Apply every filter group, optionally leaving one facet out"""
+    for name, conditions in filters.items():
+        if name != exclude:
+            query = query.filter(*conditions)
+    return query
+
+
+def _price_band_label(index: int) -> dict:
+    low = PRICE_BANDS[index]
+    high = PRICE_BANDS[index + 1] if index + 1 < len(PRICE_BANDS) else None
+    return {"min": low, "max": high}
+
+
+def compute_facets(db: Session, filters: Dict[str, list], search: Optional[str] = None) -> dict:
+    """Counts per category, brand, price band and rating threshold"""
+    def base(exclude: Optional[str] = None) -> Query:
+        query, _ = apply_search(db.query(Product), db, search)
+        return apply_filters(query.order_by(None), filters, exclude=exclude)
+
+    total = base().with_entities(func.count(Product.id)).scalar()
+
+    categorias = (
+        base("categoria")
+        .join(Category, Category.id == Product.categoria_id)
+        .with_entities(Category.id, Category.name, func.count(Product.id))
+        .group_by(Category.id, Category.name)
+        .order_by(func.count(Product.id).desc(), Category.name)
+        .all()
+    )
+
+    marcas = (
+        base("marca")
+        .filter(Product.marca.isnot(None))
+        .with_entities(Product.marca, func.count(Product.id))
+        .group_by(Product.marca)
+        .order_by(func.count(Product.id).desc(), Product.marca)
+        .all()
+    )
+
+    # Bucket index per row: highest band whose lower edge is <= precio
+    band = case(
+        *[(Product.precio >= edge, i) for i, edge in reversed(list(enumerate(PRICE_BANDS)))],
+        else_=0,
+    )
+    price_counts = dict(
+        base("precio").with_entities(band, func.count(Product.id)).group_by(band).all()
+    )
+
+    rating_row = base("rating").with_entities(
+        *[func.sum(case((Product.rating >= t, 1), else_=0)) for t in RATING_THRESHOLDS]
+    ).one()
+
+    return {
+        "total": total,
+        "categorias": [
+            {"id": cat_id, "name": name, "count": count} for cat_id, name, count in categorias
+        ],
+        "marcas": [{"value": value, "count": count} for value, count in marcas],
+        "precios": [
+            {**_price_band_label(i), "count": price_counts.get(i, 0)}
+            for i in range(len(PRICE_BANDS))
+        ],
+        "ratings": [
+            {"min_rating": t, "count": int(count or 0)}
+            for t, count in zip(RATING_THRESHOLDS, rating_row)
+        ],
+    }
@@ -0,0 +1,128 @@
+"""
+Fast JSON response path
+
+Returning ORM objects through `response_model=` makes FastAPI validate every
+row into Pydantic models and then encode the result with `jsonable_encoder`
+and the stdlib encoder. For hot endpoints that is most of the request time.
+
+Routes opt in by building the payload with the serializers below (ORM row ->
+dict with the same keys and values as the Pydantic response models) and
+returning `fast_response(...)`. A returned Response skips response_model
+processing, but the route keeps its `response_model`, so the OpenAPI schema
+does not change. Bodies are encoded with orjson. Datetimes are left to the
+encoder, which formats them like Pydantic (UTC as 'Z') far faster than
+`isoformat()` in Python.
+
+Benchmark: python -m benchmarks.json_responses
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+from .models import Favorite, Order, OrderItem, Product
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson (same output format as JSONResponse)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> FastJSONResponse:
+    """Encode `content` (JSON types and datetimes), keeping headers already set on `response` (ETag, Link, ...)"""
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    return FastJSONResponse(content=content, status_code=status_code, headers=headers)
+
+
+# ==================== SERIALIZERS ====================
+
+def json_datetime(value: Optional[datetime]) -> Optional[str]:
+    """Datetime in Pydantic's JSON format (UTC as 'Z'), for dicts that must hold only JSON types"""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+    text = value.isoformat()
+    return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+
+def product_dict(product: Product) -> Dict[str, Any]:
+    """`ProductResponse` dict (datetimes not yet encoded, see `json_ready_product`)"""
+    return {
+        "sku": product.sku,
+        "titulo": product.titulo,
+        "categoria_id": product.categoria_id,
+        "marca": product.marca,
+        "precio": float(product.precio),
+        "stock": product.stock,
+        "descripcion": product.descripcion,
+        "imagenes": product.imagenes,
+        "destacado": product.destacado,
+        "specs": product.specs,
+        "id": product.id,
+        "rating": float(product.rating),
+        "vendidos": product.vendidos,
+        "disponible": product.disponible,
+        "created_at": product.created_at,
+    }
+
+
+def json_ready_product(product: Product) -> Dict[str, Any]:
+    """`ProductResponse` dict with only JSON types (for caches and stdlib json)"""
+    data = product_dict(product)
+    data["created_at"] = json_datetime(data["created_at"])
+    return data
+
+
+def order_item_dict(item: OrderItem) -> Dict[str, Any]:
+    """`OrderItemResponse` dict"""
+    return {
+        "product_id": item.product_id,
+        "quantity": item.quantity,
+        "price": float(item.price),
+        "id": item.id,
+        "order_id": item.order_id,
+    }
+
+
+def order_dict(order: Order) -> Dict[str, Any]:
+    """`OrderResponse` dict (reads `order.items`; eager-load them for lists)"""
+    return {
+        "shipping_method": order.shipping_method,
+        "shipping_address": order.shipping_address,
+        "shipping_locality": order.shipping_locality,
+        "shipping_region": order.shipping_region,
+        "coupon_code": order.coupon_code,
+        "id": order.id,
+        "user_id": order.user_id,
+        "order_number": order.order_number,
+        "status": order.status,
+        "subtotal": float(order.subtotal),
+        "shipping_cost": float(order.shipping_cost),
+        "discount": float(order.discount),
+        "total": float(order.total),
+        "items": [order_item_dict(item) for item in order.items],
+        "created_at": order.created_at,
+        "updated_at": order.updated_at,
+    }
+
+
+def favorite_dict(favorite: Favorite, product: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """`FavoriteResponse` dict (`product` overrides the nested product, e.g. projected)"""
+    return {
+        "id": favorite.id,
+        "user_id": favorite.user_id,
+        "product_id": favorite.product_id,
+        "product": product if product is not None else product_dict(favorite.product),
+        "created_at": favorite.created_at,
+    }
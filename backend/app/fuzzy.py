@@ -0,0 +1,198 @@
+"""
+Typo-tolerant search: "did you mean" corrections
+
+The vocabulary is every word of product titles and brands, normalized the
+same way as the suggestion index (lowercase, no accents). Candidates for a
+misspelled word come from a trigram inverted index bucketed by word length,
+so a lookup only touches posting lists of words that could be within the
+edit distance limit; the survivors are scored with a bounded
+Damerau-Levenshtein distance (adjacent transpositions count as one edit).
+Ties go to the more frequent word.
+
+Corrections are returned in their most common original spelling (accents
+kept), since that is what the full-text index matches. Built with the
+suggestion index at startup and on every refresh; product writes in this
+process add their new words right away.
+"""
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import Product
+from .suggest import normalize
+
+# Words shorter than this are never corrected (too many neighbours)
+MIN_WORD_LENGTH = 3
+
+# Most candidates scored with the edit distance per word
+MAX_CANDIDATES = 64
+
+
+def max_edits(word: str) -> int:
+    """Edit budget for a word: 1 up to 5 characters, 2 beyond"""
+    return 1 if len(word) <= 5 else 2
+
+
+def _trigrams(word: str) -> List[str]:
+    padded = f"  {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance between `a` and `b`
+
+    Returns `limit + 1` as soon as the distance is known to exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class FuzzyIndex:
+    """Trigram index over the title/brand vocabulary with edit-distance ranking"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._words: List[str] = []  # word id -> normalized word
+        self._ids: Dict[str, int] = {}  # normalized word -> word id
+        self._frequency: List[int] = []  # word id -> occurrences
+        self._spelling: Dict[str, str] = {}  # normalized word -> display spelling
+        self._grams: Dict[Tuple[str, int], List[int]] = defaultdict(list)  # (trigram, length) -> word ids
+
+    # ---------- building ----------
+
+    def rebuild(self, db: Session) -> None:
+        """Replace the vocabulary with the words of the current products table"""
+        fresh = FuzzyIndex()
+        spellings: Dict[str, Counter] = defaultdict(Counter)
+        for titulo, marca in db.query(Product.titulo, Product.marca).yield_per(1000):
+            for text in (titulo, marca):
+                fresh._add_text(text, spellings)
+
+        for word, counts in spellings.items():
+            fresh._spelling[word] = counts.most_common(1)[0][0]
+
+        with self._lock:
+            self._words = fresh._words
+            self._ids = fresh._ids
+            self._frequency = fresh._frequency
+            self._spelling = fresh._spelling
+            self._grams = fresh._grams
+
+    def _add_text(self, text: Optional[str], spellings: Optional[Dict[str, Counter]] = None) -> None:
+        for raw in (text or "").split():
+            word = normalize(raw)
+            # Skip numbers, model codes and words normalize() splits apart
+            if len(word) < MIN_WORD_LENGTH or not word.isalpha():
+                continue
+            word_id = self._ids.get(word)
+            if word_id is None:
+                word_id = len(self._words)
+                self._ids[word] = word_id
+                self._words.append(word)
+                self._frequency.append(0)
+                for gram in set(_trigrams(word)):
+                    self._grams[(gram, len(word))].append(word_id)
+            self._frequency[word_id] += 1
+
+            spelling = raw.strip(".,;:()[]\"'").lower()
+            if spellings is not None:
+                spellings[word][spelling] += 1
+            else:
+                self._spelling.setdefault(word, spelling)
+
+    def add_product(self, product: Product) -> None:
+        """Add the words of a created or updated product (stale words stay until the next rebuild)"""
+        with self._lock:
+            self._add_text(product.titulo)
+            self._add_text(product.marca)
+
+    # ---------- lookups ----------
+
+    def correct_word(self, word: str) -> Optional[str]:
+        """Closest vocabulary word to the normalized `word`, or None if nothing is close enough"""
+        if word in self._ids or len(word) < MIN_WORD_LENGTH or not word.isalpha():
+            return None
+
+        limit = max_edits(word)
+        grams = set(_trigrams(word))
+        # q-gram lemma: each edit destroys at most 3 of the padded trigrams
+        required = max(1, len(grams) - 3 * limit)
+
+        with self._lock:
+            shared: Counter = Counter()
+            for length in range(len(word) - limit, len(word) + limit + 1):
+                for gram in grams:
+                    postings = self._grams.get((gram, length))
+                    if postings:
+                        shared.update(postings)
+
+            best: Optional[Tuple[int, int, str]] = None
+            for word_id, count in shared.most_common(MAX_CANDIDATES):
+                if count < required:
+                    break
+                candidate = self._words[word_id]
+                distance = edit_distance(word, candidate, limit)
+                if distance > limit:
+                    continue
+                rank = (distance, -self._frequency[word_id], candidate)
+                if best is None or rank < best:
+                    best = rank
+
+        return best[2] if best else None
+
+    def correct(self, q: Optional[str]) -> Optional[str]:
+        """
+        Corrected version of a query, or None when every word is already known
+
+        Known words are kept as typed; unknown ones are replaced with the
+        display spelling of their closest vocabulary word.
+        """
+        words = (q or "").split()
+        corrected = []
+        changed = False
+        for raw in words:
+            replacement = self.correct_word(normalize(raw))
+            if replacement is None:
+                corrected.append(raw)
+            else:
+                corrected.append(self._spelling.get(replacement, replacement))
+                changed = True
+        return " ".join(corrected) if changed else None
+
+    def stats(self) -> dict:
+        return {"words": len(self._words), "trigram_buckets": len(self._grams)}
+
+
+# Single instance shared by the routers
+fuzzy_index = FuzzyIndex()
+
+
+def load_fuzzy_index() -> None:
+    """(Re)build the vocabulary from the database; leaves it untouched on DB errors"""
+    db = SessionLocal()
+    try:
+        fuzzy_index.rebuild(db)
+    except SQLAlchemyError as e:
+        print(f"WARNING: Could not build fuzzy search index: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,166 @@
+"""
+Idempotency-Key support for order creation
+
+Clients that may retry `POST /api/orders` (flaky mobile networks) send an
+`Idempotency-Key` header, unique per logical request. Keys are scoped to the
+user:
+
+1. The first request claims the key by inserting an in-flight row
+   (committed at once, so concurrent duplicates see it) and runs normally.
+   The order id and status are recorded in the order's own transaction;
+   the rendered response body is stored right after.
+2. Retries with the same key get the stored response back (with an
+   `Idempotent-Replayed: true` header) without touching stock or creating
+   another order.
+3. A duplicate arriving while the first request is still running waits up
+   to IDEMPOTENCY_WAIT_SECONDS for it to finish, then gets 409.
+4. Reusing a key with a different request body is rejected with 422.
+
+If the first request fails, its claim is released so the client can retry.
+Rows are deleted by `cleanup_idempotency_keys()` after IDEMPOTENCY_KEY_TTL_SECONDS
+(in-flight claims left behind by a crashed worker after STALE_CLAIM_SECONDS).
+"""
+import asyncio
+import hashlib
+import json
+import time
+from datetime import timedelta
+from typing import Any, Optional
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from .models import IdempotencyKey
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+MAX_KEY_LENGTH = 255
+
+# Seconds between polls while waiting for an in-flight duplicate
+WAIT_POLL_SECONDS = 0.1
+
+# In-flight claims older than this were abandoned (worker crashed mid-request)
+STALE_CLAIM_SECONDS = 300
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Hash of a JSON-ready request body (key order independent)"""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _key_filter(user_id: int, key: str):
+    return and_(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+
+
+async def claim_idempotency_key(db: Session, user_id: int, key: str, payload: Any) -> Optional[IdempotencyKey]:
+    """
+    Claim `key` for a new request, or return the completed earlier one
+
+    Returns None when the key was claimed (run the request), else the
+    completed row to replay.
+
+    Raises:
+        HTTPException: 400 for a malformed key, 422 if the key was used with a
+            different body, 409 if the first request is still running
+    """
+    if not key.strip() or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"
+        )
+
+    fingerprint = request_fingerprint(payload)
+    insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        claimed = db.execute(
+            insert(IdempotencyKey)
+            .values(user_id=user_id, key=key, request_hash=fingerprint)
+            .on_conflict_do_nothing()
+        ).rowcount
+        db.commit()
+        if claimed:
+            return None
+
+        record = db.get(IdempotencyKey, (user_id, key), populate_existing=True)
+        if record is None:
+            continue  # Released or cleaned up in between: claim again
+        if record.request_hash != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request"
+            )
+        if record.status_code is not None:
+            return record
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still being processed"
+            )
+        db.rollback()  # End the read transaction so the next poll sees new commits
+        await asyncio.sleep(WAIT_POLL_SECONDS)
+
+
+def record_idempotent_order(db: Session, user_id: int, key: str, order_id: int, status_code: int) -> None:
+    """Mark the claim as completed by `order_id` (call before committing the order)"""
+    db.execute(
+        update(IdempotencyKey).where(_key_filter(user_id, key))
+        .values(order_id=order_id, status_code=status_code)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def store_idempotent_response(db: Session, user_id: int, key: str, response: Response) -> None:
+    """Keep the rendered response body for replays"""
+    db.execute(
+        update(IdempotencyKey).where(_key_filter(user_id, key))
+        .values(response_body=response.body.decode("utf-8"))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def release_idempotency_key(db: Session, user_id: int, key: str) -> None:
+    """Drop the claim of a failed request so it can be retried"""
+    db.rollback()
+    db.execute(delete(IdempotencyKey).where(_key_filter(user_id, key), IdempotencyKey.status_code.is_(None)))
+    db.commit()
+
+
+def replayed_response(record: IdempotencyKey) -> Optional[Response]:
+    """Stored response of a completed request (None if only the order id was recorded)"""
+    if record.response_body is None:
+        return None
+    return Response(
+        content=record.response_body,
+        status_code=record.status_code,
+        media_type="application/json",
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+def cleanup_idempotency_keys() -> None:
+    """Background job: delete expired keys and abandoned in-flight claims"""
+    db = SessionLocal()
+    try:
+        now = db.scalar(select(func.now()))
+        db.execute(delete(IdempotencyKey).where(or_(
+            IdempotencyKey.created_at < now - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+            and_(
+                IdempotencyKey.status_code.is_(None),
+                IdempotencyKey.created_at < now - timedelta(seconds=STALE_CLAIM_SECONDS),
+            ),
+        )))
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"WARNING: Could not clean up idempotency keys: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,207 @@
+"""
+Product image variants (thumbnails / WebP) with content-hashed URLs
+
+Images in the frontend's `public/img` folder are served through
+`/api/images/<name>.<digest>.<variant>.<format>`, e.g.
+`/api/images/prod1002-1.3fa2c1d0e9b8.thumb.webp`:
+
+- `digest` is a hash of the source file, so a URL always names the same
+  bytes and responses carry `Cache-Control: immutable`; when the source
+  changes, `image_url()` yields a new URL (old ones redirect to it).
+- `variant` is a bounding box (see VARIANTS) and `format` the output encoding.
+
+Variants are rendered on first request in a small thread pool and stored on
+disk under IMAGE_CACHE_DIR/<digest>/. Concurrent requests for the same variant
+wait for a single render. Rendering needs Pillow (listed in requirements.txt);
+without it only the original file is served and `image_url()` points there.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from .config import settings
+
+try:
+    from PIL import Image, ImageOps  # Optional dependency
+except ImportError:
+    Image = None
+
+# Frontend images (backend is at root/backend, frontend at root/frontend)
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+IMAGE_SOURCE_DIR = BASE_DIR / "frontend" / "public" / "img"
+
+IMAGES_URL_PREFIX = "/api/images/"
+
+# Longest side in pixels (None = original size)
+VARIANTS = {"thumb": 160, "card": 480, "large": 1200, "original": None}
+
+# URL extension -> (Pillow format, media type)
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+}
+
+SOURCE_EXTENSIONS = {".png": "png", ".jpg": "jpg", ".jpeg": "jpg", ".webp": "webp"}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+DIGEST_LENGTH = 12
+
+
+class ImageName(NamedTuple):
+    stem: str  # Source path relative to IMAGE_SOURCE_DIR, without extension
+    digest: str
+    variant: str
+    fmt: str
+
+
+def can_render() -> bool:
+    return Image is not None
+
+
+# ==================== SOURCES ====================
+
+_digests: Dict[Tuple[str, int, int], str] = {}
+
+
+def content_digest(path: Path) -> str:
+    """Hash of a file's bytes (memoized per path, size and mtime)"""
+    stat = path.stat()
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    digest = _digests.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        digest = _digests[key] = sha.hexdigest()[:DIGEST_LENGTH]
+    return digest
+
+
+def _inside_source_dir(path: Path) -> bool:
+    try:
+        path.resolve().relative_to(IMAGE_SOURCE_DIR.resolve())
+        return True
+    except ValueError:
+        return False
+
+
+def source_path(source: str) -> Optional[Path]:
+    """File behind a `Product.imagenes` entry such as 'img/prod1002-1.png' (None if not local)"""
+    if not source or "://" in source or source.startswith(IMAGES_URL_PREFIX):
+        return None
+    relative = source.lstrip("/")
+    if relative.startswith("img/"):
+        relative = relative[len("img/"):]
+    path = IMAGE_SOURCE_DIR / relative
+    if path.suffix.lower() not in SOURCE_EXTENSIONS or not _inside_source_dir(path) or not path.is_file():
+        return None
+    return path
+
+
+def find_source(stem: str) -> Optional[Path]:
+    """Source file for a URL stem (any supported extension)"""
+    base = IMAGE_SOURCE_DIR / stem
+    if not _inside_source_dir(base):
+        return None
+    # Probe the few possible names instead of listing the directory
+    for extension in SOURCE_EXTENSIONS:
+        for suffix in (extension, extension.upper()):
+            candidate = base.parent / f"{base.name}{suffix}"
+            if candidate.is_file():
+                return candidate
+    return None
+
+
+def image_url(source: str, variant: str = "card", fmt: str = "webp") -> str:
+    """
+    Content-hashed URL of a variant of a product image
+
+    Entries that are not local images (external URLs, already hashed URLs) are
+    returned unchanged. Without Pillow the URL points to the original file.
+    """
+    path = source_path(source)
+    if path is None:
+        return source
+    if not can_render():
+        variant, fmt = "original", SOURCE_EXTENSIONS[path.suffix.lower()]
+    stem = path.relative_to(IMAGE_SOURCE_DIR).with_suffix("").as_posix()
+    return f"{IMAGES_URL_PREFIX}{stem}.{content_digest(path)}.{variant}.{fmt}"
+
+
+def parse_image_name(name: str) -> Optional[ImageName]:
+    """Split '<stem>.<digest>.<variant>.<format>' (None if malformed)"""
+    parts = name.rsplit(".", 3)
+    if len(parts) != 4:
+        return None
+    parsed = ImageName(*parts)
+    if not parsed.stem or parsed.variant not in VARIANTS or parsed.fmt not in FORMATS:
+        return None
+    return parsed
+
+
+# ==================== RENDERING ====================
+
+def _render(source: Path, target: Path, size: Optional[int], fmt: str) -> None:
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if size:
+            image.thumbnail((size, size), Image.LANCZOS)
+        pil_format = FORMATS[fmt][0]
+        if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        # Write next to the target and rename, so readers never see a partial file
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}")
+        image.save(partial, pil_format, quality=settings.IMAGE_QUALITY, optimize=True)
+        os.replace(partial, target)
+
+
+class VariantStore:
+    """Renders variants once in a thread pool; concurrent requests share the render"""
+
+    def __init__(self, root: Path, workers: int):
+        self.root = root
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[Path, Future] = {}
+        self._lock = threading.Lock()
+
+    def path(self, name: ImageName) -> Path:
+        return self.root / name.digest / f"{name.variant}.{name.fmt}"
+
+    async def get(self, source: Path, name: ImageName) -> Path:
+        """Path of the rendered variant, rendering it first if needed"""
+        target = self.path(name)
+        if target.exists():
+            return target
+
+        with self._lock:
+            future = self._inflight.get(target)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="image-variants")
+                future = self._executor.submit(_render, source, target, VARIANTS[name.variant], name.fmt)
+                self._inflight[target] = future
+                future.add_done_callback(lambda _: self._forget(target))
+        await asyncio.wrap_future(future)
+        return target
+
+    def _forget(self, target: Path) -> None:
+        with self._lock:
+            self._inflight.pop(target, None)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Single instance shared by the routers
+variant_store = VariantStore(Path(settings.IMAGE_CACHE_DIR), settings.IMAGE_WORKERS)
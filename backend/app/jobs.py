@@ -0,0 +1,48 @@
+"""
+Scheduler for the offline recommendation jobs: python -m app.jobs
+
+These jobs read the whole catalog or order history and can take minutes,
+so they do not run in the API workers. Run exactly one scheduler per
+deployment (the `jobs` service in docker-compose.yml). Each job runs at
+startup and then every *_REFRESH_SECONDS of its own (0 disables it). Jobs lock
+their checkpoint row while running, so a second scheduler started by
+mistake waits instead of doing the same work twice.
+"""
+import time
+from typing import Callable, List, Tuple
+
+from .config import settings
+from .recommendations import refresh_related_products
+from .similarity import refresh_similar_products_job
+
+
+def scheduled_jobs() -> List[Tuple[float, Callable[[], None]]]:
+    """Enabled (seconds, job) pairs"""
+    jobs = [
+        (settings.RELATED_REFRESH_SECONDS, refresh_related_products),
+        (settings.SIMILAR_REFRESH_SECONDS, refresh_similar_products_job),
+    ]
+    return [(seconds, job) for seconds, job in jobs if seconds > 0]
+
+
+def run_scheduler() -> None:
+    """Run the enabled jobs forever, one at a time"""
+    jobs = scheduled_jobs()
+    if not jobs:
+        print("No jobs enabled")
+        return
+
+    next_run = [time.monotonic()] * len(jobs)
+    while True:
+        index = min(range(len(jobs)), key=next_run.__getitem__)
+        time.sleep(max(0.0, next_run[index] - time.monotonic()))
+        seconds, job = jobs[index]
+        try:
+            job()
+        except Exception as e:
+            print(f"WARNING: Job {job.__name__} failed: {e}")
+        next_run[index] = time.monotonic() + seconds
+
+
+if __name__ == "__main__":
+    run_scheduler()
@@ -1,14 +1,82 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
-from .routers import auth, products, categories, reviews, favorites, orders
+from .routers import auth, products, categories, reviews, favorites, orders, images, coupons, shipping, checkout, reservations
+from .cache import product_cache
+from .suggest import load_suggest_index
+from .fuzzy import load_fuzzy_index
+from .background import run_periodically
+from .images import IMAGE_SOURCE_DIR, variant_store
+from .compression import CompressionMiddleware, compressed_cache
+from .idempotency import REPLAYED_HEADER, cleanup_idempotency_keys
+from .coupons import load_coupon_table
+from .checkout import load_rate_table
+from .reservations import release_expired_reservations
+from .order_numbers import release_worker_lease, renew_worker_lease, start_order_numbers
 from fastapi.staticfiles import StaticFiles
 import os
 
-# Define path to frontend public images
-# Assuming backend is at root/backend and frontend is at root/frontend
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-IMG_DIR = os.path.join(BASE_DIR, "frontend", "public", "img")
+IMG_DIR = str(IMAGE_SOURCE_DIR)
+
+
+def load_search_indexes() -> None:
+    """Build the in-memory suggestion and fuzzy-search indexes from the database"""
+    load_suggest_index()
+    load_fuzzy_index()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup / shutdown hooks
+    
+    - Builds the in-memory suggestion / fuzzy-search indexes and keeps them refreshed
+    - Loads the in-memory coupon table and keeps it refreshed
+    - Builds the in-memory shipping rate table and keeps it refreshed
+    - Deletes expired order idempotency keys
+    - Releases the stock of expired cart reservations
+    - Leases this process's order number worker id and keeps the lease
+    """
+    start_order_numbers()
+    load_search_indexes()
+    load_coupon_table()
+    load_rate_table()
+    background = []
+    if settings.SUGGEST_REFRESH_SECONDS > 0:
+        background.append(asyncio.create_task(
+            run_periodically(settings.SUGGEST_REFRESH_SECONDS, load_search_indexes)
+        ))
+    if settings.COUPON_REFRESH_SECONDS > 0:
+        background.append(asyncio.create_task(
+            run_periodically(settings.COUPON_REFRESH_SECONDS, load_coupon_table)
+        ))
+    if settings.SHIPPING_REFRESH_SECONDS > 0:
+        background.append(asyncio.create_task(
+            run_periodically(settings.SHIPPING_REFRESH_SECONDS, load_rate_table)
+        ))
+    if settings.IDEMPOTENCY_CLEANUP_SECONDS > 0:
+        background.append(asyncio.create_task(
+            run_periodically(settings.IDEMPOTENCY_CLEANUP_SECONDS, cleanup_idempotency_keys)
+        ))
+    if settings.RESERVATION_SWEEP_SECONDS > 0:
+        background.append(asyncio.create_task(
+            run_periodically(settings.RESERVATION_SWEEP_SECONDS, release_expired_reservations)
+        ))
+    if settings.ORDER_NUMBER_WORKER_ID is None:
+        background.append(asyncio.create_task(
+            run_periodically(settings.ORDER_NUMBER_LEASE_SECONDS / 3, renew_worker_lease)
+        ))
+    
+    yield
+    
+    for task in background:
+        task.cancel()
+    variant_store.shutdown()
+    release_worker_lease()
+
 
 app = FastAPI(
     title="Mini-Amazon API",
@@ -23,6 +91,9 @@ app = FastAPI(
     * **Reviews**: User product reviews with rating system
     * **Favorites**: User favorite products management
     * **Orders**: Complete order processing with cart and checkout
+    * **Cart reservations**: Stock held for a cart for a limited time
+    * **Coupons**: Discount and free-shipping coupons validated against the cart
+    * **Shipping & checkout**: Shipping methods, localities and whole-cart quotes
     
     ## Security
     
@@ -38,6 +109,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # CORS Configuration
@@ -49,6 +121,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Link", "X-Next-Cursor", "ETag", "Last-Modified", "X-Did-You-Mean", REPLAYED_HEADER],
+)
+
+# gzip / brotli, reusing compressed bodies of hot GETs by ETag
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    cache=compressed_cache if settings.COMPRESSION_CACHE_MAX_BYTES > 0 else None,
 )
 
 # Mount static files
@@ -64,6 +144,11 @@ app.include_router(categories.router)
 app.include_router(reviews.router)
 app.include_router(favorites.router)
 app.include_router(orders.router)
+app.include_router(images.router)
+app.include_router(coupons.router)
+app.include_router(shipping.router)
+app.include_router(checkout.router)
+app.include_router(reservations.router)
 
 
 @app.get("/", tags=["Root"])
@@ -89,3 +174,19 @@ async def health_check():
         "status": "healthy",
         "service": "mini-amazon-api"
     }
+
+
+@app.get("/health/cache", tags=["Root"])
+async def cache_stats():
+    """
+    Product cache counters (hits, misses, evictions, size) for sizing the cache
+    """
+    return product_cache.info()
+
+
+@app.get("/health/compression", tags=["Root"])
+async def compression_stats():
+    """
+    Compressed-body cache counters (entries, bytes, hits, misses) for sizing the cache
+    """
+    return compressed_cache.info()
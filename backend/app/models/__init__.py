@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Text, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Text, JSON, Index, case
+from sqlalchemy.orm import column_property, relationship
 from sqlalchemy.sql import func
 from ..database import Base
 
@@ -43,23 +43,57 @@ class Product(Base):
     sku = Column(String(50), unique=True, nullable=False, index=True)
     titulo = Column(String(255), nullable=False)
     categoria_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
-    marca = Column(String(100), nullable=True)
+    marca = Column(String(100), nullable=True, index=True)
     precio = Column(Float, nullable=False)
     rating = Column(Float, default=0.0)
     stock = Column(Integer, default=0)
     descripcion = Column(Text, nullable=True)
     imagenes = Column(JSON, default=list)  # Array of image URLs
     vendidos = Column(Integer, default=0)
+    reservado = Column(Integer, nullable=False, default=0, server_default="0")  # Held by carts (app.reservations)
     destacado = Column(Boolean, default=False)
     specs = Column(JSON, default=dict)  # Product specifications as JSON
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Stock not held by cart reservations (what listings show and filter on)
+    disponible = column_property(case((stock > reservado, stock - reservado), else_=0))
+    
     # Relationships
     category = relationship("Category", back_populates="products")
     reviews = relationship("Review", back_populates="product", cascade="all, delete-orphan")
     order_items = relationship("OrderItem", back_populates="product")
     favorites = relationship("Favorite", back_populates="product", cascade="all, delete-orphan")
+    
+    # Composite indexes backing keyset pagination (sort column + id tiebreaker)
+    __table_args__ = (
+        Index("ix_products_created_at_id", "created_at", "id"),
+        Index("ix_products_precio_id", "precio", "id"),
+        Index("ix_products_vendidos_id", "vendidos", "id"),
+        Index("ix_products_categoria_id_id", "categoria_id", "id"),
+    )
+
+
+class ProductSpec(Base):
+    """
+    One spec attribute of a product, extracted from `Product.specs` for filtering
+    
+    Keys and values are normalized (lowercase, no accents); `value_num` holds the
+    leading number of the value ("15 cm" -> 15) for range filters. Maintained by
+    `app.specs`, never written directly.
+    """
+    __tablename__ = "product_specs"
+    
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(100), primary_key=True)
+    value = Column(String(255), nullable=False)
+    value_num = Column(Float, nullable=True)
+    
+    # Equality and range lookups by attribute, covering the product id
+    __table_args__ = (
+        Index("ix_product_specs_key_value", "key", "value", "product_id"),
+        Index("ix_product_specs_key_value_num", "key", "value_num", "product_id"),
+    )
 
 
 class Review(Base):
@@ -76,6 +110,11 @@ class Review(Base):
     # Relationships
     product = relationship("Product", back_populates="reviews")
     user = relationship("User", back_populates="reviews")
+    
+    # Per-product listing, newest first (keyset pagination)
+    __table_args__ = (
+        Index("ix_reviews_product_id_created_at_id", "product_id", "created_at", "id"),
+    )
 
 
 class Coupon(Base):
@@ -85,7 +124,7 @@ class Coupon(Base):
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String(50), unique=True, nullable=False, index=True)
     description = Column(String(255), nullable=True)
-    discount_type = Column(String(20), nullable=False)  # "percentage" or "fixed"
+    discount_type = Column(String(20), nullable=False)  # "percentage", "fixed" or "ship" (free shipping)
     discount_value = Column(Float, nullable=False)
     min_purchase = Column(Float, default=0)
     is_active = Column(Boolean, default=True)
@@ -124,6 +163,11 @@ class Order(Base):
     # Relationships
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
+    
+    # Per-user order history, newest first (keyset pagination)
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
 
 class OrderItem(Base):
@@ -139,6 +183,58 @@ class OrderItem(Base):
     # Relationships
     order = relationship("Order", back_populates="items")
     product = relationship("Product", back_populates="order_items")
+    
+    # Basket lookups (co-purchase counting joins order lines on order_id)
+    __table_args__ = (
+        Index("ix_order_items_order_id_product_id", "order_id", "product_id"),
+    )
+
+
+class ProductCoPurchase(Base):
+    """
+    Number of orders containing both products (symmetric, one row per direction)
+    
+    The diagonal row (product_id == other_id) holds the number of orders that
+    contain the product. Accumulated by `app.recommendations`.
+    """
+    __tablename__ = "product_copurchases"
+    
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    other_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+
+
+class CoPurchaseOrder(Base):
+    """
+    Order already added to `product_copurchases` above the checkpoint
+
+    Orders commit out of id order, so the job re-scans ids above its checkpoint
+    and uses these rows to skip what it counted before. Rows at or below the
+    checkpoint are pruned.
+    """
+    __tablename__ = "copurchase_orders"
+    
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), primary_key=True)
+    run = Column(Integer, nullable=False, index=True)  # Refresh that counted the order
+
+
+class RelatedProduct(Base):
+    """Precomputed top-K neighbours of a product, by rank"""
+    __tablename__ = "related_products"
+    
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String(20), primary_key=True)  # "copurchase" or "content"
+    rank = Column(Integer, primary_key=True)  # 1 = best
+    related_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)
+
+
+class ProductTerms(Base):
+    """Weighted term bag of a product, as last indexed by `app.similarity`"""
+    __tablename__ = "product_terms"
+    
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    terms = Column(JSON, nullable=False)  # term -> weighted count
 
 
 class Favorite(Base):
@@ -182,3 +278,68 @@ class Locality(Base):
     region = Column(String(100), nullable=True)
     country = Column(String(100), default="Chile")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class JobCheckpoint(Base):
+    """Progress marker of an incremental background job (last processed id or modification time)"""
+    __tablename__ = "job_checkpoints"
+    
+    name = Column(String(100), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    covered_until = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class IdempotencyKey(Base):
+    """Outcome of a request sent with an Idempotency-Key header, replayed to its retries"""
+    __tablename__ = "idempotency_keys"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)  # Same key with another body is rejected
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is in flight
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="SET NULL"), nullable=True)
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # TTL cleanup scans by age
+    __table_args__ = (
+        Index("ix_idempotency_keys_created_at", "created_at"),
+    )
+
+
+class UserOrderSummary(Base):
+    """Running order totals per user, updated when an order is placed"""
+    __tablename__ = "user_order_summaries"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    total_spent = Column(Float, nullable=False, default=0)
+    last_order_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class StockReservation(Base):
+    """Stock held for a user's cart until `expires_at` (counted in `Product.reservado`)"""
+    __tablename__ = "stock_reservations"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # One hold per cart line; the sweeper scans by expiry
+    __table_args__ = (
+        Index("ix_stock_reservations_user_id_product_id", "user_id", "product_id", unique=True),
+        Index("ix_stock_reservations_expires_at", "expires_at"),
+    )
+
+
+class OrderNumberWorker(Base):
+    """Worker id (0-1023) leased by a running process for its order numbers"""
+    __tablename__ = "order_number_workers"
+    
+    worker_id = Column(Integer, primary_key=True, autoincrement=False)
+    owner = Column(String(100), nullable=False)  # host:pid:random of the process holding it
+    expires_at = Column(DateTime(timezone=True), nullable=False)
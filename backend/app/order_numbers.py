@@ -0,0 +1,240 @@
+"""
+Order numbers: monotonic, k-sortable and unique without randomness
+
+Random suffixes relied on the unique index on `orders.order_number` to catch
+collisions, which surfaced as 500s under bursts across workers. Numbers are
+now packed from (milliseconds, worker id, sequence):
+
+- unique across processes and hosts: each process leases a worker id from
+  the `order_number_workers` table at startup and renews the lease in the
+  background (or uses a fixed ORDER_NUMBER_WORKER_ID, which must then differ
+  per process); startup fails if all 1024 ids are leased
+- no database round trip per number and no lock held longer than a few integer ops
+- encoded in Crockford base32, whose alphabet is in ASCII order, so numbers
+  sort by creation time and inserts land at the right end of the index
+
+Within one millisecond the sequence counts up; if it runs out, or the clock
+goes back, the generator keeps counting from the last millisecond it used
+instead of repeating a number.
+
+Formats (ORDER_NUMBER_FORMAT):
+- "snowflake": 41-bit ms since 2024-01-01, 10-bit worker, 12-bit sequence
+  -> ORD-0ABCDEFGHJKMN (13 chars)
+- "ulid": ULID layout (48-bit Unix ms, then 10-bit worker and 70-bit
+  sequence instead of random bits) -> ORD-01ARZ3NDEKTSV4RRFFQ69G5FAV
+"""
+import os
+import secrets
+import socket
+import threading
+import time
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from .models import OrderNumberWorker
+
+CROCKFORD_BASE32 = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+ORDER_NUMBER_PREFIX = "ORD-"
+
+
+def encode_base32(value: int, length: int) -> str:
+    """Crockford base32, zero-padded to `length` characters"""
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(CROCKFORD_BASE32[digit])
+    return "".join(reversed(chars))
+
+
+class OrderNumberGenerator:
+    """Packs (milliseconds since EPOCH_MS, worker id, sequence) into increasing integers"""
+
+    TIMESTAMP_BITS = 41
+    WORKER_BITS = 10
+    SEQUENCE_BITS = 12
+    EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+    LENGTH = 13  # base32 characters
+
+    def __init__(self, worker_id: int):
+        if not 0 <= worker_id < 1 << self.WORKER_BITS:
+            raise ValueError(f"Worker id must be between 0 and {(1 << self.WORKER_BITS) - 1}")
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self) -> int:
+        now = time.time_ns() // 1_000_000 - self.EPOCH_MS
+        with self._lock:
+            if now > self._last_ms:
+                self._last_ms, self._sequence = now, 0
+            else:
+                # Same millisecond, or the clock went back: keep counting
+                self._sequence += 1
+                if self._sequence >> self.SEQUENCE_BITS:
+                    self._last_ms, self._sequence = self._last_ms + 1, 0
+            timestamp, sequence = self._last_ms, self._sequence
+        return (
+            timestamp << (self.WORKER_BITS + self.SEQUENCE_BITS)
+            | self.worker_id << self.SEQUENCE_BITS
+            | sequence
+        )
+
+    def next_number(self) -> str:
+        return ORDER_NUMBER_PREFIX + encode_base32(self.next_id(), self.LENGTH)
+
+
+class ULIDGenerator(OrderNumberGenerator):
+    """ULID-compatible layout: readable by ULID tools, time-ordered like them"""
+
+    TIMESTAMP_BITS = 48
+    WORKER_BITS = 10
+    SEQUENCE_BITS = 70
+    EPOCH_MS = 0
+    LENGTH = 26
+
+
+GENERATORS = {"snowflake": OrderNumberGenerator, "ulid": ULIDGenerator}
+
+
+def create_generator(name: str, worker_id: int) -> OrderNumberGenerator:
+    """Build the generator selected in settings (snowflake or ulid)"""
+    if name not in GENERATORS:
+        raise ValueError(f"Unknown ORDER_NUMBER_FORMAT '{name}'. Must be one of: {', '.join(GENERATORS)}")
+    return GENERATORS[name](worker_id)
+
+
+# ==================== WORKER ID LEASES ====================
+
+def lease_worker_id(db: Session, owner: str, seconds: int) -> int:
+    """
+    Lease a free worker id for `seconds` (an expired lease is taken over) and commit
+
+    Raises:
+        RuntimeError: If every worker id is leased
+    """
+    now = db.scalar(select(func.now()))
+    expires_at = now + timedelta(seconds=seconds)
+
+    expired = db.scalars(
+        select(OrderNumberWorker.worker_id).where(OrderNumberWorker.expires_at < now)
+        .order_by(OrderNumberWorker.worker_id)
+    ).all()
+    for worker_id in expired:
+        # Re-checked on update: another process may take it first
+        taken_over = db.execute(
+            update(OrderNumberWorker)
+            .where(OrderNumberWorker.worker_id == worker_id, OrderNumberWorker.expires_at < now)
+            .values(owner=owner, expires_at=expires_at)
+        ).rowcount
+        db.commit()
+        if taken_over:
+            return worker_id
+
+    leased = set(db.scalars(select(OrderNumberWorker.worker_id)).all())
+    for worker_id in range(1 << OrderNumberGenerator.WORKER_BITS):
+        if worker_id in leased:
+            continue
+        db.add(OrderNumberWorker(worker_id=worker_id, owner=owner, expires_at=expires_at))
+        try:
+            db.commit()
+            return worker_id
+        except IntegrityError:
+            # Another process inserted it first
+            db.rollback()
+    raise RuntimeError("No free order number worker id: all of them are leased")
+
+
+def renew_worker_id(db: Session, worker_id: int, owner: str, seconds: int) -> bool:
+    """Extend our lease and commit; False if it expired and another process took it"""
+    now = db.scalar(select(func.now()))
+    renewed = db.execute(
+        update(OrderNumberWorker)
+        .where(OrderNumberWorker.worker_id == worker_id, OrderNumberWorker.owner == owner)
+        .values(expires_at=now + timedelta(seconds=seconds))
+    ).rowcount
+    db.commit()
+    return bool(renewed)
+
+
+# Generator of this process, set by start_order_numbers()
+order_number_generator: Optional[OrderNumberGenerator] = None
+_lease_owner: Optional[str] = None
+_start_lock = threading.Lock()
+
+
+def _lease_generator() -> OrderNumberGenerator:
+    global _lease_owner
+    # Taken when leasing (not at import) so forked workers get their own owner
+    _lease_owner = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+    db = SessionLocal()
+    try:
+        worker_id = lease_worker_id(db, _lease_owner, settings.ORDER_NUMBER_LEASE_SECONDS)
+    finally:
+        db.close()
+    return create_generator(settings.ORDER_NUMBER_FORMAT, worker_id)
+
+
+def start_order_numbers() -> None:
+    """
+    Set up this process's generator (application startup; also done on first use)
+
+    Uses ORDER_NUMBER_WORKER_ID when set, otherwise leases a worker id.
+
+    Raises:
+        RuntimeError: If no worker id is free
+    """
+    global order_number_generator
+    with _start_lock:
+        if order_number_generator is not None:
+            return
+        if settings.ORDER_NUMBER_WORKER_ID is not None:
+            order_number_generator = create_generator(settings.ORDER_NUMBER_FORMAT, settings.ORDER_NUMBER_WORKER_ID)
+        else:
+            order_number_generator = _lease_generator()
+
+
+def renew_worker_lease() -> None:
+    """Background job: keep the worker id lease; lease another id if it was lost"""
+    global order_number_generator
+    if _lease_owner is None or order_number_generator is None:
+        return
+    db = SessionLocal()
+    try:
+        renewed = renew_worker_id(
+            db, order_number_generator.worker_id, _lease_owner, settings.ORDER_NUMBER_LEASE_SECONDS
+        )
+    finally:
+        db.close()
+    if not renewed:
+        print(f"WARNING: Order number worker id {order_number_generator.worker_id} lease lost, leasing another")
+        with _start_lock:
+            order_number_generator = _lease_generator()
+
+
+def release_worker_lease() -> None:
+    """Give the leased worker id back (application shutdown)"""
+    if _lease_owner is None or order_number_generator is None:
+        return
+    db = SessionLocal()
+    try:
+        db.execute(delete(OrderNumberWorker).where(
+            OrderNumberWorker.worker_id == order_number_generator.worker_id,
+            OrderNumberWorker.owner == _lease_owner,
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def next_order_number() -> str:
+    if order_number_generator is None:
+        start_order_numbers()
+    return order_number_generator.next_number()
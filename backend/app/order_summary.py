@@ -0,0 +1,67 @@
+"""
+Per-user order summary (order count, lifetime spend, last order date)
+
+Kept in `user_order_summaries` and updated by `add_order()` with one upsert
+in the transaction that places the order, so reading it is a primary-key
+lookup instead of an aggregate over the user's whole history. Totals count
+every placed order, whatever its later status.
+
+Rebuild from the orders table: python -m app.order_summary
+"""
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import Order, UserOrderSummary
+from .schemas import OrderSummary
+
+
+def add_order(db: Session, user_id: int, total: float) -> None:
+    """Count a new order in the user's summary (caller commits with the order)"""
+    upsert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+    stmt = upsert(UserOrderSummary).values(
+        user_id=user_id, order_count=1, total_spent=total, last_order_at=func.now()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserOrderSummary.user_id],
+        set_={
+            "order_count": UserOrderSummary.order_count + 1,
+            "total_spent": UserOrderSummary.total_spent + stmt.excluded.total_spent,
+            "last_order_at": stmt.excluded.last_order_at,
+        },
+    )
+    db.execute(stmt)
+
+
+def get_order_summary(db: Session, user_id: int) -> OrderSummary:
+    summary = db.get(UserOrderSummary, user_id)
+    if summary is None:
+        return OrderSummary()
+    return OrderSummary.model_validate(summary)
+
+
+def rebuild_order_summaries(db: Session) -> int:
+    """Recompute every summary from the orders table and commit; returns the number of users"""
+    db.execute(delete(UserOrderSummary))
+    totals = (
+        select(Order.user_id, func.count(Order.id), func.sum(Order.total), func.max(Order.created_at))
+        .group_by(Order.user_id)
+    )
+    result = db.execute(
+        insert(UserOrderSummary).from_select(
+            ["user_id", "order_count", "total_spent", "last_order_at"], totals
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    # Full rebuild: python -m app.order_summary
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt order summaries of {rebuild_order_summaries(session)} users")
+    finally:
+        session.close()
@@ -0,0 +1,169 @@
+"""
+Keyset (cursor) pagination helpers
+
+Listings are ordered by a fixed list of sort keys that always ends with a
+unique column (the primary key), so the last row of a page identifies where
+the next page starts. The position is handed to clients as an opaque cursor
+and the next page is fetched with `WHERE (keys) > (cursor values)` instead of
+OFFSET, which keeps deep pages as cheap as the first one when a matching
+composite index exists.
+
+The response body stays a plain list; the cursor for the next page is sent
+in the `X-Next-Cursor` header and as a `Link: <...>; rel="next"` header.
+"""
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import String, and_, literal, or_, tuple_
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Page size for cursor requests on listings that have no default limit
+DEFAULT_PAGE_SIZE = 20
+
+
+class SortKey(NamedTuple):
+    """One column of a keyset ordering"""
+    expr: Any
+    descending: bool = False
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(sort: str, values: List[Any]) -> str:
+    """Encode the sort name and key values of a row into an opaque cursor"""
+    payload = {
+        "s": sort,
+        "v": [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _fits(value: Any, key: SortKey) -> bool:
+    """Whether a decoded cursor value can be compared with the key's column"""
+    if value is None:
+        return True
+    try:
+        expected = key.expr.type.python_type
+    except (AttributeError, NotImplementedError):
+        return True
+    if isinstance(value, bool):
+        return expected is bool
+    if expected in (float, Decimal):
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor: str, sort: str, keys: List[SortKey]) -> List[Any]:
+    """
+    Decode a cursor produced by `encode_cursor`
+
+    Every value must match the type of its sort column, so a crafted cursor
+    never reaches the database as a comparison it would reject.
+
+    Raises:
+        HTTPException: If the cursor is malformed, belongs to another sort order
+            or holds values of the wrong type
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid pagination cursor"
+    )
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = [
+            datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v
+            for v in payload["v"]
+        ]
+    except (ValueError, TypeError, KeyError):
+        raise invalid
+
+    if payload.get("s") != sort or len(values) != len(keys):
+        raise invalid
+    if not all(_fits(value, key) for value, key in zip(values, keys)):
+        raise invalid
+    return values
+
+
+def _bind_value(value: Any, dialect: str) -> Any:
+    # SQLite keeps DateTime as text and server_default (CURRENT_TIMESTAMP)
+    # values have no fractional part, so compare with the stored text form
+    # rather than SQLAlchemy's microsecond-padded one
+    if dialect == "sqlite" and isinstance(value, datetime):
+        fmt = "%Y-%m-%d %H:%M:%S.%f" if value.microsecond else "%Y-%m-%d %H:%M:%S"
+        return literal(value.strftime(fmt), String())
+    return value
+
+
+def _after(keys: List[SortKey], values: List[Any]):
+    """WHERE clause selecting rows strictly after `values` in `keys` order"""
+    if len({key.descending for key in keys}) == 1:
+        # Same direction on every key: a row-value comparison lets the
+        # database seek straight into the composite index
+        left = tuple_(*[key.expr for key in keys])
+        right = tuple_(*values)
+        return left < right if keys[0].descending else left > right
+
+    clauses = []
+    for i, key in enumerate(keys):
+        equal = [keys[j].expr == values[j] for j in range(i)]
+        step = key.expr < values[i] if key.descending else key.expr > values[i]
+        clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+
+def paginate(
+    query: Query,
+    keys: List[SortKey],
+    sort: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+) -> Page:
+    """
+    Fetch one page of `query` ordered by `keys`
+
+    With a cursor the page starts right after the cursor position; without
+    one, `skip` is applied as a plain offset (kept for older clients). In both
+    cases a cursor for the following page is returned when more rows exist.
+    """
+    query = query.order_by(None).order_by(
+        *[key.expr.desc() if key.descending else key.expr.asc() for key in keys]
+    )
+
+    if cursor:
+        dialect = query.session.get_bind().dialect.name
+        values = [_bind_value(v, dialect) for v in decode_cursor(cursor, sort, keys)]
+        query = query.filter(_after(keys, values))
+    elif skip:
+        query = query.offset(skip)
+
+    # Select the key values alongside the entity and read one extra row to
+    # know whether there is a next page
+    rows: List[Tuple] = query.add_columns(*[key.expr for key in keys]).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sort, list(rows[-1][1:]))
+
+    return Page(items=[row[0] for row in rows], next_cursor=next_cursor)
+
+
+def set_next_cursor(request: Request, response: Response, next_cursor: Optional[str]) -> None:
+    """Advertise the next page through the X-Next-Cursor and Link headers"""
+    if not next_cursor:
+        return
+    next_url = request.url.remove_query_params("skip").include_query_params(cursor=next_cursor)
+    response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
@@ -0,0 +1,92 @@
+"""
+Sparse fieldsets for product responses
+
+`fields=` selects which product fields a listing returns, either by name
+(`fields=id,titulo,precio`) or through a preset (`fields=card`). Only the
+matching columns are loaded (`load_only`), so large columns such as
+descripcion, specs and imagenes are neither read nor serialized unless
+asked for.
+
+`imagen` is a virtual field holding the first entry of `imagenes`, which is
+all a product card needs; `miniatura` is the content-hashed thumbnail URL of
+that image (see `app.images`).
+"""
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import load_only
+
+from .fastjson import FastJSONResponse, fast_response
+from .images import image_url
+from .models import Product
+from .schemas import ProductResponse
+
+VIRTUAL_FIELDS = {"imagen": "imagenes", "miniatura": "imagenes"}
+
+PRODUCT_FIELDS = list(ProductResponse.model_fields) + list(VIRTUAL_FIELDS)
+
+FIELD_PRESETS = {
+    # Grid / card views: no description, specs or image gallery
+    "card": ["id", "sku", "titulo", "marca", "precio", "rating", "stock", "disponible", "destacado", "imagen", "miniatura"],
+    # Same fields as the full ProductResponse
+    "detail": list(ProductResponse.model_fields),
+}
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Expand a `fields=` value into field names (None = full response)
+
+    Raises:
+        HTTPException: If an unknown field or preset is requested
+    """
+    if not fields:
+        return None
+
+    selected: List[str] = []
+    for name in (part.strip() for part in fields.split(",")):
+        if not name:
+            continue
+        if name in FIELD_PRESETS:
+            selected.extend(FIELD_PRESETS[name])
+        elif name in PRODUCT_FIELDS:
+            selected.append(name)
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown field '{name}'. Valid fields: {', '.join(PRODUCT_FIELDS)}; "
+                       f"presets: {', '.join(FIELD_PRESETS)}"
+            )
+
+    # id is always returned so clients can reference the product
+    return list(dict.fromkeys(["id"] + selected))
+
+
+def load_options(fields: List[str]):
+    """Loader option reading only the columns behind `fields`"""
+    columns = {VIRTUAL_FIELDS.get(name, name) for name in fields}
+    return load_only(*[getattr(Product, column) for column in sorted(columns)])
+
+
+def project(product: Product, fields: List[str]) -> Dict[str, Any]:
+    """Reduced product dict with only `fields` (touches loaded columns only)"""
+    data = {}
+    for name in fields:
+        if name == "imagen":
+            data[name] = product.imagenes[0] if product.imagenes else None
+        elif name == "miniatura":
+            data[name] = image_url(product.imagenes[0], "thumb") if product.imagenes else None
+        else:
+            data[name] = getattr(product, name)
+    return data
+
+
+def projected_response(content: Any, response: Response) -> FastJSONResponse:
+    """
+    JSON response for projected content, keeping headers already set on `response`
+
+    Sparse payloads do not match the full response model, so they are returned
+    directly instead of going through response_model validation.
+    """
+    return fast_response(jsonable_encoder(content), response)
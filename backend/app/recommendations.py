@@ -0,0 +1,207 @@
+"""
+"Frequently bought together" recommendations
+
+Built from order co-occurrence in three steps, all incremental:
+
+1. Count: orders not counted yet are self-joined on `order_items.order_id`
+   and grouped by product pair in the database (one set-based INSERT ...
+   SELECT ... ON CONFLICT DO UPDATE), adding to the running counts in
+   `product_copurchases`. The diagonal keeps the number of orders per product.
+2. Score: cosine similarity, orders(a, b) / sqrt(orders(a) * orders(b)), which
+   keeps best sellers from showing up as everyone's neighbour.
+3. Store: the top RELATED_TOP_K neighbours per product go to
+   `related_products`, so serving is a primary-key range read.
+
+Order ids are not committed in order (a transaction holding a lower id can
+commit after a higher one is visible), so the `copurchase` checkpoint is only a
+low-water mark: every order at or below it is counted. Each run re-scans the
+ids above it, skips the ones recorded in `copurchase_orders` and records the
+rest. The mark moves up to the newest counted order older than
+RELATED_RESCAN_SECONDS, and the records below it are pruned.
+
+Only products in the new orders and their existing neighbours (whose scores
+depend on the changed counts) are re-ranked. The checkpoint row is locked for
+the whole run, so a second scheduler never counts the same orders twice.
+"""
+import heapq
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import delete, distinct, exists, func, insert, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, aliased
+
+from .config import settings
+from .database import SessionLocal
+from .models import CoPurchaseOrder, JobCheckpoint, Order, OrderItem, ProductCoPurchase, RelatedProduct
+
+CHECKPOINT = "copurchase"
+KIND = "copurchase"
+
+# Products re-ranked per query
+RANK_CHUNK_SIZE = 500
+
+
+def _insert(db: Session):
+    return sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+
+
+def lock_checkpoint(db: Session, name: str) -> JobCheckpoint:
+    """Load (creating it if needed) and lock a job checkpoint until the transaction ends"""
+    db.execute(_insert(db)(JobCheckpoint).values(name=name, last_id=0).on_conflict_do_nothing())
+    return db.query(JobCheckpoint).filter(JobCheckpoint.name == name).with_for_update().one()
+
+
+def _claim_orders(db: Session, after_id: int, run: int) -> int:
+    """Record the visible orders above `after_id` that no earlier run counted; returns how many"""
+    new_orders = (
+        select(OrderItem.order_id, literal(run))
+        .where(OrderItem.order_id > after_id)
+        .where(~exists().where(CoPurchaseOrder.order_id == OrderItem.order_id))
+        .distinct()
+    )
+    return db.execute(insert(CoPurchaseOrder).from_select(["order_id", "run"], new_orders)).rowcount
+
+
+def _run_orders(run: int):
+    return select(CoPurchaseOrder.order_id).where(CoPurchaseOrder.run == run)
+
+
+def _count_orders(db: Session, run: int) -> None:
+    """Add the product pairs of the orders claimed by `run` to the running counts"""
+    a, b = aliased(OrderItem), aliased(OrderItem)
+    pairs = (
+        select(a.product_id, b.product_id, func.count(distinct(a.order_id)))
+        .join(b, b.order_id == a.order_id)
+        .where(a.order_id.in_(_run_orders(run)))
+        .group_by(a.product_id, b.product_id)
+    )
+    stmt = _insert(db)(ProductCoPurchase).from_select(["product_id", "other_id", "orders"], pairs)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ProductCoPurchase.product_id, ProductCoPurchase.other_id],
+        set_={"orders": ProductCoPurchase.orders + stmt.excluded.orders},
+    )
+    db.execute(stmt)
+
+
+def _affected_products(db: Session, run: int) -> Set[int]:
+    """Products in the new orders plus everything ever bought with them"""
+    touched = set(db.scalars(
+        select(distinct(OrderItem.product_id)).where(OrderItem.order_id.in_(_run_orders(run)))
+    ))
+    affected = set(touched)
+    ids = sorted(touched)
+    for start in range(0, len(ids), RANK_CHUNK_SIZE):
+        chunk = ids[start:start + RANK_CHUNK_SIZE]
+        affected.update(db.scalars(
+            select(distinct(ProductCoPurchase.other_id)).where(ProductCoPurchase.product_id.in_(chunk))
+        ))
+    return affected
+
+
+def _advance_checkpoint(db: Session, checkpoint: JobCheckpoint) -> None:
+    """Move the low-water mark past the counted orders that can no longer be preceded by a late commit"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.RELATED_RESCAN_SECONDS)
+    settled = db.scalar(
+        select(func.max(CoPurchaseOrder.order_id))
+        .join(Order, Order.id == CoPurchaseOrder.order_id)
+        .where(Order.created_at < cutoff)
+    )
+    if settled is not None and settled > checkpoint.last_id:
+        checkpoint.last_id = settled
+        db.execute(delete(CoPurchaseOrder).where(CoPurchaseOrder.order_id <= settled))
+
+
+def _rank(db: Session, product_ids: List[int], top_k: int) -> None:
+    """Recompute the stored neighbours of `product_ids`"""
+    pair = ProductCoPurchase
+    own, other = aliased(ProductCoPurchase), aliased(ProductCoPurchase)
+    rows = db.execute(
+        select(pair.product_id, pair.other_id, pair.orders, own.orders, other.orders)
+        .join(own, (own.product_id == pair.product_id) & (own.other_id == pair.product_id))
+        .join(other, (other.product_id == pair.other_id) & (other.other_id == pair.other_id))
+        .where(pair.product_id.in_(product_ids), pair.other_id != pair.product_id)
+    ).all()
+
+    candidates: Dict[int, list] = defaultdict(list)
+    for product_id, other_id, together, orders_a, orders_b in rows:
+        score = together / math.sqrt(orders_a * orders_b)
+        candidates[product_id].append((score, together, -other_id))
+
+    db.execute(delete(RelatedProduct).where(
+        RelatedProduct.kind == KIND, RelatedProduct.product_id.in_(product_ids)
+    ))
+    related = [
+        {"product_id": product_id, "kind": KIND, "rank": rank, "related_id": -neg_id, "score": round(score, 6)}
+        for product_id, scored in candidates.items()
+        for rank, (score, _, neg_id) in enumerate(heapq.nlargest(top_k, scored), start=1)
+    ]
+    if related:
+        db.execute(insert(RelatedProduct), related)
+
+
+def rank_products(db: Session, product_ids: Iterable[int], top_k: int) -> None:
+    ids = sorted(product_ids)
+    for start in range(0, len(ids), RANK_CHUNK_SIZE):
+        _rank(db, ids[start:start + RANK_CHUNK_SIZE], top_k)
+
+
+def refresh_copurchases(db: Session, full: bool = False) -> int:
+    """
+    Fold orders not counted yet into the recommendations and commit
+
+    With `full`, counts and neighbours are rebuilt from every order.
+    Returns the number of products re-ranked.
+    """
+    checkpoint = lock_checkpoint(db, CHECKPOINT)
+    if full:
+        db.execute(delete(ProductCoPurchase))
+        db.execute(delete(RelatedProduct).where(RelatedProduct.kind == KIND))
+        db.execute(delete(CoPurchaseOrder))
+        checkpoint.last_id = 0
+
+    run = (db.scalar(select(func.max(CoPurchaseOrder.run))) or 0) + 1
+    affected: Set[int] = set()
+    if _claim_orders(db, checkpoint.last_id, run):
+        _count_orders(db, run)
+        affected = _affected_products(db, run)
+        rank_products(db, affected, settings.RELATED_TOP_K)
+
+    _advance_checkpoint(db, checkpoint)
+    db.commit()
+    return len(affected)
+
+
+def refresh_related_products() -> None:
+    """Background job: incremental co-purchase refresh in its own session"""
+    db = SessionLocal()
+    try:
+        refresh_copurchases(db)
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"WARNING: Could not refresh related products: {e}")
+    finally:
+        db.close()
+
+
+def related_product_ids(db: Session, product_id: int, kind: str, limit: int) -> List[int]:
+    """Stored neighbours of a product, best first"""
+    return list(db.scalars(
+        select(RelatedProduct.related_id)
+        .where(RelatedProduct.product_id == product_id, RelatedProduct.kind == kind)
+        .order_by(RelatedProduct.rank)
+        .limit(limit)
+    ))
+
+
+if __name__ == "__main__":
+    # Full rebuild: python -m app.recommendations
+    session = SessionLocal()
+    try:
+        print(f"Re-ranked {refresh_copurchases(session, full=True)} products")
+    finally:
+        session.close()
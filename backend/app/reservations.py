@@ -0,0 +1,207 @@
+"""
+Stock reservations (cart holds with a TTL)
+
+Stock used to be checked only when the order was placed, so during
+promotions many shoppers reached payment for items that were already gone.
+A cart can now hold its quantities for RESERVATION_TTL_SECONDS:
+
+- `reserve_cart()` sets the holds of a user's cart and restarts their TTL.
+  Holds live in `stock_reservations`; their total per product is kept in
+  `Product.reservado`, changed with one conditional UPDATE guarded by
+  `stock - reservado >= quantity` (no product row locks), so a hold can never
+  promise stock another cart already holds. Changes to one user's holds are
+  serialized on the user row (`lock_user_holds()`).
+- Listings show and filter on `Product.disponible` (stock minus holds).
+- `claim_reservations()` removes the holds an order converts;
+  `take_stock()` then releases them from `reservado` in the same UPDATE that
+  takes the stock, without locking the product rows when holds cover the
+  whole order.
+- `release_expired_reservations()` (background job) deletes expired holds
+  in batches of RESERVATION_SWEEP_BATCH and gives their stock back.
+
+An expired hold keeps counting until the sweeper releases it; the owner
+renewing the cart, or ordering, in between still gets it.
+"""
+from datetime import timedelta
+from typing import Dict, Iterable, List
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, case, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .cache import product_cache
+from .config import settings
+from .database import SessionLocal
+from .models import Product, StockReservation, User
+from .stock import check_products, read_products
+
+
+def get_reservations(db: Session, user_id: int) -> List[StockReservation]:
+    return db.query(StockReservation).filter(
+        StockReservation.user_id == user_id
+    ).order_by(StockReservation.product_id).all()
+
+
+def lock_user_holds(db: Session, user_id: int) -> None:
+    """
+    Serialize hold changes of one user until the transaction ends
+
+    `reserve_cart()` derives the change to `Product.reservado` from the holds it
+    reads; two concurrent calls for the same cart would otherwise both add the
+    full quantity while the upsert keeps a single hold row. The user row is
+    locked because it exists even before the first hold.
+    """
+    db.execute(select(User.id).where(User.id == user_id).with_for_update())
+
+
+def _change_reserved(db: Session, deltas: Dict[int, int]) -> int:
+    """
+    Add `deltas` to `Product.reservado`; increases only where that much stock is free
+
+    Returns the number of products changed.
+    """
+    change = case(deltas, value=Product.id)
+    shrinking = [product_id for product_id, delta in deltas.items() if delta < 0]
+    # updated_at is kept (its onupdate would fire): holds are not product edits
+    return db.execute(
+        update(Product)
+        .where(and_(
+            Product.id.in_(list(deltas)),
+            or_(Product.id.in_(shrinking), Product.stock - Product.reservado >= change),
+        ))
+        .values(reservado=Product.reservado + change, updated_at=Product.updated_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def reserve_cart(db: Session, user_id: int, quantities: Dict[int, int]) -> List[StockReservation]:
+    """
+    Hold exactly `quantities` for the user's cart (0 releases a product) and commit
+
+    Every hold of the cart, kept or changed, expires RESERVATION_TTL_SECONDS from now.
+
+    Raises:
+        HTTPException: 404 for unknown products, 400 if there is not enough free
+            stock, 409 if another cart took it meanwhile
+    """
+    lock_user_holds(db, user_id)
+    now = db.scalar(select(func.now()))
+    expires_at = now + timedelta(seconds=settings.RESERVATION_TTL_SECONDS)
+
+    # Renew first: once written, the sweeper no longer sees these holds as expired
+    db.execute(
+        update(StockReservation).where(StockReservation.user_id == user_id)
+        .values(expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    held = dict(db.execute(
+        select(StockReservation.product_id, StockReservation.quantity)
+        .where(StockReservation.user_id == user_id)
+    ).all())
+
+    deltas = {
+        product_id: quantities.get(product_id, 0) - held.get(product_id, 0)
+        for product_id in set(held) | set(quantities)
+    }
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    products = read_products(db, deltas)
+    check_products(products, deltas)
+
+    if deltas and _change_reserved(db, deltas) != len(deltas):
+        # Free stock changed after the snapshot
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Stock changed while reserving, please try again"
+        )
+
+    released = [product_id for product_id in held if not quantities.get(product_id)]
+    if released:
+        db.execute(delete(StockReservation).where(
+            StockReservation.user_id == user_id, StockReservation.product_id.in_(released)
+        ))
+    holds = [
+        {"user_id": user_id, "product_id": product_id, "quantity": quantity, "expires_at": expires_at}
+        for product_id, quantity in quantities.items() if quantity > 0
+    ]
+    if holds:
+        upsert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+        stmt = upsert(StockReservation)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[StockReservation.user_id, StockReservation.product_id],
+            set_={"quantity": stmt.excluded.quantity, "expires_at": stmt.excluded.expires_at},
+        ), holds)
+    db.commit()
+
+    # Availability changed
+    product_cache.invalidate_products(products[product_id] for product_id in deltas)
+    return get_reservations(db, user_id)
+
+
+def release_cart(db: Session, user_id: int) -> None:
+    """Drop every hold of the user's cart and commit"""
+    reserve_cart(db, user_id, {})
+
+
+def claim_reservations(db: Session, user_id: int, product_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Remove the user's holds on `product_ids` for an order (caller commits)
+
+    Returns the held quantity per product, to pass to `take_stock()`, which
+    releases it from `Product.reservado`.
+    """
+    lock_user_holds(db, user_id)
+    rows = db.execute(
+        delete(StockReservation)
+        .where(StockReservation.user_id == user_id, StockReservation.product_id.in_(list(product_ids)))
+        .returning(StockReservation.product_id, StockReservation.quantity)
+    ).all()
+    return {row.product_id: row.quantity for row in rows}
+
+
+def sweep_expired_reservations(db: Session, batch_size: int) -> int:
+    """Release expired holds, committing per batch; returns the number released"""
+    released = 0
+    while True:
+        now = db.scalar(select(func.now()))
+        ids = db.scalars(
+            select(StockReservation.id).where(StockReservation.expires_at < now)
+            .order_by(StockReservation.expires_at).limit(batch_size)
+        ).all()
+        if not ids:
+            break
+
+        # Re-checked on delete: a hold renewed in the meantime is kept
+        rows = db.execute(
+            delete(StockReservation)
+            .where(StockReservation.id.in_(ids), StockReservation.expires_at < now)
+            .returning(StockReservation.product_id, StockReservation.quantity)
+        ).all()
+        totals: Dict[int, int] = {}
+        for row in rows:
+            totals[row.product_id] = totals.get(row.product_id, 0) - row.quantity
+        products = read_products(db, totals) if totals else {}
+        if totals:
+            _change_reserved(db, totals)
+        db.commit()
+
+        product_cache.invalidate_products(products.values())
+        released += len(rows)
+        if len(ids) < batch_size:
+            break
+    return released
+
+
+def release_expired_reservations() -> None:
+    """Background job: give the stock of expired holds back"""
+    db = SessionLocal()
+    try:
+        sweep_expired_reservations(db, settings.RESERVATION_SWEEP_BATCH)
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"WARNING: Could not release expired reservations: {e}")
+    finally:
+        db.close()
@@ -1,27 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
 
 from ..database import get_db
 from ..models import Category
 from ..schemas import CategoryResponse, CategoryCreate
+from ..conditional import listing_validators, listing_version, not_modified, row_validators, set_validators
 
 router = APIRouter(prefix="/api/categories", tags=["Categories"])
 
 
 @router.get("/", response_model=List[CategoryResponse])
-async def get_categories(db: Session = Depends(get_db)):
+async def get_categories(request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Get all categories
+    
+    - Supports If-None-Match (304 Not Modified)
     """
-    categories = db.query(Category).all()
+    query = db.query(Category)
+    
+    validators = listing_validators("categories", listing_version(query, Category), [])
+    unchanged = not_modified(request, validators)
+    if unchanged:
+        return unchanged
+    
+    set_validators(response, validators)
+    categories = query.all()
     return categories
 
 
 @router.get("/{category_id}", response_model=CategoryResponse)
-async def get_category(category_id: int, db: Session = Depends(get_db)):
+async def get_category(
+    category_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
     """
     Get a specific category by ID
+    
+    - Supports If-None-Match / If-Modified-Since (304 Not Modified)
     """
     category = db.query(Category).filter(Category.id == category_id).first()
     if not category:
@@ -29,6 +47,13 @@ async def get_category(category_id: int, db: Session = Depends(get_db)):
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Category not found"
         )
+    
+    validators = row_validators("category", category)
+    unchanged = not_modified(request, validators)
+    if unchanged:
+        return unchanged
+    
+    set_validators(response, validators)
     return category
 
 
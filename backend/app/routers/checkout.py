@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..models import Product
+from ..schemas import CheckoutQuote, OrderCreate
+from ..stock import order_quantities
+from ..checkout import quote_order
+
+router = APIRouter(prefix="/api/checkout", tags=["Checkout"])
+
+
+@router.post("/quote", response_model=CheckoutQuote)
+async def quote_checkout(order_data: OrderCreate, db: Session = Depends(get_db)):
+    """
+    Price a cart in one call: lines, subtotal, coupon discount, shipping and total
+    
+    - Takes the same body as `POST /api/orders`; placing the order with it
+      charges exactly this total (as long as prices and coupons don't change)
+    - **shipping_method**: Shipping method id or name, or "domicilio" / "retiro" (default: cheapest delivery method)
+    - **shipping_region**: Region, for regional shipping rates
+    - **coupon_code**: Optional coupon code
+    - Stock is not reserved or checked
+    """
+    if not order_data.items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Order must contain at least one item"
+        )
+    
+    quantities = order_quantities((item.product_id, item.quantity) for item in order_data.items)
+    prices = dict(db.execute(
+        select(Product.id, Product.precio).where(Product.id.in_(quantities))
+    ).all())
+    missing = [product_id for product_id in quantities if product_id not in prices]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product with ID {missing[0]} not found"
+        )
+    
+    quote = quote_order(order_data, prices)
+    return {**quote._asdict(), "items": [line._asdict() for line in quote.items]}
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException, status
+
+from ..schemas import CouponQuote, CouponValidate
+from ..coupons import CouponError, coupon_table
+
+router = APIRouter(prefix="/api/coupons", tags=["Coupons"])
+
+
+@router.post("/validate", response_model=CouponQuote)
+async def validate_coupon(data: CouponValidate):
+    """
+    Check a coupon against a cart subtotal and return the discount it gives
+    
+    - **code**: Coupon code (case insensitive)
+    - **subtotal**: Cart subtotal before shipping
+    - `free_shipping` is true for free-shipping ("ship") coupons
+    
+    Served from the in-memory coupon table (no database access).
+    """
+    try:
+        return coupon_table.apply(data.code, data.subtotal)._asdict()
+    except CouponError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
@@ -1,27 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional
 
 from ..database import get_db
 from ..models import Favorite, Product, User
 from ..schemas import FavoriteResponse, FavoriteCreate
 from ..auth import get_current_user
+from ..projection import load_options, parse_fields, project, projected_response
+from ..fastjson import favorite_dict, fast_response
 
 router = APIRouter(prefix="/api/favorites", tags=["Favorites"])
 
 
 @router.get("/", response_model=List[FavoriteResponse])
 async def get_user_favorites(
+    response: Response,
+    fields: Optional[str] = Query(None, description="Product fields to return: comma separated names or a preset (card, detail)"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get all favorites for the current user (requires authentication)
     
+    - **fields**: Sparse fieldset for the nested product, e.g. `fields=card`
     - Requires valid JWT token
     """
-    favorites = db.query(Favorite).filter(Favorite.user_id == current_user.id).all()
-    return favorites
+    selected = parse_fields(fields)
+    
+    # Load products in the same query instead of one lazy SELECT per favorite
+    product_loader = joinedload(Favorite.product)
+    if selected:
+        product_loader = product_loader.options(load_options(selected))
+    
+    favorites = db.query(Favorite).options(product_loader).filter(
+        Favorite.user_id == current_user.id
+    ).all()
+    
+    if selected:
+        return projected_response([
+            favorite_dict(favorite, project(favorite.product, selected))
+            for favorite in favorites
+        ], response)
+    return fast_response([favorite_dict(favorite) for favorite in favorites], response)
 
 
 @router.post("/", response_model=FavoriteResponse, status_code=status.HTTP_201_CREATED)
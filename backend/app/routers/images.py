@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import FileResponse, RedirectResponse
+
+from ..images import (
+    FORMATS, IMMUTABLE_CACHE_CONTROL, SOURCE_EXTENSIONS,
+    can_render, content_digest, find_source, image_url, parse_image_name, variant_store
+)
+
+router = APIRouter(prefix="/api/images", tags=["Images"])
+
+
+@router.get("/{name:path}")
+async def get_image(name: str):
+    """
+    Product image variant by content-hashed name
+
+    - **name**: `<image>.<digest>.<variant>.<format>`, as produced for product
+      images (variants: thumb, card, large, original; formats: webp, jpg, png)
+
+    Variants are rendered on first request and served with a one-year
+    `immutable` Cache-Control. A name whose digest no longer matches the source
+    image redirects to the current one.
+    """
+    parsed = parse_image_name(name)
+    source = find_source(parsed.stem) if parsed else None
+    if source is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+
+    source_format = SOURCE_EXTENSIONS[source.suffix.lower()]
+    if content_digest(source) != parsed.digest or (
+        not can_render() and (parsed.variant, parsed.fmt) != ("original", source_format)
+    ):
+        # Stale digest, or a variant that cannot be rendered here
+        current = image_url(f"{parsed.stem}{source.suffix}", parsed.variant, parsed.fmt)
+        return RedirectResponse(current, status_code=status.HTTP_302_FOUND)
+
+    if (parsed.variant, parsed.fmt) == ("original", source_format):
+        path = source
+    else:
+        path = await variant_store.get(source, parsed)
+
+    return FileResponse(
+        path,
+        media_type=FORMATS[parsed.fmt][1],
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL},
+    )
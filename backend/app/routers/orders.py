@@ -1,37 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
-import random
-import string
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Request, Response
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
+from datetime import date, datetime, timedelta
 
 from ..database import get_db
-from ..models import Order, OrderItem, Product, User, Coupon
-from ..schemas import OrderResponse, OrderCreate
+from ..models import Order, OrderItem, User
+from ..schemas import OrderResponse, OrderCreate, OrderSummary
 from ..auth import get_current_user
+from ..pagination import DEFAULT_PAGE_SIZE, SortKey, paginate, set_next_cursor
+from ..cache import product_cache
+from ..suggest import suggest_index
+from ..fastjson import fast_response, order_dict
+from ..stock import order_quantities, take_stock
+from ..reservations import claim_reservations
+from ..order_numbers import next_order_number
+from ..order_summary import add_order, get_order_summary
+from ..checkout import quote_order
+from ..idempotency import (
+    REPLAYED_HEADER, claim_idempotency_key, record_idempotent_order, release_idempotency_key,
+    replayed_response, store_idempotent_response
+)
 
 router = APIRouter(prefix="/api/orders", tags=["Orders"])
 
+# Newest orders first; matches the (user_id, created_at, id) index
+ORDER_SORT_KEYS = [SortKey(Order.created_at, True), SortKey(Order.id, True)]
 
-def generate_order_number():
-    """Generate a unique order number"""
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    return f"ORD-{timestamp}-{random_str}"
+VALID_ORDER_STATUSES = ["pending", "confirmed", "shipped", "delivered", "cancelled"]
 
 
 @router.get("/", response_model=List[OrderResponse])
 async def get_user_orders(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
+    order_status: Optional[str] = Query(None, alias="status", description="Only orders with this status"),
+    date_from: Optional[date] = Query(None, description="Only orders placed on or after this date"),
+    date_to: Optional[date] = Query(None, description="Only orders placed on or before this date"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Get all orders for the current user (requires authentication)
+    Get orders for the current user, newest first (requires authentication)
     
+    - **limit**: Page size; without `limit` or `cursor` all orders are returned
+    - **cursor**: Opaque cursor from the `X-Next-Cursor` / `Link` header of the previous page
+      (send the same filters with it)
+    - **status**: pending, confirmed, shipped, delivered or cancelled
+    - **date_from** / **date_to**: Placement date range (inclusive, YYYY-MM-DD)
     - Requires valid JWT token
     """
-    orders = db.query(Order).filter(Order.user_id == current_user.id).order_by(Order.created_at.desc()).all()
-    return orders
+    if order_status is not None and order_status not in VALID_ORDER_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid status. Must be one of: {', '.join(VALID_ORDER_STATUSES)}"
+        )
+    
+    # Items for the whole page in one extra query (the serializer reads them)
+    query = db.query(Order).options(selectinload(Order.items)).filter(Order.user_id == current_user.id)
+    if order_status is not None:
+        query = query.filter(Order.status == order_status)
+    if date_from is not None:
+        query = query.filter(Order.created_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to is not None:
+        query = query.filter(Order.created_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    
+    if limit is None and not cursor:
+        orders = query.order_by(Order.created_at.desc(), Order.id.desc()).all()
+        return fast_response([order_dict(order) for order in orders], response)
+    
+    page = paginate(query, ORDER_SORT_KEYS, "newest", limit or DEFAULT_PAGE_SIZE, cursor=cursor)
+    set_next_cursor(request, response, page.next_cursor)
+    return fast_response([order_dict(order) for order in page.items], response)
+
+
+@router.get("/summary", response_model=OrderSummary)
+async def get_user_order_summary(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Order count, lifetime spend and last order date of the current user (requires authentication)
+    
+    Maintained as orders are placed, so this is a single-row read.
+    """
+    return get_order_summary(db, current_user.id)
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
@@ -58,98 +113,40 @@ async def get_order(
             detail="Order not found"
         )
     
-    return order
+    return fast_response(order_dict(order))
 
 
-@router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
-async def create_order(
-    order_data: OrderCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """
-    Create a new order (requires authentication)
-    
-    - **items**: List of order items with product_id, quantity, price
-    - **shipping_method**: Shipping method name
-    - **shipping_address**: Full shipping address
-    - **shipping_locality**: Locality/city
-    - **shipping_region**: Region/state
-    - **coupon_code**: Optional discount coupon code
-    - Requires valid JWT token
-    """
+def place_order(db: Session, user: User, order_data: OrderCreate, idempotency_key: Optional[str] = None) -> Order:
+    """Validate, price and store an order, taking its stock (commits)"""
     if not order_data.items:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Order must contain at least one item"
         )
     
-    # Calculate subtotal and validate products
-    subtotal = 0.0
-    for item in order_data.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if not product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Product with ID {item.product_id} not found"
-            )
-        if product.stock < item.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Insufficient stock for product {product.titulo}"
-            )
-        subtotal += item.price * item.quantity
-    
-    # Apply coupon discount
-    discount = 0.0
-    if order_data.coupon_code:
-        coupon = db.query(Coupon).filter(
-            Coupon.code == order_data.coupon_code,
-            Coupon.is_active == True
-        ).first()
-        
-        if not coupon:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid coupon code"
-            )
-        
-        if coupon.expires_at and coupon.expires_at < datetime.now():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Coupon has expired"
-            )
-        
-        if subtotal < coupon.min_purchase:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Minimum purchase of ${coupon.min_purchase} required for this coupon"
-            )
-        
-        if coupon.discount_type == "percentage":
-            discount = subtotal * (coupon.discount_value / 100)
-        else:  # fixed
-            discount = coupon.discount_value
-    
-    # Calculate shipping cost (simplified - you can make this more sophisticated)
-    shipping_cost = 5000.0 if subtotal < 50000 else 0.0  # Free shipping over $50,000
-    
-    # Calculate total
-    total = subtotal - discount + shipping_cost
-    
-    # Generate order number
-    order_number = generate_order_number()
+    # Time-ordered and unique across workers (see app.order_numbers); taken before
+    # the first write, as the first one may lease the worker id in its own session
+    order_number = next_order_number()
+    
+    # Convert the cart's holds, then check stock and decrement it in one UPDATE
+    # (products are locked in id order unless holds cover the whole order)
+    quantities = order_quantities((item.product_id, item.quantity) for item in order_data.items)
+    held = claim_reservations(db, user.id, quantities)
+    products = {product.id: product for product in take_stock(db, quantities, held)}
+    
+    # Lines are charged at the current catalog price; same pricing as POST /api/checkout/quote
+    quote = quote_order(order_data, {product.id: product.precio for product in products.values()})
     
     # Create order
     new_order = Order(
-        user_id=current_user.id,
+        user_id=user.id,
         order_number=order_number,
         status="pending",
-        subtotal=subtotal,
-        shipping_cost=shipping_cost,
-        discount=discount,
-        total=total,
-        coupon_code=order_data.coupon_code,
+        subtotal=quote.subtotal,
+        shipping_cost=quote.shipping_cost,
+        discount=quote.discount,
+        total=quote.total,
+        coupon_code=quote.coupon_code,
         shipping_method=order_data.shipping_method,
         shipping_address=order_data.shipping_address,
         shipping_locality=order_data.shipping_locality,
@@ -159,27 +156,83 @@ async def create_order(
     db.add(new_order)
     db.flush()  # Get order ID without committing
     
-    # Create order items and update product stock
-    for item in order_data.items:
-        order_item = OrderItem(
-            order_id=new_order.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price=item.price
-        )
-        db.add(order_item)
-        
-        # Update product stock and vendidos
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        product.stock -= item.quantity
-        product.vendidos += item.quantity
+    # All order lines in one INSERT
+    db.execute(insert(OrderItem), [
+        {
+            "order_id": new_order.id,
+            "product_id": line.product_id,
+            "quantity": line.quantity,
+            "price": line.price,
+        }
+        for line in quote.items
+    ])
+    
+    add_order(db, user.id, quote.total)
+    if idempotency_key:
+        record_idempotent_order(db, user.id, idempotency_key, new_order.id, status.HTTP_201_CREATED)
     
     db.commit()
     db.refresh(new_order)
     
+    # Stock and vendidos changed
+    product_cache.invalidate_products(products.values())
+    suggest_index.add_sales(quantities)
+    
     return new_order
 
 
+@router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
+async def create_order(
+    order_data: OrderCreate,
+    idempotency_key: Optional[str] = Header(None, description="Unique key per order attempt; retries with the same key return the first result"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create a new order (requires authentication)
+    
+    - **items**: List of order items with product_id, quantity, price
+      (lines are charged at the current catalog price)
+    - **shipping_method**: Shipping method id or name, or "domicilio" / "retiro" (default: cheapest delivery method)
+    - **shipping_address**: Full shipping address
+    - **shipping_locality**: Locality/city
+    - **shipping_region**: Region/state
+    - **coupon_code**: Optional discount coupon code
+    - **Idempotency-Key** header: retries with the same key return the first
+      response (`Idempotent-Replayed: true`) instead of creating another order
+    - Requires valid JWT token
+    """
+    if idempotency_key:
+        earlier = await claim_idempotency_key(
+            db, current_user.id, idempotency_key, order_data.model_dump(mode="json")
+        )
+        if earlier is not None:
+            replay = replayed_response(earlier)
+            if replay is None:
+                # Order committed but its response was never stored
+                order = db.query(Order).filter(Order.id == earlier.order_id).first()
+                if not order:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Order not found"
+                    )
+                replay = fast_response(order_dict(order), status_code=earlier.status_code)
+                replay.headers[REPLAYED_HEADER] = "true"
+            return replay
+    
+    try:
+        new_order = place_order(db, current_user, order_data, idempotency_key)
+    except Exception:
+        if idempotency_key:
+            release_idempotency_key(db, current_user.id, idempotency_key)
+        raise
+    
+    response = fast_response(order_dict(new_order), status_code=status.HTTP_201_CREATED)
+    if idempotency_key:
+        store_idempotent_response(db, current_user.id, idempotency_key, response)
+    return response
+
+
 @router.patch("/{order_id}/status")
 async def update_order_status(
     order_id: int,
@@ -195,11 +248,10 @@ async def update_order_status(
     - User can only update their own orders
     - Requires valid JWT token
     """
-    valid_statuses = ["pending", "confirmed", "shipped", "delivered", "cancelled"]
-    if status not in valid_statuses:
+    if status not in VALID_ORDER_STATUSES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
+            detail=f"Invalid status. Must be one of: {', '.join(VALID_ORDER_STATUSES)}"
         )
     
     order = db.query(Order).filter(
@@ -1,104 +1,590 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
+from urllib.parse import quote
 
 from ..database import get_db
 from ..models import Product, Category
-from ..schemas import ProductResponse, ProductCreate, ProductUpdate
+from ..schemas import (
+    ProductResponse, ProductCreate, ProductUpdate, ProductFacets, ProductBatchResponse,
+    ProductImportResult, ProductBulkUpdateItem, ProductBulkUpdateResult, Suggestion
+)
 from ..auth import get_current_user
+from ..search import apply_search, index_products, remove_products
+from ..pagination import SortKey, paginate, set_next_cursor
+from ..cache import product_cache
+from ..facets import apply_filters, compute_facets, product_filters
+from ..projection import load_options, parse_fields, project, projected_response
+from ..fastjson import fast_response, json_ready_product, product_dict
+from ..suggest import MAX_SUGGESTIONS, suggest_index
+from ..fuzzy import fuzzy_index
+from ..bulk import bulk_update_products, import_products as run_import, spool_request_body
+from ..export import EXPORT_MEDIA_TYPES, export_products
+from ..recommendations import related_product_ids
+from ..specs import parse_spec_filters, remove_product_specs, sync_product_specs
+from ..conditional import (
+    Validators, listing_validators, listing_version, not_modified, row_validators, set_validators
+)
 
 router = APIRouter(prefix="/api/products", tags=["Products"])
 
+# Max products resolved by one /batch request
+MAX_BATCH_SIZE = 100
+
+# Max changes applied by one PATCH /bulk request
+MAX_BULK_UPDATE_SIZE = 10000
+
+# Corrected query sent back when a search only matched after spelling correction
+DID_YOU_MEAN_HEADER = "X-Did-You-Mean"
+
+
+# Sort orders available on product listings (keyset pagination keys, unique last key)
+PRODUCT_SORTS = {
+    "id": [SortKey(Product.id)],
+    "newest": [SortKey(Product.created_at, True), SortKey(Product.id, True)],
+    "price_asc": [SortKey(Product.precio), SortKey(Product.id)],
+    "price_desc": [SortKey(Product.precio, True), SortKey(Product.id, True)],
+    "best_selling": [SortKey(Product.vendidos, True), SortKey(Product.id, True)],
+}
+
+
+def get_sort_keys(sort: Optional[str], score=None) -> Tuple[str, List[SortKey]]:
+    """
+    Resolve the `sort` query parameter into keyset sort keys
+    
+    When a search is active (`score` given) and no sort is requested,
+    results are ordered by relevance.
+    """
+    if sort is None:
+        sort = "relevance" if score is not None else "id"
+    
+    if sort == "relevance" and score is not None:
+        return sort, [SortKey(score, True), SortKey(Product.vendidos, True), SortKey(Product.id, True)]
+    
+    if sort not in PRODUCT_SORTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid sort. Must be one of: {', '.join(PRODUCT_SORTS)}"
+        )
+    return sort, PRODUCT_SORTS[sort]
+
+
+# Parameters that pick a page of a listing, not the rows it covers
+PAGE_PARAMS = ("skip", "limit", "cursor", "sort", "fields")
+
+
+def product_listing_validators(query, params: List[Tuple[str, Any]]) -> Validators:
+    """
+    Validators for a product listing
+    
+    The aggregate behind them is cached per filter set (any product change drops
+    it), so repeated requests don't scan every matching row again.
+    """
+    filters = sorted(((name, value) for name, value in params if name not in PAGE_PARAMS), key=str)
+    version = product_cache.get_listing_version(filters)
+    if version is None:
+        # Holds change `disponible` without touching updated_at
+        version = listing_version(query, Product, func.coalesce(func.sum(Product.reservado), 0))
+        product_cache.put_listing_version(filters, version)
+    return listing_validators("products", version, params)
+
+
+def product_validators(product: Product) -> Validators:
+    """Row validators plus `reservado`, which holds change without touching updated_at"""
+    return row_validators("product", product, product.reservado)
+
+
+def serialize_product(product: Product) -> dict:
+    """JSON-ready ProductResponse dict, the form stored in the product cache"""
+    return json_ready_product(product)
+
+
+def cache_product(product: Product, validators: Optional[Validators] = None) -> dict:
+    """Serialize a product and store it in the product cache, returning the entry"""
+    return product_cache.put(
+        serialize_product(product),
+        validators or product_validators(product)
+    )
+
+
+def send_product(
+    request: Request,
+    response: Response,
+    entry: Optional[dict],
+    product: Optional[Product] = None
+):
+    """
+    Answer a single-product GET from a cache entry or a freshly loaded row
+    
+    The ETag check runs first, so a 304 never serializes the product.
+    """
+    if entry is not None:
+        validators = Validators(entry["etag"], entry["last_modified"])
+    else:
+        validators = product_validators(product)
+    
+    unchanged = not_modified(request, validators)
+    if unchanged:
+        return unchanged
+    
+    if entry is None:
+        entry = cache_product(product, validators)
+    set_validators(response, validators)
+    return fast_response(entry["data"], response)
+
 
 @router.get("/", response_model=List[ProductResponse])
 async def get_products(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
     categoria: Optional[str] = None,
     search: Optional[str] = None,
     destacado: Optional[bool] = None,
+    marca: Optional[List[str]] = Query(None),
+    precio_min: Optional[float] = Query(None, ge=0),
+    precio_max: Optional[float] = Query(None, ge=0),
+    rating_min: Optional[float] = Query(None, ge=0, le=5),
+    en_stock: Optional[bool] = None,
+    fields: Optional[str] = Query(None, description="Fields to return: comma separated names or a preset (card, detail)"),
     db: Session = Depends(get_db)
 ):
     """
     Get list of products with optional filters
     
-    - **skip**: Number of records to skip (pagination)
+    - **skip**: Number of records to skip (offset pagination, ignored with `cursor`)
     - **limit**: Maximum number of records to return
+    - **cursor**: Opaque cursor from the `X-Next-Cursor` / `Link` header of the previous page
+    - **sort**: id (default), newest, price_asc, price_desc, best_selling, relevance (with search)
     - **categoria**: Filter by category name
-    - **search**: Search in product title
+    - **search**: Full-text search in title, brand, description and category (ranked by relevance)
     - **destacado**: Filter featured products
+    - **marca**: Filter by brand (repeat the parameter for several brands)
+    - **precio_min** / **precio_max**: Price range
+    - **rating_min**: Minimum rating
+    - **en_stock**: Only products with (true) or without (false) available stock (not held by carts)
+    - **spec.{key}**: Spec attribute filter, e.g. `spec.material=algodon` (repeat for
+      several values) or `spec.altura.min=10` / `spec.altura.max=30` for numeric ranges;
+      keys and values are matched ignoring case and accents
+    - **fields**: Sparse fieldset, e.g. `fields=card` or `fields=id,titulo,precio`;
+      only those columns are loaded and returned
+    
+    Listings without `search` are served from the product cache when possible.
+    Responses carry an ETag; requests with If-None-Match get a 304.
     """
-    query = db.query(Product)
+    selected = parse_fields(fields)
+    specs = parse_spec_filters(request.query_params)
+    
+    cache_params = None
+    if not search:
+        cache_params = {
+            "categoria": categoria, "destacado": destacado, "marca": marca,
+            "precio_min": precio_min, "precio_max": precio_max,
+            "rating_min": rating_min, "en_stock": en_stock, "specs": specs, "fields": selected,
+            "sort": sort, "skip": skip, "limit": limit, "cursor": cursor,
+        }
+        cached = product_cache.get_listing(cache_params)
+        if cached is not None:
+            validators = Validators(cached["etag"], cached["last_modified"])
+            unchanged = not_modified(request, validators)
+            if unchanged:
+                return unchanged
+            set_validators(response, validators)
+            set_next_cursor(request, response, cached["next_cursor"])
+            if selected:
+                return projected_response(cached["items"], response)
+            return fast_response(cached["items"], response)
+    
+    # Full-text search (ranked)
+    query, score = apply_search(db.query(Product), db, search)
+    
+    # Category, brand, price, rating, stock, featured and spec attribute filters
+    filters = product_filters(
+        db, categoria=categoria, marca=marca, precio_min=precio_min, precio_max=precio_max,
+        rating_min=rating_min, en_stock=en_stock, destacado=destacado, specs=specs
+    )
+    query = apply_filters(query, filters)
+    if selected:
+        query = query.options(load_options(selected))
+    
+    sort, keys = get_sort_keys(sort, score)
     
-    # Filter by category
-    if categoria:
-        category = db.query(Category).filter(Category.name == categoria).first()
-        if category:
-            query = query.filter(Product.categoria_id == category.id)
+    # Aggregate version of the filtered rows; answer 304 before fetching the page
+    validators = product_listing_validators(query, request.query_params.multi_items())
+    unchanged = not_modified(request, validators)
+    if unchanged:
+        return unchanged
     
-    # Search in title
-    if search:
-        query = query.filter(Product.titulo.ilike(f"%{search}%"))
+    page = paginate(query, keys, sort, limit, cursor=cursor, skip=skip)
+    set_validators(response, validators)
+    set_next_cursor(request, response, page.next_cursor)
     
-    # Filter featured
-    if destacado is not None:
-        query = query.filter(Product.destacado == destacado)
+    if selected:
+        items = jsonable_encoder([project(product, selected) for product in page.items])
+    elif cache_params is not None:
+        items = [serialize_product(product) for product in page.items]
+    else:
+        return fast_response([product_dict(product) for product in page.items], response)
     
-    products = query.offset(skip).limit(limit).all()
-    return products
+    if cache_params is not None:
+        product_cache.put_listing(cache_params, {
+            "items": items,
+            "next_cursor": page.next_cursor,
+            **validators._asdict(),
+        })
+    if selected:
+        return projected_response(items, response)
+    return fast_response(items, response)
 
 
 @router.get("/search", response_model=List[ProductResponse])
 async def search_products(
-    q: Optional[str] = Query(None, description="Search query for product title"),
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(None, description="Search query (title, brand, description, category)"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Fields to return: comma separated names or a preset (card, detail)"),
     db: Session = Depends(get_db)
 ):
     """
-    Search products by title. This endpoint exists to support the frontend's
+    Full-text product search. This endpoint exists to support the frontend's
     `/api/products/search?q=...` calls. It is functionally equivalent to
     `/api/products?search=...`.
+    
+    Matches title, brand, description and category name, ordered by relevance.
+    Supports the same `cursor` / `sort` pagination and `fields` projection as
+    `/api/products`.
+    
+    When nothing matches, misspelled words are corrected against the product
+    title / brand vocabulary ("samsumg" -> "samsung") and the results for the
+    corrected query are returned instead, with the corrected query in the
+    `X-Did-You-Mean` header (URL-encoded).
+    """
+    selected = parse_fields(fields)
+    query, score = apply_search(db.query(Product), db, q)
+
+    corrected = None
+    if q and not db.query(query.order_by(None).exists()).scalar():
+        corrected = fuzzy_index.correct(q)
+        if corrected:
+            query, score = apply_search(db.query(Product), db, corrected)
+            response.headers[DID_YOU_MEAN_HEADER] = quote(corrected)
+
+    if selected:
+        query = query.options(load_options(selected))
+
+    sort, keys = get_sort_keys(sort, score)
+
+    params = request.query_params.multi_items() + [("corrected", corrected)]
+    validators = product_listing_validators(query, params)
+    unchanged = not_modified(request, validators)
+    if unchanged:
+        return unchanged
+
+    page = paginate(query, keys, sort, limit, cursor=cursor, skip=skip)
+    set_validators(response, validators)
+    set_next_cursor(request, response, page.next_cursor)
+    if selected:
+        return projected_response([project(product, selected) for product in page.items], response)
+    return fast_response([product_dict(product) for product in page.items], response)
+
+
+@router.get("/suggest", response_model=List[Suggestion])
+async def suggest_products(
+    q: str = Query(..., min_length=1, description="What the user has typed so far"),
+    limit: int = Query(8, ge=1, le=MAX_SUGGESTIONS)
+):
+    """
+    Typeahead suggestions (products, brands and categories)
+    
+    Served from an in-memory prefix index ranked by units sold; never
+    queries the database.
+    """
+    return suggest_index.suggest(q, limit)
+
+
+@router.get("/facets", response_model=ProductFacets)
+async def get_product_facets(
+    request: Request,
+    categoria: Optional[str] = None,
+    search: Optional[str] = None,
+    destacado: Optional[bool] = None,
+    marca: Optional[List[str]] = Query(None),
+    precio_min: Optional[float] = Query(None, ge=0),
+    precio_max: Optional[float] = Query(None, ge=0),
+    rating_min: Optional[float] = Query(None, ge=0, le=5),
+    en_stock: Optional[bool] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Filter sidebar counts for the current filter set, in one call
+    
+    Accepts the same filters as `/api/products` and returns product counts per
+    category, brand, price band and rating ("N stars & up"). Each facet is
+    counted with all filters except its own, so sibling options keep their counts.
+    `spec.<key>` filters are applied to every count.
     """
-    query = db.query(Product)
+    specs = parse_spec_filters(request.query_params)
+    
+    cache_params = None
+    if not search:
+        cache_params = {
+            "facets": True, "categoria": categoria, "destacado": destacado, "marca": marca,
+            "precio_min": precio_min, "precio_max": precio_max,
+            "rating_min": rating_min, "en_stock": en_stock, "specs": specs,
+        }
+        cached = product_cache.get_listing(cache_params)
+        if cached is not None:
+            return cached
+    
+    filters = product_filters(
+        db, categoria=categoria, marca=marca, precio_min=precio_min, precio_max=precio_max,
+        rating_min=rating_min, en_stock=en_stock, destacado=destacado, specs=specs
+    )
+    facets = compute_facets(db, filters, search=search)
+    
+    if cache_params is not None:
+        product_cache.put_listing(cache_params, facets)
+    return facets
 
-    if q:
-        query = query.filter(Product.titulo.ilike(f"%{q}%"))
 
-    products = query.offset(skip).limit(limit).all()
-    return products
+def split_values(values: Optional[List[str]]) -> List[str]:
+    """Accept both repeated (?ids=1&ids=2) and comma separated (?ids=1,2) parameters"""
+    result = []
+    for value in values or []:
+        result.extend(part.strip() for part in value.split(",") if part.strip())
+    return list(dict.fromkeys(result))
+
+
+@router.get("/batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    ids: Optional[List[str]] = Query(None, description="Product IDs (comma separated or repeated)"),
+    skus: Optional[List[str]] = Query(None, description="Product SKUs (comma separated or repeated)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Resolve many products in one request (cart and favorites hydration)
+    
+    - **ids** / **skus**: Up to 100 identifiers in total
+    - Products are returned in request order; unknown identifiers are listed
+      in `missing_ids` / `missing_skus`
+    - Cached products are served from the product cache; the rest are
+      loaded with a single `IN` query
+    """
+    try:
+        product_ids = [int(value) for value in split_values(ids)]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Product IDs must be integers"
+        )
+    product_skus = split_values(skus)
+    
+    if len(product_ids) + len(product_skus) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_SIZE} products can be requested at once"
+        )
+    
+    by_id = {}
+    by_sku = {}
+    for product_id in product_ids:
+        entry = product_cache.get_by_id(product_id)
+        if entry is not None:
+            by_id[product_id] = entry["data"]
+    for sku in product_skus:
+        entry = product_cache.get_by_sku(sku)
+        if entry is not None:
+            by_sku[sku] = entry["data"]
+    
+    missing_ids = [pid for pid in product_ids if pid not in by_id]
+    missing_skus = [sku for sku in product_skus if sku not in by_sku]
+    if missing_ids or missing_skus:
+        rows = db.query(Product).filter(or_(
+            Product.id.in_(missing_ids),
+            Product.sku.in_(missing_skus)
+        )).all()
+        for product in rows:
+            data = cache_product(product)["data"]
+            by_id[product.id] = data
+            by_sku[product.sku] = data
+    
+    products = []
+    seen = set()
+    for data in [by_id.get(pid) for pid in product_ids] + [by_sku.get(sku) for sku in product_skus]:
+        if data is not None and data["id"] not in seen:
+            seen.add(data["id"])
+            products.append(data)
+    
+    return fast_response({
+        "products": products,
+        "missing_ids": [pid for pid in product_ids if pid not in by_id],
+        "missing_skus": [sku for sku in product_skus if sku not in by_sku],
+    })
+
+
+@router.get("/export")
+async def export_catalog(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    categoria: Optional[str] = None,
+    search: Optional[str] = None,
+    destacado: Optional[bool] = None,
+    marca: Optional[List[str]] = Query(None),
+    precio_min: Optional[float] = Query(None, ge=0),
+    precio_max: Optional[float] = Query(None, ge=0),
+    rating_min: Optional[float] = Query(None, ge=0, le=5),
+    en_stock: Optional[bool] = None,
+    fields: Optional[str] = Query(None, description="Fields to export: comma separated names or a preset (card, detail)"),
+    current_user = Depends(get_current_user)
+):
+    """
+    Stream the whole catalog (or a filtered part of it) as NDJSON or CSV (requires authentication)
+    
+    - **format**: `ndjson` (one product per line) or `csv` (header row + one product per row)
+    - Accepts the same filters as `/api/products` (including `spec.{key}`) and `fields`
+      to choose the exported columns (default: every product field)
+    
+    Rows are streamed in id order with constant memory, whatever the catalog size.
+    """
+    selected = parse_fields(fields) or parse_fields("detail")
+    filters = {
+        "categoria": categoria, "marca": marca, "precio_min": precio_min, "precio_max": precio_max,
+        "rating_min": rating_min, "en_stock": en_stock, "destacado": destacado,
+        "specs": parse_spec_filters(request.query_params),
+    }
+    return StreamingResponse(
+        export_products(format, selected, filters, search=search),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: int, db: Session = Depends(get_db)):
+async def get_product(
+    product_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
     """
     Get a specific product by ID
     
     - **product_id**: Product ID
+    - Supports If-None-Match / If-Modified-Since (304 Not Modified)
     """
+    cached = product_cache.get_by_id(product_id)
+    if cached is not None:
+        return send_product(request, response, cached)
+    
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found"
         )
-    return product
+    
+    return send_product(request, response, None, product)
+
+
+def send_related(db: Session, response: Response, product_id: int, kind: str, limit: int, fields: Optional[str]):
+    """Precomputed neighbours of a product (`related_products` of one kind), best first"""
+    selected = parse_fields(fields)
+    if not db.query(Product.id).filter(Product.id == product_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
+    
+    ids = related_product_ids(db, product_id, kind, limit)
+    query = db.query(Product).filter(Product.id.in_(ids))
+    if selected:
+        query = query.options(load_options(selected))
+    by_id = {product.id: product for product in query}
+    related = [by_id[pid] for pid in ids if pid in by_id]
+    
+    if selected:
+        return projected_response([project(product, selected) for product in related], response)
+    return fast_response([product_dict(product) for product in related], response)
+
+
+@router.get("/{product_id}/related", response_model=List[ProductResponse])
+async def get_related_products(
+    product_id: int,
+    response: Response,
+    limit: int = Query(10, ge=1, le=50),
+    fields: Optional[str] = Query(None, description="Fields to return: comma separated names or a preset (card, detail)"),
+    db: Session = Depends(get_db)
+):
+    """
+    "Frequently bought together": products most often ordered with this one
+    
+    - **product_id**: Product ID
+    - **limit**: Maximum number of products to return
+    - **fields**: Sparse fieldset, as in `/api/products`
+    
+    Served from neighbours precomputed from order history (refreshed in the
+    background); empty until the product has been ordered with others.
+    """
+    return send_related(db, response, product_id, "copurchase", limit, fields)
+
+
+@router.get("/{product_id}/similar", response_model=List[ProductResponse])
+async def get_similar_products(
+    product_id: int,
+    response: Response,
+    limit: int = Query(10, ge=1, le=50),
+    fields: Optional[str] = Query(None, description="Fields to return: comma separated names or a preset (card, detail)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Similar products by content (title, brand, category, description and specs)
+    
+    - **product_id**: Product ID
+    - **limit**: Maximum number of products to return
+    - **fields**: Sparse fieldset, as in `/api/products`
+    
+    Works for new products without sales; neighbours are precomputed in the
+    background and picked up within SIMILAR_REFRESH_SECONDS of a change.
+    """
+    return send_related(db, response, product_id, "content", limit, fields)
 
 
 @router.get("/sku/{sku}", response_model=ProductResponse)
-async def get_product_by_sku(sku: str, db: Session = Depends(get_db)):
+async def get_product_by_sku(
+    sku: str,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
     """
     Get a specific product by SKU
     
     - **sku**: Product SKU code
+    - Supports If-None-Match / If-Modified-Since (304 Not Modified)
     """
+    cached = product_cache.get_by_sku(sku)
+    if cached is not None:
+        return send_product(request, response, cached)
+    
     product = db.query(Product).filter(Product.sku == sku).first()
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found"
         )
-    return product
+    
+    return send_product(request, response, None, product)
 
 
 @router.post("/", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
@@ -130,12 +616,77 @@ async def create_product(
     
     new_product = Product(**product.model_dump())
     db.add(new_product)
+    db.flush()
+    index_products(db, [new_product.id])
+    sync_product_specs(db, [new_product.id])
     db.commit()
     db.refresh(new_product)
+    product_cache.invalidate_products([new_product])
+    suggest_index.upsert_product(new_product)
+    fuzzy_index.add_product(new_product)
     
     return new_product
 
 
+@router.post("/import", response_model=ProductImportResult)
+async def import_products(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$", description="ndjson or csv (default: from Content-Type)"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Bulk create / update products by SKU (requires authentication)
+    
+    - **format**: `ndjson` (one product object per line) or `csv` (header row with
+      the field names); defaults to csv for `text/csv` bodies, ndjson otherwise
+    
+    Rows use the product fields with the category given by name (`categoria`) or
+    id (`categoria_id`). Existing SKUs are replaced (rating and sales are kept).
+    Invalid rows are skipped and listed in the report with their line number.
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    
+    body = await spool_request_body(request)
+    try:
+        result = await run_in_threadpool(run_import, db, body, format)
+    finally:
+        body.close()
+    
+    if result.inserted or result.updated:
+        await run_in_threadpool(suggest_index.rebuild, db)
+        await run_in_threadpool(fuzzy_index.rebuild, db)
+    return result
+
+
+@router.patch("/bulk", response_model=ProductBulkUpdateResult)
+async def bulk_update(
+    items: List[ProductBulkUpdateItem],
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Update price, stock and featured flag of many products at once (requires authentication)
+    
+    Body: list of `{id | sku, precio?, stock?, stock_delta?, destacado?}`.
+    
+    - **stock**: New absolute stock level
+    - **stock_delta**: Relative adjustment applied on top of the current stock (floored at 0)
+    - Stock never goes below the units held in carts (`reservado`); lower values are raised to it
+    
+    Applied with set-based UPDATEs in one transaction (all or nothing). Returns how
+    many products were found and changed, and which ids / SKUs do not exist.
+    """
+    if len(items) > MAX_BULK_UPDATE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BULK_UPDATE_SIZE} items per request"
+        )
+    
+    return await run_in_threadpool(bulk_update_products, db, items)
+
+
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(
     product_id: int,
@@ -158,11 +709,22 @@ async def update_product(
     
     # Update only provided fields
     update_data = product.model_dump(exclude_unset=True)
+    if update_data.get("stock") is not None and update_data["stock"] < db_product.reservado:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Stock cannot be lower than the {db_product.reservado} units held in carts"
+        )
     for field, value in update_data.items():
         setattr(db_product, field, value)
     
+    db.flush()
+    index_products(db, [db_product.id])
+    sync_product_specs(db, [db_product.id])
     db.commit()
     db.refresh(db_product)
+    product_cache.invalidate_products([db_product])
+    suggest_index.upsert_product(db_product)
+    fuzzy_index.add_product(db_product)
     
     return db_product
 
@@ -186,7 +748,11 @@ async def delete_product(
             detail="Product not found"
         )
     
+    remove_products(db, [product.id])
+    remove_product_specs(db, [product.id])
     db.delete(product)
     db.commit()
+    product_cache.invalidate(ids=[product_id], skus=[product.sku])
+    suggest_index.remove_product(product_id)
     
     return {"message": "Product deleted successfully"}
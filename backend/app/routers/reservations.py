@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from typing import Dict, List
+
+from ..database import get_db
+from ..models import User
+from ..schemas import ReservationResponse, ReservationUpdate
+from ..auth import get_current_user
+from ..reservations import get_reservations, release_cart, reserve_cart
+
+router = APIRouter(prefix="/api/cart/reservations", tags=["Cart"])
+
+
+@router.get("/", response_model=List[ReservationResponse])
+async def get_cart_reservations(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Stock held for the current user's cart (requires authentication)
+    """
+    return get_reservations(db, current_user.id)
+
+
+@router.put("/", response_model=List[ReservationResponse])
+async def update_cart_reservations(
+    data: ReservationUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Hold stock for the cart's contents (requires authentication)
+    
+    - **items**: The whole cart as product_id / quantity; products left out
+      (or with quantity 0) are released
+    - Every hold expires `RESERVATION_TTL_SECONDS` after the last update;
+      send the cart again to keep it
+    - Placing an order converts the holds of its products into the sale
+    - 400 if there is not enough stock that other carts don't hold
+    """
+    quantities: Dict[int, int] = {}
+    for item in data.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return reserve_cart(db, current_user.id, quantities)
+
+
+@router.delete("/")
+async def delete_cart_reservations(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Release every hold of the current user's cart (requires authentication)
+    """
+    release_cart(db, current_user.id)
+    
+    return {"message": "Reservations released successfully"}
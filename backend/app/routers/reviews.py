@@ -1,22 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List
+from typing import List, Optional
 
 from ..database import get_db
 from ..models import Review, Product, User
 from ..schemas import ReviewResponse, ReviewCreate
 from ..auth import get_current_user
+from ..pagination import DEFAULT_PAGE_SIZE, SortKey, paginate, set_next_cursor
+from ..cache import product_cache
 
 router = APIRouter(prefix="/api/reviews", tags=["Reviews"])
 
+# Newest reviews first; matches the (product_id, created_at, id) index
+REVIEW_SORT_KEYS = [SortKey(Review.created_at, True), SortKey(Review.id, True)]
+
 
 @router.get("/product/{product_id}", response_model=List[ReviewResponse])
-async def get_product_reviews(product_id: int, db: Session = Depends(get_db)):
+async def get_product_reviews(
+    product_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
     """
-    Get all reviews for a specific product
+    Get reviews for a specific product, newest first
     
     - **product_id**: Product ID
+    - **limit**: Page size; without `limit` or `cursor` all reviews are returned
+    - **cursor**: Opaque cursor from the `X-Next-Cursor` / `Link` header of the previous page
     """
     # Check if product exists
     product = db.query(Product).filter(Product.id == product_id).first()
@@ -26,8 +40,14 @@ async def get_product_reviews(product_id: int, db: Session = Depends(get_db)):
             detail="Product not found"
         )
     
-    reviews = db.query(Review).filter(Review.product_id == product_id).all()
-    return reviews
+    query = db.query(Review).filter(Review.product_id == product_id)
+    
+    if limit is None and not cursor:
+        return query.order_by(Review.created_at.desc(), Review.id.desc()).all()
+    
+    page = paginate(query, REVIEW_SORT_KEYS, "newest", limit or DEFAULT_PAGE_SIZE, cursor=cursor)
+    set_next_cursor(request, response, page.next_cursor)
+    return page.items
 
 
 @router.post("/", response_model=ReviewResponse, status_code=status.HTTP_201_CREATED)
@@ -82,6 +102,7 @@ async def create_review(
     
     product.rating = round(float(avg_rating), 2) if avg_rating else 0.0
     db.commit()
+    product_cache.invalidate_products([product])
     
     db.refresh(new_review)
     return new_review
@@ -128,5 +149,6 @@ async def delete_review(
     if product:
         product.rating = round(float(avg_rating), 2) if avg_rating else 0.0
         db.commit()
+        product_cache.invalidate_products([product])
     
     return {"message": "Review deleted successfully"}
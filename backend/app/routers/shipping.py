@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Query
+from typing import List, Optional
+
+from ..schemas import LocalityResponse, ShippingMethodResponse
+from ..checkout import rate_table
+
+router = APIRouter(tags=["Shipping"])
+
+
+@router.get("/api/shipping/methods", response_model=List[ShippingMethodResponse])
+async def get_shipping_methods():
+    """
+    Active shipping methods, cheapest first
+    
+    - **cost**: Base cost; the charged cost depends on region and subtotal
+      (see `POST /api/checkout/quote`)
+    
+    Served from the in-memory rate table (no database access).
+    """
+    rate_table.ensure_loaded()
+    return rate_table.methods
+
+
+@router.get("/api/localities", response_model=List[LocalityResponse])
+async def get_localities(
+    region: Optional[str] = Query(None, description="Only localities of this region (case insensitive)")
+):
+    """
+    Localities available for shipping, by region and name
+    
+    - **region**: Optional region filter
+    
+    Served from the in-memory rate table (no database access).
+    """
+    return rate_table.localities_in(region)
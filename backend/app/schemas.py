@@ -86,11 +86,104 @@ class ProductResponse(ProductBase):
     id: int
     rating: float
     vendidos: int
+    disponible: int = 0  # Stock not held by cart reservations
     created_at: datetime
     
     model_config = ConfigDict(from_attributes=True)
 
 
+class ProductBatchResponse(BaseModel):
+    products: List[ProductResponse]  # In request order (ids first, then skus)
+    missing_ids: List[int] = []
+    missing_skus: List[str] = []
+
+
+class ProductImportRow(BaseModel):
+    """One row of a bulk import; the category is given by name or by id"""
+    sku: str = Field(..., min_length=1, max_length=50)
+    titulo: str = Field(..., min_length=1, max_length=255)
+    categoria: Optional[str] = None
+    categoria_id: Optional[int] = None
+    marca: Optional[str] = Field(None, max_length=100)
+    precio: float = Field(..., ge=0)
+    stock: int = Field(0, ge=0)
+    descripcion: Optional[str] = None
+    imagenes: List[str] = []
+    destacado: bool = False
+    specs: dict = {}
+
+
+class ImportRowError(BaseModel):
+    line: int  # 1-based line (CSV: record) number in the uploaded file
+    sku: Optional[str] = None
+    error: str
+
+
+class ProductImportResult(BaseModel):
+    received: int
+    inserted: int
+    updated: int
+    failed: int
+    errors: List[ImportRowError]
+    errors_truncated: bool = False  # More rows failed than are listed in `errors`
+
+
+class ProductBulkUpdateItem(BaseModel):
+    """Change for one product, identified by `id` or `sku`"""
+    id: Optional[int] = None
+    sku: Optional[str] = None
+    precio: Optional[float] = Field(None, ge=0)
+    stock: Optional[int] = Field(None, ge=0)  # Absolute stock level
+    stock_delta: Optional[int] = None  # Relative adjustment (never goes below 0)
+    destacado: Optional[bool] = None
+
+
+class ProductBulkUpdateResult(BaseModel):
+    requested: int
+    matched: int
+    changed: int
+    not_found_ids: List[int] = []
+    not_found_skus: List[str] = []
+
+
+class Suggestion(BaseModel):
+    text: str
+    type: str  # "product", "brand" or "category"
+    product_id: Optional[int] = None
+    category_id: Optional[int] = None
+
+
+# ========== Facet Schemas ==========
+class CategoryFacet(BaseModel):
+    id: int
+    name: str
+    count: int
+
+
+class ValueFacet(BaseModel):
+    value: str
+    count: int
+
+
+class PriceBandFacet(BaseModel):
+    min: float
+    max: Optional[float] = None  # None = open ended
+    count: int
+
+
+class RatingFacet(BaseModel):
+    min_rating: int
+    count: int
+
+
+class ProductFacets(BaseModel):
+    total: int
+    categorias: List[CategoryFacet]
+    marcas: List[ValueFacet]
+    precios: List[PriceBandFacet]
+    ratings: List[RatingFacet]
+
+
 # ========== Review Schemas ==========
 class ReviewBase(BaseModel):
     rating: int = Field(..., ge=1, le=5)
@@ -114,17 +207,13 @@ class ReviewResponse(ReviewBase):
 class CouponBase(BaseModel):
     code: str
     description: Optional[str] = None
-    discount_type: str  # "percentage" or "fixed"
+    discount_type: str  # "percentage", "fixed" or "ship" (free shipping)
     discount_value: float
     min_purchase: float = 0
     is_active: bool = True
     expires_at: Optional[datetime] = None
 
 
-class CouponCreate(CouponBase):
-    pass
-
-
 class CouponResponse(CouponBase):
     id: int
     created_at: datetime
@@ -137,6 +226,13 @@ class CouponValidate(BaseModel):
     subtotal: float
 
 
+class CouponQuote(BaseModel):
+    code: str
+    discount_type: str
+    discount: float
+    free_shipping: bool = False
+
+
 # ========== Order Schemas ==========
 class OrderItemBase(BaseModel):
     product_id: int
@@ -194,6 +290,51 @@ class OrderResponse(OrderBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class OrderSummary(BaseModel):
+    order_count: int = 0
+    total_spent: float = 0.0
+    last_order_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
+# ========== Checkout Schemas ==========
+class CheckoutQuoteLine(BaseModel):
+    product_id: int
+    quantity: int
+    price: float  # Current catalog price
+    total: float
+
+
+class CheckoutQuote(BaseModel):
+    items: List[CheckoutQuoteLine]
+    subtotal: float
+    discount: float
+    coupon_code: Optional[str] = None
+    shipping_method: Optional[str] = None
+    shipping_cost: float
+    free_shipping: bool = False
+    total: float
+
+
+# ========== Reservation Schemas ==========
+class ReservationItem(BaseModel):
+    product_id: int
+    quantity: int = Field(..., ge=0)  # 0 releases the product
+
+
+class ReservationUpdate(BaseModel):
+    items: List[ReservationItem]
+
+
+class ReservationResponse(BaseModel):
+    product_id: int
+    quantity: int
+    expires_at: datetime
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
 # ========== Favorite Schemas ==========
 class FavoriteCreate(BaseModel):
     product_id: int
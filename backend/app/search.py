@@ -0,0 +1,236 @@
+"""
+Full-text product search
+
+Maintains a search index over product titulo, marca, descripcion and
+category name, and ranks matches by relevance:
+
+- PostgreSQL: `product_search` table with a weighted tsvector (GIN index)
+  and a trigram GIN index over the short document (titulo, marca, category)
+  so substring matches keep working without a sequential scan.
+- SQLite: `product_fts` FTS5 virtual table ranked with bm25().
+- Any other dialect falls back to the old `ilike` filter on titulo.
+
+The index is not maintained by triggers: callers that write products must
+call `index_products()` / `remove_products()` inside the same transaction.
+"""
+import re
+from typing import Any, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, bindparam, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query, Session
+
+from .models import Product
+
+# Weights used by bm25() on SQLite, in column order (titulo, marca, categoria, descripcion)
+FTS_WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+
+# Text search configuration on PostgreSQL ('simple' keeps brand names and Spanish words intact)
+PG_TS_CONFIG = "simple"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# ==================== SCHEMA ====================
+
+_PG_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE TABLE IF NOT EXISTS product_search (
+        product_id INTEGER PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,
+        document TEXT NOT NULL,
+        search_vector TSVECTOR NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_product_search_vector ON product_search USING GIN (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_product_search_document_trgm ON product_search USING GIN (document gin_trgm_ops)",
+]
+
+_PG_DROP = ["DROP TABLE IF EXISTS product_search"]
+
+_SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        titulo, marca, categoria, descripcion,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+]
+
+_SQLITE_DROP = ["DROP TABLE IF EXISTS product_fts"]
+
+
+def _dialect(bind) -> str:
+    if isinstance(bind, Session):
+        bind = bind.get_bind()
+    return bind.dialect.name
+
+
+def create_search_index(bind) -> None:
+    """Create the search index structures for the current dialect (idempotent)"""
+    statements = {"postgresql": _PG_CREATE, "sqlite": _SQLITE_CREATE}.get(_dialect(bind), [])
+    _run(bind, statements)
+
+
+def drop_search_index(bind) -> None:
+    """Drop the search index structures for the current dialect"""
+    statements = {"postgresql": _PG_DROP, "sqlite": _SQLITE_DROP}.get(_dialect(bind), [])
+    _run(bind, statements)
+
+
+def _run(bind, statements: List[str]) -> None:
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+    else:
+        for statement in statements:
+            bind.execute(text(statement))
+
+
+# ==================== MAINTENANCE ====================
+
+_PG_UPSERT = f"""
+    INSERT INTO product_search (product_id, document, search_vector)
+    SELECT p.id,
+           lower(concat_ws(' ', p.titulo, p.marca, c.name)),
+           setweight(to_tsvector('{PG_TS_CONFIG}', coalesce(p.titulo, '')), 'A') ||
+           setweight(to_tsvector('{PG_TS_CONFIG}', coalesce(p.marca, '')), 'B') ||
+           setweight(to_tsvector('{PG_TS_CONFIG}', coalesce(c.name, '')), 'C') ||
+           setweight(to_tsvector('{PG_TS_CONFIG}', coalesce(p.descripcion, '')), 'D')
+    FROM products p
+    JOIN categories c ON c.id = p.categoria_id
+    {{where}}
+    ON CONFLICT (product_id) DO UPDATE
+        SET document = EXCLUDED.document,
+            search_vector = EXCLUDED.search_vector
+"""
+
+_SQLITE_INSERT = """
+    INSERT INTO product_fts (rowid, titulo, marca, categoria, descripcion)
+    SELECT p.id, p.titulo, coalesce(p.marca, ''), coalesce(c.name, ''), coalesce(p.descripcion, '')
+    FROM products p
+    JOIN categories c ON c.id = p.categoria_id
+    {where}
+"""
+
+
+def index_products(bind, product_ids: Iterable[int]) -> None:
+    """
+    (Re)index the given products from their current database rows
+
+    Must run after the product rows are flushed; it reads them back with the
+    category name so the index always matches what is stored.
+    """
+    ids = sorted({int(pid) for pid in product_ids if pid is not None})
+    if not ids:
+        return
+
+    dialect = _dialect(bind)
+    where = "WHERE p.id IN :ids"
+    if dialect == "postgresql":
+        bind.execute(_with_ids(_PG_UPSERT.format(where=where)), {"ids": ids})
+    elif dialect == "sqlite":
+        bind.execute(_with_ids("DELETE FROM product_fts WHERE rowid IN :ids"), {"ids": ids})
+        bind.execute(_with_ids(_SQLITE_INSERT.format(where=where)), {"ids": ids})
+
+
+def remove_products(bind, product_ids: Iterable[int]) -> None:
+    """Remove the given products from the search index"""
+    ids = sorted({int(pid) for pid in product_ids if pid is not None})
+    if not ids:
+        return
+
+    dialect = _dialect(bind)
+    if dialect == "postgresql":
+        bind.execute(_with_ids("DELETE FROM product_search WHERE product_id IN :ids"), {"ids": ids})
+    elif dialect == "sqlite":
+        bind.execute(_with_ids("DELETE FROM product_fts WHERE rowid IN :ids"), {"ids": ids})
+
+
+def rebuild_search_index(bind) -> None:
+    """Rebuild the whole index from the products table"""
+    dialect = _dialect(bind)
+    if dialect == "postgresql":
+        bind.execute(text("DELETE FROM product_search"))
+        bind.execute(text(_PG_UPSERT.format(where="")))
+    elif dialect == "sqlite":
+        bind.execute(text("DELETE FROM product_fts"))
+        bind.execute(text(_SQLITE_INSERT.format(where="")))
+
+
+def _with_ids(sql: str):
+    return text(sql).bindparams(bindparam("ids", expanding=True))
+
+
+# ==================== QUERYING ====================
+
+def tokenize(q: str) -> List[str]:
+    """Split a user query into lowercase word tokens"""
+    return [token.lower() for token in _TOKEN_RE.findall(q or "")]
+
+
+def _ranked_matches(db: Session, q: str):
+    """
+    Subquery of (product_id, score) for products matching `q`, higher score first
+
+    Every token is matched as a prefix so results show up while the user is
+    still typing. A query without word tokens (only punctuation) matches
+    nothing. Returns None when the dialect has no search index.
+    """
+    tokens = tokenize(q)
+    dialect = _dialect(db)
+    if dialect not in ("postgresql", "sqlite"):
+        return None
+
+    if not tokens:
+        stmt = text("SELECT 0 AS product_id, 0.0 AS score WHERE 1 = 0")
+    elif dialect == "postgresql":
+        tsquery = " & ".join(f"{token}:*" for token in tokens)
+        stmt = text(f"""
+            SELECT product_id,
+                   ts_rank_cd(search_vector, to_tsquery('{PG_TS_CONFIG}', :tsquery))
+                   + similarity(document, :raw) AS score
+            FROM product_search
+            WHERE search_vector @@ to_tsquery('{PG_TS_CONFIG}', :tsquery)
+               OR document LIKE :like
+        """).bindparams(tsquery=tsquery, raw=q.lower(), like=f"%{_escape_like(q.lower())}%")
+    elif dialect == "sqlite":
+        match = " AND ".join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+        weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+        stmt = text(f"""
+            SELECT rowid AS product_id, -bm25(product_fts, {weights}) AS score
+            FROM product_fts
+            WHERE product_fts MATCH :match
+        """).bindparams(match=match)
+
+    return stmt.columns(product_id=Integer, score=Float).subquery("search_matches")
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def apply_search(query: Query, db: Session, q: Optional[str]) -> Tuple[Query, Optional[Any]]:
+    """
+    Restrict a Product query to matches for `q`, ordered by relevance
+
+    Ties are broken by units sold so popular products surface first.
+
+    Returns:
+        (query, score) where `score` is the relevance column usable as a sort
+        key, or None when there is no query or the dialect has no index
+    """
+    if not q:
+        return query, None
+
+    matches = _ranked_matches(db, q)
+    if matches is None:
+        return query.filter(Product.titulo.ilike(f"%{q}%")), None
+
+    query = query.join(matches, matches.c.product_id == Product.id).order_by(
+        matches.c.score.desc(),
+        Product.vendidos.desc(),
+        Product.id.desc(),
+    )
+    return query, matches.c.score
@@ -0,0 +1,330 @@
+"""
+Content-based "similar products"
+
+Each product becomes a sparse TF-IDF vector over its title, brand, category,
+description and spec attributes (log-scaled term frequency, L2-normalized).
+Similarities are sparse dot products computed through an inverted index:
+for a product, only the postings of its own terms are visited, and terms
+present in more than MAX_DF_RATIO of the catalog are ignored (they match
+nearly everything and say little). The best SIMILAR_TOP_K neighbours above
+MIN_SCORE are stored in `related_products` with kind "content".
+
+Scoring is quadratic in the catalog size, so this never runs in the API
+workers: the scheduler (`python -m app.jobs`) runs it every
+SIMILAR_REFRESH_SECONDS, and `python -m app.similarity [--full]` runs it once.
+
+Runs are incremental. Each product's term bag is persisted in `product_terms`;
+only products modified since the last run are re-tokenized, and only those
+whose bag actually changed are scored (an import that rewrites every row
+with the same content scores nothing). Their scores also place them in the
+other products' stored lists (similarity is symmetric); another product is
+scored itself only if its full list lost an entry it cannot replace. Scores
+of untouched products drift slightly as IDF weights change, so a run scores
+everything when more than FULL_REBUILD_RATIO of the catalog changed (or
+with `--full`).
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from .models import Category, Product, ProductTerms, RelatedProduct
+from .recommendations import lock_checkpoint
+from .suggest import normalize
+
+CHECKPOINT = "content-similarity"
+KIND = "content"
+
+# Terms found in more than this share of products are skipped
+MAX_DF_RATIO = 0.2
+
+# Neighbours scoring below this are not stored
+MIN_SCORE = 0.05
+
+# Products read / written per statement
+RANK_CHUNK_SIZE = 500
+
+# Above this share of changed products, IDF drift makes a full rebuild worthwhile
+FULL_REBUILD_RATIO = 0.05
+
+Vector = Dict[str, float]
+
+
+def product_terms(titulo: str, marca: Optional[str], category: Optional[str],
+                  descripcion: Optional[str], specs: Optional[dict]) -> Counter:
+    """Weighted bag of terms describing a product"""
+    terms: Counter = Counter()
+    for word in normalize(titulo).split():
+        terms[word] += 2  # The title says most about what the product is
+    if normalize(marca):
+        terms["marca:" + normalize(marca)] += 2
+    if category:
+        terms["categoria:" + normalize(category)] += 1
+    for word in normalize(descripcion).split():
+        if len(word) > 2:
+            terms[word] += 1
+    for key, value in (specs or {}).items():
+        if isinstance(value, (str, int, float)):
+            terms[f"spec:{normalize(str(key))}={normalize(str(value))}"] += 1
+            for word in normalize(str(value)).split():
+                terms[word] += 1
+    return terms
+
+
+def build_vectors(bags: Dict[int, Dict[str, int]]) -> Dict[int, Vector]:
+    """TF-IDF vectors (L2-normalized) from the term bags of the whole catalog"""
+    df: Counter = Counter()
+    for bag in bags.values():
+        df.update(bag.keys())
+
+    total = len(bags)
+    max_df = max(2, int(total * MAX_DF_RATIO))
+    vectors: Dict[int, Vector] = {}
+    for product_id, bag in bags.items():
+        vector = {
+            term: (1 + math.log(count)) * math.log(total / df[term])
+            for term, count in bag.items()
+            if 1 < df[term] <= max_df  # Unique terms cannot match anything
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        vectors[product_id] = {term: w / norm for term, w in vector.items()} if norm else {}
+    return vectors
+
+
+class SimilarityIndex:
+    """Inverted index over TF-IDF vectors for sparse dot products"""
+
+    def __init__(self, vectors: Dict[int, Vector]):
+        self.vectors = vectors
+        self.postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for product_id, vector in vectors.items():
+            for term, weight in vector.items():
+                self.postings[term].append((product_id, weight))
+
+    def scores(self, product_id: int) -> Dict[int, float]:
+        """Cosine similarity of a product with every product sharing a term"""
+        scores: Dict[int, float] = defaultdict(float)
+        for term, weight in self.vectors.get(product_id, {}).items():
+            for other_id, other_weight in self.postings[term]:
+                scores[other_id] += weight * other_weight
+        scores.pop(product_id, None)
+        return scores
+
+    def neighbours(self, product_id: int, top_k: int) -> List[Tuple[float, int]]:
+        return top_neighbours(self.scores(product_id), top_k)
+
+
+def _rank_key(item: Tuple[float, int]) -> Tuple[float, int]:
+    # Scores are stored rounded; ranking on the same value keeps patched lists
+    # ordered exactly like freshly computed ones. Ties go to the lower id.
+    return round(item[0], 6), -item[1]
+
+
+def top_neighbours(scores: Dict[int, float], top_k: int) -> List[Tuple[float, int]]:
+    """Best (score, id) pairs above MIN_SCORE"""
+    scored = ((score, other_id) for other_id, score in scores.items() if score >= MIN_SCORE)
+    return heapq.nlargest(top_k, scored, key=_rank_key)
+
+
+# ==================== TERM BAGS ====================
+
+def _load_bags(db: Session, since: Optional[datetime] = None) -> Dict[int, Dict[str, int]]:
+    """Term bags computed from the products (modified since `since`, or all)"""
+    query = (
+        select(Product.id, Product.titulo, Product.marca, Category.name, Product.descripcion, Product.specs)
+        .join(Category, Category.id == Product.categoria_id, isouter=True)
+    )
+    if since is not None:
+        query = query.where(func.coalesce(Product.updated_at, Product.created_at) >= since)
+    return {row[0]: dict(product_terms(*row[1:])) for row in db.execute(query)}
+
+
+def _stored_bags(db: Session, product_ids: Optional[List[int]] = None) -> Dict[int, Dict[str, int]]:
+    """Persisted term bags (of `product_ids`, or all)"""
+    if product_ids is None:
+        return dict(db.execute(select(ProductTerms.product_id, ProductTerms.terms)).all())
+    bags = {}
+    for start in range(0, len(product_ids), RANK_CHUNK_SIZE):
+        chunk = product_ids[start:start + RANK_CHUNK_SIZE]
+        bags.update(db.execute(
+            select(ProductTerms.product_id, ProductTerms.terms).where(ProductTerms.product_id.in_(chunk))
+        ).all())
+    return bags
+
+
+def _save_bags(db: Session, bags: Dict[int, Dict[str, int]], removed: Iterable[int] = ()) -> None:
+    ids = sorted(set(bags) | set(removed))
+    for start in range(0, len(ids), RANK_CHUNK_SIZE):
+        db.execute(delete(ProductTerms).where(ProductTerms.product_id.in_(ids[start:start + RANK_CHUNK_SIZE])))
+    rows = [{"product_id": product_id, "terms": bag} for product_id, bag in bags.items()]
+    for start in range(0, len(rows), RANK_CHUNK_SIZE):
+        db.execute(insert(ProductTerms), rows[start:start + RANK_CHUNK_SIZE])
+
+
+# ==================== NEIGHBOUR LISTS ====================
+
+def _stored_lists(db: Session, product_ids: List[int]) -> Dict[int, Dict[int, float]]:
+    """product id -> {stored neighbour id: score}"""
+    lists: Dict[int, Dict[int, float]] = {}
+    for start in range(0, len(product_ids), RANK_CHUNK_SIZE):
+        rows = db.execute(
+            select(RelatedProduct.product_id, RelatedProduct.related_id, RelatedProduct.score)
+            .where(RelatedProduct.kind == KIND,
+                   RelatedProduct.product_id.in_(product_ids[start:start + RANK_CHUNK_SIZE]))
+        )
+        for product_id, related_id, score in rows:
+            lists.setdefault(product_id, {})[related_id] = score
+    return lists
+
+
+def _listing(db: Session, related_ids: List[int]) -> Set[int]:
+    """Products with any of `related_ids` among their stored neighbours"""
+    found: Set[int] = set()
+    for start in range(0, len(related_ids), RANK_CHUNK_SIZE):
+        found.update(db.scalars(
+            select(RelatedProduct.product_id).distinct()
+            .where(RelatedProduct.kind == KIND,
+                   RelatedProduct.related_id.in_(related_ids[start:start + RANK_CHUNK_SIZE]))
+        ))
+    return found
+
+
+def _store(db: Session, lists: Dict[int, List[Tuple[float, int]]]) -> None:
+    """Replace the stored neighbours of the products in `lists`"""
+    product_ids = sorted(lists)
+    for start in range(0, len(product_ids), RANK_CHUNK_SIZE):
+        chunk = product_ids[start:start + RANK_CHUNK_SIZE]
+        db.execute(delete(RelatedProduct).where(
+            RelatedProduct.kind == KIND, RelatedProduct.product_id.in_(chunk)
+        ))
+        rows = [
+            {"product_id": product_id, "kind": KIND, "rank": rank, "related_id": other_id, "score": round(score, 6)}
+            for product_id in chunk
+            for rank, (score, other_id) in enumerate(lists[product_id], start=1)
+        ]
+        if rows:
+            db.execute(insert(RelatedProduct), rows)
+
+
+def _rank_all(db: Session, index: SimilarityIndex, top_k: int) -> int:
+    db.execute(delete(RelatedProduct).where(RelatedProduct.kind == KIND))
+    product_ids = sorted(index.vectors)
+    for start in range(0, len(product_ids), RANK_CHUNK_SIZE):
+        chunk = product_ids[start:start + RANK_CHUNK_SIZE]
+        _store(db, {product_id: index.neighbours(product_id, top_k) for product_id in chunk})
+    return len(product_ids)
+
+
+def _rank_changed(db: Session, index: SimilarityIndex, changed: Set[int], removed: Set[int], top_k: int) -> int:
+    """
+    Score the changed products and patch the stored lists of the others
+
+    Similarity is symmetric, so a changed product's scores also say where it
+    ranks in everyone else's list. Another product is re-scored itself only
+    when its list was full and lost an entry (or an entry dropped below the
+    weakest one stored): the next candidate was never stored.
+    """
+    scores = {product_id: index.scores(product_id) for product_id in changed}
+    gone = changed | removed
+    others = {
+        other_id for product_scores in scores.values()
+        for other_id, score in product_scores.items() if score >= MIN_SCORE
+    }
+    others |= _listing(db, sorted(gone))
+    others -= gone
+
+    lists = {product_id: top_neighbours(scores[product_id], top_k) for product_id in changed}
+    rescored = len(changed)
+    stored_lists = _stored_lists(db, sorted(others))
+    for other_id in others:
+        stored = stored_lists.get(other_id, {})
+        merged = {related_id: score for related_id, score in stored.items() if related_id not in gone}
+        for product_id, product_scores in scores.items():
+            score = product_scores.get(other_id, 0.0)
+            if score >= MIN_SCORE:
+                merged[product_id] = score
+        ranked = top_neighbours(merged, top_k)
+        weakest = min(((score, related_id) for related_id, score in stored.items()), key=_rank_key, default=None)
+        if len(stored) >= top_k and (len(ranked) < top_k or _rank_key(ranked[-1]) < _rank_key(weakest)):
+            ranked = index.neighbours(other_id, top_k)
+            rescored += 1
+        if {related_id: round(score, 6) for score, related_id in ranked} != stored:
+            lists[other_id] = ranked
+
+    _store(db, lists)
+    return rescored
+
+
+def refresh_similar_products(db: Session, full: bool = False) -> int:
+    """
+    Update content neighbours for products whose content changed since the last run and commit
+
+    Returns the number of products scored.
+    """
+    top_k = settings.SIMILAR_TOP_K
+    checkpoint = lock_checkpoint(db, CHECKPOINT)
+    started_at: datetime = db.scalar(select(func.now()))
+
+    if full or checkpoint.covered_until is None:
+        bags = _load_bags(db)
+        db.execute(delete(ProductTerms))
+        _save_bags(db, bags)
+        scored = _rank_all(db, SimilarityIndex(build_vectors(bags)), top_k)
+    else:
+        # One second of overlap: SQLite timestamps have second resolution
+        modified = _load_bags(db, since=checkpoint.covered_until - timedelta(seconds=1))
+        previous = _stored_bags(db, sorted(modified))
+        # Imports rewrite every row; only a different bag changes anything
+        changed = {product_id: bag for product_id, bag in modified.items() if previous.get(product_id) != bag}
+        removed = set(db.scalars(
+            select(ProductTerms.product_id).where(~select(Product.id).where(Product.id == ProductTerms.product_id).exists())
+        ))
+        scored = 0
+        if changed or removed:
+            _save_bags(db, changed, removed)
+            db.execute(delete(RelatedProduct).where(
+                RelatedProduct.kind == KIND, RelatedProduct.product_id.in_(sorted(removed))
+            ))
+            bags = _stored_bags(db)
+            index = SimilarityIndex(build_vectors(bags))
+            if len(changed) + len(removed) > FULL_REBUILD_RATIO * len(bags):
+                scored = _rank_all(db, index, top_k)
+            else:
+                scored = _rank_changed(db, index, set(changed), removed, top_k)
+
+    checkpoint.covered_until = started_at
+    db.commit()
+    return scored
+
+
+def refresh_similar_products_job() -> None:
+    """Scheduled job (app.jobs): incremental content-similarity refresh in its own session"""
+    db = SessionLocal()
+    try:
+        refresh_similar_products(db)
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"WARNING: Could not refresh similar products: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    # python -m app.similarity [--full]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh content-based similar products")
+    parser.add_argument("--full", action="store_true", help="rebuild term bags and every neighbour list")
+    args = parser.parse_args()
+    session = SessionLocal()
+    try:
+        print(f"Scored {refresh_similar_products(session, full=args.full)} products")
+    finally:
+        session.close()
@@ -0,0 +1,158 @@
+"""
+Spec attribute filters (`spec.<key>=<value>` on product listings)
+
+`Product.specs` is a free-form JSON object. Each attribute is copied into
+the `product_specs` side table (one row per product and key) with its key and
+value normalized like search text (lowercase, no accents), plus the leading
+number of the value, so listings can filter with indexed lookups:
+
+- `spec.ram=16GB`: equality; repeat the parameter to accept several values
+- `spec.altura.min=10` / `spec.altura.max=30`: numeric range on the value
+
+Keys may be given as stored ("Edad recomendada") or normalized
+("edad_recomendada"). The table is not maintained by triggers: callers that
+write products must call `sync_product_specs()` / `remove_product_specs()`
+inside the same transaction, as with the search index.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, insert, select
+
+from .models import Product, ProductSpec
+from .suggest import normalize
+
+# Query parameter prefix for spec filters
+SPEC_PARAM_PREFIX = "spec."
+
+# Rows inserted per statement when rebuilding
+BATCH_SIZE = 1000
+
+_NUMBER_RE = re.compile(r"\s*(-?\d+(?:[.,]\d+)?)")
+
+
+def spec_key(key: str) -> str:
+    """Normalized attribute name: 'Edad recomendada' -> 'edad_recomendada'"""
+    return "_".join(normalize(key).split())
+
+
+def spec_number(value: str) -> Optional[float]:
+    """Leading number of a value ('15 cm' -> 15.0, '2,5 kg' -> 2.5), None if it has none"""
+    match = _NUMBER_RE.match(value)
+    return float(match.group(1).replace(",", ".")) if match else None
+
+
+def spec_rows(product_id: int, specs: Optional[dict]) -> List[dict]:
+    """`product_specs` rows for one product's specs"""
+    rows = {}
+    for key, value in (specs or {}).items():
+        if isinstance(value, dict) or value is None:
+            continue
+        if isinstance(value, list):
+            value = ", ".join(str(item) for item in value)
+        key = spec_key(str(key))[:100]
+        if not key:
+            continue
+        text_value = str(value)
+        rows[key] = {
+            "product_id": product_id,
+            "key": key,
+            "value": normalize(text_value)[:255],
+            "value_num": spec_number(text_value),
+        }
+    return list(rows.values())
+
+
+# ==================== MAINTENANCE ====================
+
+def sync_product_specs(bind, product_ids: Iterable[int]) -> None:
+    """
+    Rewrite the spec rows of the given products from their current database rows
+
+    Must run after the product rows are flushed.
+    """
+    ids = sorted({int(pid) for pid in product_ids if pid is not None})
+    if not ids:
+        return
+
+    products = bind.execute(select(Product.id, Product.specs).where(Product.id.in_(ids))).all()
+    bind.execute(delete(ProductSpec).where(ProductSpec.product_id.in_(ids)))
+    rows = [row for product_id, specs in products for row in spec_rows(product_id, specs)]
+    if rows:
+        bind.execute(insert(ProductSpec), rows)
+
+
+def remove_product_specs(bind, product_ids: Iterable[int]) -> None:
+    """Drop the spec rows of the given products"""
+    ids = sorted({int(pid) for pid in product_ids if pid is not None})
+    if ids:
+        bind.execute(delete(ProductSpec).where(ProductSpec.product_id.in_(ids)))
+
+
+def rebuild_product_specs(bind) -> None:
+    """Rebuild the whole side table from the products table"""
+    bind.execute(delete(ProductSpec))
+    batch: List[dict] = []
+    for product_id, specs in bind.execute(select(Product.id, Product.specs)).all():
+        batch.extend(spec_rows(product_id, specs))
+        if len(batch) >= BATCH_SIZE:
+            bind.execute(insert(ProductSpec), batch)
+            batch = []
+    if batch:
+        bind.execute(insert(ProductSpec), batch)
+
+
+# ==================== FILTERS ====================
+
+def _bound(name: str, raw: str) -> float:
+    number = spec_number(raw)
+    if number is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"'{name}' must be a number"
+        )
+    return number
+
+
+def parse_spec_filters(params: Mapping[str, Any]) -> Dict[str, dict]:
+    """
+    Collect `spec.*` query parameters as {key: {"values": [...], "min": x, "max": y}}
+
+    `params` is the request's query parameters (a multi-dict).
+
+    Raises:
+        HTTPException: If a range bound is not a number
+    """
+    filters: Dict[str, dict] = {}
+    for name, raw in params.multi_items():
+        if not name.startswith(SPEC_PARAM_PREFIX):
+            continue
+        key, _, bound = name[len(SPEC_PARAM_PREFIX):].rpartition(".")
+        if bound not in ("min", "max"):
+            key, bound = name[len(SPEC_PARAM_PREFIX):], None
+        key = spec_key(key)
+        if not key:
+            continue
+
+        entry = filters.setdefault(key, {"values": [], "min": None, "max": None})
+        if bound is None:
+            entry["values"].append(normalize(raw))
+        else:
+            entry[bound] = _bound(name, raw)
+    return filters
+
+
+def spec_conditions(filters: Dict[str, dict]) -> Dict[str, list]:
+    """Listing filter groups ({'spec.<key>': [conditions]}) for parsed spec filters"""
+    conditions: Dict[str, list] = {}
+    for key, entry in filters.items():
+        match = select(ProductSpec.product_id).where(ProductSpec.key == key)
+        if entry["values"]:
+            match = match.where(ProductSpec.value.in_(entry["values"]))
+        if entry["min"] is not None:
+            match = match.where(ProductSpec.value_num >= entry["min"])
+        if entry["max"] is not None:
+            match = match.where(ProductSpec.value_num <= entry["max"])
+        conditions[f"spec.{key}"] = [Product.id.in_(match)]
+    return conditions
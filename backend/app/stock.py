@@ -0,0 +1,127 @@
+"""
+Stock decrements for checkout (set-based and safe under concurrency)
+
+`take_stock()` replaces the per-item read / check / `stock -= quantity`
+sequence that oversold when two checkouts raced:
+
+1. One `SELECT ... WHERE id IN (...) ORDER BY id FOR UPDATE` loads every
+   product of the order and, on PostgreSQL, row-locks them in id order.
+   Every checkout locks in the same order, so two orders sharing products
+   wait for each other instead of deadlocking.
+2. Missing products and short stock are reported from that snapshot.
+3. One conditional UPDATE decrements stock (and raises `vendidos`) for all
+   products, guarded by `stock >= quantity`. Under the row locks the guard
+   always holds; on databases without row locks (SQLite) it is what keeps
+   stock from going negative, and a short row count means another checkout
+   won the race.
+
+Stock held by other carts (`Product.reservado`, see `app.reservations`) is
+not available. Quantities covered by the buyer's own holds convert into the
+sale: they are released from `reservado` in the same UPDATE, and when every
+line is covered the products are read without row locks, since the holds
+already set that stock aside.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, case, func, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from .models import Product
+
+
+def order_quantities(lines: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    """Total quantity per product id for (product_id, quantity) order lines"""
+    quantities: Dict[int, int] = {}
+    for product_id, quantity in lines:
+        if quantity < 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Quantity for product {product_id} must be at least 1"
+            )
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def read_products(db: Session, product_ids: Iterable[int], lock: bool = False) -> Dict[int, Row]:
+    """
+    Load (id, sku, titulo, precio, stock, reservado) rows by id
+
+    With `lock`, the rows stay locked in id order until the transaction ends.
+    """
+    query = (
+        select(Product.id, Product.sku, Product.titulo, Product.precio, Product.stock, Product.reservado)
+        .where(Product.id.in_(sorted(product_ids)))
+        .order_by(Product.id)
+    )
+    if lock:
+        query = query.with_for_update()
+    return {row.id: row for row in db.execute(query).all()}
+
+
+def check_products(products: Dict[int, Row], needed: Dict[int, int]) -> None:
+    """
+    Raise unless every product exists and has `needed` units not held by carts
+
+    Raises:
+        HTTPException: 404 for unknown products, 400 for insufficient stock
+    """
+    for product_id in needed:
+        if product_id not in products:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with ID {product_id} not found"
+            )
+    for product_id, quantity in needed.items():
+        product = products[product_id]
+        if quantity > 0 and product.stock - product.reservado < quantity:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient stock for product {product.titulo}"
+            )
+
+
+def take_stock(db: Session, quantities: Dict[int, int], held: Optional[Dict[int, int]] = None) -> List[Row]:
+    """
+    Decrement stock and count sales for an order's products (caller commits)
+
+    `held` are the buyer's reservations already removed in this transaction
+    (`app.reservations.claim_reservations`); they are released from
+    `reservado` and cover that much of the order.
+
+    Returns the product rows, in id order.
+
+    Raises:
+        HTTPException: 404 for unknown products, 400 for insufficient stock
+    """
+    held = held or {}
+    needed = {product_id: quantity - held.get(product_id, 0) for product_id, quantity in quantities.items()}
+    covered = all(quantity <= 0 for quantity in needed.values())
+    products = read_products(db, quantities, lock=not covered)
+    check_products(products, needed)
+
+    taken = case(quantities, value=Product.id)
+    released = case(held, value=Product.id, else_=0) if held else 0
+    result = db.execute(
+        update(Product)
+        .where(and_(
+            Product.id.in_(list(quantities)),
+            Product.stock - Product.reservado >= case(needed, value=Product.id),
+        ))
+        .values(
+            stock=Product.stock - taken,
+            reservado=Product.reservado - released,
+            vendidos=Product.vendidos + taken,
+            updated_at=func.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(quantities):
+        # Stock changed after the snapshot (no row locks on this database)
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Stock changed while placing the order, please try again"
+        )
+    return [products[product_id] for product_id in sorted(products)]
@@ -0,0 +1,337 @@
+"""
+Typeahead suggestions from an in-memory prefix index
+
+Product titles, brands and category names are normalized (lowercase, no
+accents) and every word suffix of each one is stored as a key in one sorted
+list, so "jug" matches "Set de Juguetes STEAM" as well as "Juguetes".
+Matches are ranked by units sold (brands and categories by the total of
+their products).
+
+Short prefixes (up to SHORT_PREFIX characters) match a large share of the
+catalog, so their best TOP_STORED entries are precomputed: a lookup is a
+dict read. Writes and sales move the affected entries within those lists
+instead of recomputing them; a list is rescanned only when removals leave
+fewer than MAX_SUGGESTIONS of an incomplete list. Longer prefixes bisect to
+the first key >= the prefix and scan the (narrow) range of keys with it.
+
+The index is built from the products table at startup, updated in place by
+product writes in this process and rebuilt every SUGGEST_REFRESH_SECONDS so
+writes handled by other workers show up too. Lookups never hit the database.
+"""
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import Category, Product
+
+# Lookups up to this many characters are answered from precomputed top lists
+SHORT_PREFIX = 3
+
+# Most suggestions a lookup returns (the route's `limit` maximum)
+MAX_SUGGESTIONS = 20
+
+# Entries kept per short prefix; the slack absorbs removals before a rescan
+TOP_STORED = 2 * MAX_SUGGESTIONS
+
+# Sorts after every character a normalized key can contain
+_KEY_END = "\U0010ffff"
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase, strip accents and collapse anything but letters/digits to single spaces"""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    cleaned = "".join(ch if ch.isalnum() else " " for ch in stripped.lower())
+    return " ".join(cleaned.split())
+
+
+def _suffixes(normalized: str) -> List[str]:
+    """Every word suffix: 'set de juguetes' -> ['set de juguetes', 'de juguetes', 'juguetes']"""
+    words = normalized.split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+class SuggestIndex:
+    """Sorted-array prefix index over product titles, brands and categories"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys: List[Tuple[str, tuple]] = []  # sorted (key, entry id)
+        self._entries: Dict[tuple, dict] = {}  # entry id -> suggestion
+        self._products: Dict[int, dict] = {}  # product id -> indexed fields
+        self._categories: Dict[int, str] = {}  # category id -> name
+        # short prefix -> [best entry ids in rank order, whether that is every match]
+        self._top: Dict[str, list] = {}
+
+    # ---------- building ----------
+
+    def rebuild(self, db: Session) -> None:
+        """Replace the whole index with the current products table"""
+        categories = dict(db.query(Category.id, Category.name).all())
+        rows = db.query(
+            Product.id, Product.titulo, Product.marca, Product.categoria_id, Product.vendidos
+        ).all()
+
+        fresh = SuggestIndex()
+        fresh._categories = categories
+        for row in rows:
+            fresh._add_product(row.id, row.titulo, row.marca, row.categoria_id, row.vendidos or 0, sort=False)
+        fresh._keys.sort()
+        fresh._build_top()
+
+        with self._lock:
+            self._keys = fresh._keys
+            self._entries = fresh._entries
+            self._products = fresh._products
+            self._categories = fresh._categories
+            self._top = fresh._top
+
+    def _build_top(self) -> None:
+        """
+        Top lists of every short prefix
+
+        Only the longest prefixes scan the keys; a shorter prefix's best entries
+        are among its extensions' best ones (plus keys exactly that long).
+        """
+        ranks = {entry_id: self._rank(entry_id) for entry_id in self._entries}
+        level: Dict[str, list] = {}
+        exact: Dict[str, Set[tuple]] = {}  # keys shorter than SHORT_PREFIX
+        keys = self._keys
+        i = 0
+        while i < len(keys):
+            key = keys[i][0]
+            if len(key) < SHORT_PREFIX:
+                exact.setdefault(key, set()).add(keys[i][1])
+                i += 1
+                continue
+            prefix = key[:SHORT_PREFIX]
+            end = bisect_left(keys, (prefix + _KEY_END,), i)
+            matched = {keys[k][1] for k in range(i, end)}
+            level[prefix] = [heapq.nsmallest(TOP_STORED, matched, key=ranks.__getitem__), len(matched) <= TOP_STORED]
+            i = end
+
+        top = dict(level)
+        for length in range(SHORT_PREFIX - 1, 0, -1):
+            grouped: Dict[str, list] = {}
+            for prefix, (ranked, complete) in level.items():
+                group = grouped.setdefault(prefix[:length], [set(), True])
+                group[0].update(ranked)
+                group[1] = group[1] and complete
+            for key, entry_ids in exact.items():
+                if len(key) == length:
+                    grouped.setdefault(key, [set(), True])[0].update(entry_ids)
+            level = {
+                prefix: [heapq.nsmallest(TOP_STORED, matched, key=ranks.__getitem__),
+                         complete and len(matched) <= TOP_STORED]
+                for prefix, (matched, complete) in grouped.items()
+            }
+            top.update(level)
+        # Lookups are normalized: no trailing space
+        self._top = {prefix: ranked for prefix, ranked in top.items() if not prefix.endswith(" ")}
+
+    # ---------- ranking ----------
+
+    def _rank(self, entry_id: tuple) -> tuple:
+        entry = self._entries[entry_id]
+        return -entry["score"], entry["text"], entry_id
+
+    def _matches(self, prefix: str) -> Set[tuple]:
+        """Entries with a key starting with `prefix` (scans the keys)"""
+        keys = self._keys
+        i = bisect_left(keys, (prefix,))
+        end = bisect_left(keys, (prefix + _KEY_END,), i)
+        return {keys[k][1] for k in range(i, end)}
+
+    def _rescan(self, prefix: str) -> None:
+        matched = self._matches(prefix)
+        if matched:
+            self._top[prefix] = [heapq.nsmallest(TOP_STORED, matched, key=self._rank), len(matched) <= TOP_STORED]
+        else:
+            self._top.pop(prefix, None)
+
+    @staticmethod
+    def _short_prefixes(text: str) -> Set[str]:
+        return {
+            key[:length]
+            for key in _suffixes(normalize(text))
+            for length in range(1, SHORT_PREFIX + 1)
+            if len(key) >= length and key[length - 1] != " "  # Lookups are normalized: no trailing space
+        }
+
+    def _raised(self, entry_id: tuple) -> None:
+        """Entry added or its score went up: move it up / into the top lists"""
+        for prefix in self._short_prefixes(self._entries[entry_id]["text"]):
+            top = self._top.get(prefix)
+            if top is None:
+                self._top[prefix] = [[entry_id], True]
+                continue
+            ranked, complete = top
+            if entry_id in ranked:
+                ranked.remove(entry_id)
+            elif not complete and self._rank(entry_id) > self._rank(ranked[-1]):
+                continue  # Still behind entries that are not listed
+            insort(ranked, entry_id, key=self._rank)
+            if len(ranked) > TOP_STORED:
+                ranked.pop()
+                top[1] = False
+
+    def _lowered(self, entry_id: tuple, text: str, removed: bool) -> None:
+        """Entry removed (keys already gone) or its score went down"""
+        for prefix in self._short_prefixes(text):
+            top = self._top.get(prefix)
+            if top is None or entry_id not in top[0]:
+                continue
+            ranked, complete = top
+            ranked.remove(entry_id)
+            # Unlisted entries rank below the last listed one, but may now beat this one
+            if not removed and (complete or self._rank(entry_id) < self._rank(ranked[-1])):
+                insort(ranked, entry_id, key=self._rank)
+            if not complete and len(ranked) < MAX_SUGGESTIONS:
+                self._rescan(prefix)
+            elif not ranked:
+                del self._top[prefix]
+
+    def _add_keys(self, entry_id: tuple, text: str, sort: bool) -> None:
+        for key in _suffixes(normalize(text)):
+            if sort:
+                insort(self._keys, (key, entry_id))
+            else:
+                self._keys.append((key, entry_id))
+
+    def _remove_keys(self, entry_id: tuple, text: str) -> None:
+        for key in _suffixes(normalize(text)):
+            i = bisect_left(self._keys, (key, entry_id))
+            if i < len(self._keys) and self._keys[i] == (key, entry_id):
+                del self._keys[i]
+
+    def _bump_group(self, entry_id: tuple, text: str, delta_count: int, delta_score: int, sort: bool) -> None:
+        """Brand / category entries aggregate the products that reference them"""
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            if delta_count <= 0:
+                return
+            entry = {"text": text, "type": entry_id[0], "count": 0, "score": 0}
+            if entry_id[0] == "category":
+                entry["category_id"] = entry_id[1]
+            self._entries[entry_id] = entry
+            self._add_keys(entry_id, text, sort)
+
+        entry["count"] += delta_count
+        entry["score"] += delta_score
+        if entry["count"] <= 0:
+            self._remove_keys(entry_id, entry["text"])
+            del self._entries[entry_id]
+            self._lowered(entry_id, entry["text"], removed=True)
+        elif sort and (delta_count > 0 or delta_score > 0):
+            self._raised(entry_id)
+        elif sort and delta_score < 0:
+            self._lowered(entry_id, entry["text"], removed=False)
+
+    def _add_product(self, product_id, titulo, marca, categoria_id, vendidos, sort: bool) -> None:
+        entry_id = ("product", product_id)
+        self._entries[entry_id] = {"text": titulo, "type": "product", "product_id": product_id, "score": vendidos}
+        self._add_keys(entry_id, titulo, sort)
+        if sort:
+            self._raised(entry_id)
+        self._products[product_id] = {
+            "titulo": titulo, "marca": marca, "categoria_id": categoria_id, "vendidos": vendidos,
+        }
+        if normalize(marca):
+            self._bump_group(("brand", normalize(marca)), marca, 1, vendidos, sort)
+        if categoria_id in self._categories:
+            self._bump_group(("category", categoria_id), self._categories[categoria_id], 1, vendidos, sort)
+
+    def _drop_product(self, product_id: int) -> None:
+        fields = self._products.pop(product_id, None)
+        if fields is None:
+            return
+        self._remove_keys(("product", product_id), fields["titulo"])
+        self._entries.pop(("product", product_id), None)
+        self._lowered(("product", product_id), fields["titulo"], removed=True)
+        vendidos = fields["vendidos"]
+        if normalize(fields["marca"]):
+            self._bump_group(("brand", normalize(fields["marca"])), fields["marca"], -1, -vendidos, True)
+        if fields["categoria_id"] in self._categories:
+            self._bump_group(
+                ("category", fields["categoria_id"]), self._categories[fields["categoria_id"]], -1, -vendidos, True
+            )
+
+    # ---------- incremental updates ----------
+
+    def upsert_product(self, product: Product) -> None:
+        """Add or refresh one product after it was created or updated"""
+        with self._lock:
+            if product.category is not None:
+                self._categories.setdefault(product.categoria_id, product.category.name)
+            self._drop_product(product.id)
+            self._add_product(
+                product.id, product.titulo, product.marca, product.categoria_id, product.vendidos or 0, sort=True
+            )
+
+    def remove_product(self, product_id: int) -> None:
+        with self._lock:
+            self._drop_product(product_id)
+
+    def add_sales(self, quantities: Dict[int, int]) -> None:
+        """Raise the ranking of sold products (and their brand / category)"""
+        with self._lock:
+            for product_id, quantity in quantities.items():
+                fields = self._products.get(product_id)
+                if fields is None:
+                    continue
+                fields["vendidos"] += quantity
+                for entry_id in (
+                    ("product", product_id), ("brand", normalize(fields["marca"])), ("category", fields["categoria_id"])
+                ):
+                    entry = self._entries.get(entry_id)
+                    if entry is not None:
+                        entry["score"] += quantity
+                        self._raised(entry_id)
+
+    # ---------- lookups ----------
+
+    def suggest(self, q: str, limit: int = 8) -> List[dict]:
+        """Best `limit` suggestions whose title/brand/category has a word starting with `q`"""
+        prefix = normalize(q)
+        if not prefix:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+
+        with self._lock:
+            if len(prefix) <= SHORT_PREFIX:
+                best = self._top.get(prefix, [[]])[0][:limit]
+            else:
+                best = heapq.nsmallest(limit, self._matches(prefix), key=self._rank)
+            return [
+                {k: v for k, v in self._entries[entry_id].items() if k not in ("score", "count")}
+                for entry_id in best
+            ]
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._keys), "entries": len(self._entries), "products": len(self._products),
+            "short_prefixes": len(self._top),
+        }
+
+
+# Single instance shared by the routers
+suggest_index = SuggestIndex()
+
+
+def load_suggest_index() -> None:
+    """(Re)build the index from the database; leaves it untouched on DB errors"""
+    db = SessionLocal()
+    try:
+        suggest_index.rebuild(db)
+    except SQLAlchemyError as e:
+        print(f"WARNING: Could not build suggestion index: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: response_model serialization vs the fast JSON path
+
+Serializes a 100-item product list (ORM objects, no database needed) the way
+FastAPI does for `response_model=List[ProductResponse]` (validation into
+Pydantic models, then JSONResponse) and through `app.fastjson`
+(`product_dict` + `FastJSONResponse`), checks that both produce the same
+JSON, and prints the time per response.
+
+Run from the backend directory:
+    python -m benchmarks.json_responses [--items 100] [--rounds 200]
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.utils import create_model_field
+
+from app.fastjson import FastJSONResponse, product_dict
+from app.models import Product
+from app.schemas import ProductResponse
+
+
+def make_products(count: int) -> List[Product]:
+    created = datetime(2026, 10, 18, 12, 30, 15, 250000, tzinfo=timezone.utc)
+    return [
+        Product(
+            id=i, sku=f"SKU-{i:05d}", titulo=f"Auriculares inalámbricos modelo {i}", categoria_id=1 + i % 8,
+            marca="Sony", precio=19990.0 + i, rating=4.5, stock=10 + i, vendidos=i * 3, destacado=i % 5 == 0,
+            reservado=i % 3, disponible=10 + i - i % 3,  # as loaded; disponible is computed by the query
+            descripcion="Cancelación de ruido, 30 horas de batería y carga rápida. " * 4,
+            imagenes=[f"img/prod{i}-1.png", f"img/prod{i}-2.png"],
+            specs={"color": "negro", "conectividad": "Bluetooth 5.3", "peso": "250 g"},
+            created_at=created,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def response_model_path(field, products: List[Product]) -> bytes:
+    # The steps of fastapi.routing.serialize_response for an async route
+    value, errors = field.validate(products, {}, loc=("response",))
+    assert not errors, errors
+    return JSONResponse(field.serialize(value, by_alias=True)).body
+
+
+def fast_path(products: List[Product]) -> bytes:
+    return FastJSONResponse([product_dict(product) for product in products]).body
+
+
+def measure(fn, rounds: int) -> List[float]:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    products = make_products(args.items)
+    field = create_model_field(name="Response", type_=List[ProductResponse], mode="serialization")
+
+    slow_body = response_model_path(field, products)
+    fast_body = fast_path(products)
+    assert json.loads(slow_body) == json.loads(fast_body), "fast path output differs from response_model"
+
+    paths = {
+        "response_model + JSONResponse": lambda: response_model_path(field, products),
+        "product_dict + orjson": lambda: fast_path(products),
+    }
+    print(f"{args.items} products, {args.rounds} rounds, {len(fast_body)} bytes per response")
+    results = {}
+    for name, fn in paths.items():
+        measure(fn, 10)  # Warm up
+        results[name] = statistics.median(measure(fn, args.rounds))
+        print(f"  {name:<32} {results[name] * 1000:8.3f} ms")
+    slow, fast = results.values()
+    print(f"  speedup: {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Load test: concurrent checkouts of the same product must never oversell
+
+Creates a product with `--stock` units on a running API, fires `--orders`
+single-unit orders for it from `--concurrency` threads at once, then checks
+that exactly min(orders, stock) orders succeeded, every other one was
+rejected for stock, and the product's stock never went negative.
+
+Run against a server with several workers so checkouts really race, e.g.:
+    uvicorn app.main:app --workers 4
+    python -m benchmarks.order_load_test --url http://localhost:8000 --orders 300 --stock 50
+"""
+import argparse
+import json
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+
+class Api:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.token: Optional[str] = None
+
+    def call(self, method: str, path: str, body=None, form=None) -> Tuple[int, object]:
+        headers = {}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        elif form is not None:
+            data = urlencode(form).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = Request(self.url + path, data=data, headers=headers, method=method)
+        try:
+            with urlopen(request, timeout=60) as response:
+                return response.status, json.loads(response.read() or b"null")
+        except HTTPError as e:
+            return e.code, json.loads(e.read() or b"null")
+
+    def login(self) -> None:
+        email = f"loadtest-{uuid.uuid4().hex[:12]}@example.com"
+        self.call("POST", "/api/auth/register", {"email": email, "password": "loadtest"})
+        status, body = self.call("POST", "/api/auth/login", form={"username": email, "password": "loadtest"})
+        assert status == 200, f"login failed: {status} {body}"
+        self.token = body["access_token"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--orders", type=int, default=300, help="Orders placed (1 unit each)")
+    parser.add_argument("--stock", type=int, default=50, help="Units of the product in stock")
+    parser.add_argument("--concurrency", type=int, default=100, help="Orders in flight at once")
+    args = parser.parse_args()
+
+    api = Api(args.url)
+    api.login()
+    status, categories = api.call("GET", "/api/categories/")
+    assert status == 200 and categories, "need at least one category (run seed_data.py)"
+    status, product = api.call("POST", "/api/products/", {
+        "sku": f"LOADTEST-{uuid.uuid4().hex[:8].upper()}",
+        "titulo": "Load test product",
+        "categoria_id": categories[0]["id"],
+        "precio": 1000.0,
+        "stock": args.stock,
+    })
+    assert status == 201, f"could not create product: {status} {product}"
+
+    order = {"items": [{"product_id": product["id"], "quantity": 1, "price": product["precio"]}]}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        statuses = Counter(status for status, _ in pool.map(
+            lambda _: api.call("POST", "/api/orders/", order), range(args.orders)
+        ))
+    elapsed = time.perf_counter() - started
+
+    _, final = api.call("GET", f"/api/products/{product['id']}")
+    placed = statuses[201]
+    print(f"{args.orders} orders in {elapsed:.2f}s ({args.orders / elapsed:.0f}/s): {dict(statuses)}")
+    print(f"stock {args.stock} -> {final['stock']}, vendidos {final['vendidos']}")
+
+    assert final["stock"] >= 0, "stock went negative"
+    assert placed == min(args.orders, args.stock), f"expected {min(args.orders, args.stock)} orders, got {placed}"
+    assert final["stock"] == args.stock - placed, "stock does not match the orders placed"
+    assert final["vendidos"] == placed, "vendidos does not match the orders placed"
+    assert set(statuses) <= {201, 400, 409}, "unexpected status codes"
+    print("OK: no overselling")
+
+
+if __name__ == "__main__":
+    main()
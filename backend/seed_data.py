@@ -7,11 +7,14 @@ from pathlib import Path
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine
 from app.models import Category, Product, ShippingMethod, Locality, Coupon
+from app.search import create_search_index, rebuild_search_index
+from app.specs import rebuild_product_specs
 from datetime import datetime, timedelta
 
 # Create all tables
 from app.database import Base
 Base.metadata.create_all(bind=engine)
+create_search_index(engine)
 
 
 def load_json(filename: str):
@@ -80,6 +83,9 @@ def seed_products(db: Session):
             db.add(product)
             added += 1
     
+    db.flush()
+    rebuild_search_index(db)
+    rebuild_product_specs(db)
     db.commit()
     print(f"✓ {added} products seeded")
 
@@ -151,18 +157,16 @@ def seed_coupons(db: Session):
             cup_type = cup.get("type", "fixed")
             if cup_type == "percent":
                 discount_type = "percentage"
+            elif cup_type == "ship":
+                discount_type = "ship"  # Free shipping
             else:
                 discount_type = "fixed"
             
-            # Skip ship type for now (not supported in current model)
-            if cup_type == "ship":
-                continue
-            
             coupon = Coupon(
                 code=cup["code"],
                 description=f"Cupón de descuento {cup['code']}",
                 discount_type=discount_type,
-                discount_value=cup["value"],
+                discount_value=cup.get("value", 0),
                 min_purchase=0,
                 is_active=True,
                 expires_at=datetime.now() + timedelta(days=90)  # Valid for 90 days
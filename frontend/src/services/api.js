@@ -183,6 +183,13 @@ export async function getProduct(id) {
   return apiRequest(`/api/products/${id}`);
 }
 
+export async function getProductsBatch(ids = [], skus = []) {
+  const params = new URLSearchParams();
+  if (ids.length) params.set("ids", ids.join(","));
+  if (skus.length) params.set("skus", skus.join(","));
+  return apiRequest(`/api/products/batch?${params.toString()}`);
+}
+
 export async function searchProducts(query, params = {}) {
   const allParams = { q: query, ...params };
   const queryString = new URLSearchParams(allParams).toString();